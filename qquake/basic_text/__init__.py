@@ -3,3 +3,4 @@ Basic text parser
 """
 
 from .basic_text_parser import BasicTextParser, BasicStationParser
+from .geojson_parser import GeoJsonParser
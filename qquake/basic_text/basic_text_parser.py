@@ -14,7 +14,14 @@ __copyright__ = 'Istituto Nazionale di Geofisica e Vulcanologia (INGV)'
 # This will get replaced with a git SHA1 when you do a git archive
 __revision__ = '$Format:%H$'
 
-from typing import List, Optional
+import sys
+from typing import (
+    Callable,
+    Iterator,
+    List,
+    Optional,
+    Tuple
+)
 
 from qgis.PyQt.QtCore import (
     QVariant,
@@ -82,18 +89,157 @@ STATION_FIELD_TYPE = {
     'EndTime': QVariant.DateTime
 }
 
+Converter = Callable[[str], object]
+
+
+def _datetime_value(value: str) -> QDateTime:
+    """
+    Converts a text value to a datetime
+    """
+    return QDateTime.fromString(value.replace('--', '00'), Qt.ISODate)
+
+
+def _date_value(value: str) -> QDate:
+    """
+    Converts a text value to a date
+    """
+    return QDate.fromString(value, Qt.ISODate)
+
+
+def _time_value(value: str) -> QTime:
+    """
+    Converts a text value to a time
+    """
+    return QTime.fromString(value, Qt.ISODate)
+
+
+def _string_value(value: str) -> str:
+    """
+    Converts a text value to a string, removing missing value markers
+    """
+    return value.replace('--', '')
+
+
+def column_converters(fields: QgsFields, strip_missing_strings: bool = False) -> List[Optional[Converter]]:
+    """
+    Returns the converters for text values of each field, determined once from the field types.
+
+    Values for fields without a converter are used unchanged.
+    """
+    converters = {
+        QVariant.DateTime: _datetime_value,
+        QVariant.Date: _date_value,
+        QVariant.Time: _time_value,
+        QVariant.Double: float,
+        QVariant.Int: int
+    }
+    if strip_missing_strings:
+        converters[QVariant.String] = _string_value
+
+    return [converters.get(field.type()) for field in fields]
+
+
+def convert_column(values: List[Optional[str]], converter: Converter) -> list:
+    """
+    Converts a column of text values, replacing values which cannot be converted with NULL
+    """
+    try:
+        return list(map(converter, values))
+    except Exception:  # pylint: disable=broad-except
+        pass
+
+    # at least one value is invalid, so convert values individually
+    res = []
+    for value in values:
+        try:
+            res.append(converter(value))
+        except Exception:  # pylint: disable=broad-except
+            res.append(NULL)
+    return res
+
+
+def to_columns(rows: List[tuple], converters: List[Optional[Converter]]) -> List[list]:
+    """
+    Converts rows of text values to columns of typed values
+    """
+    if not rows:
+        return [[] for _ in converters]
+
+    columns = [list(values) for values in zip(*rows)]
+    for index, converter in enumerate(converters):
+        if converter is not None:
+            columns[index] = convert_column(columns[index], converter)
+    return columns
+
+
+def split_rows(lines: List[str], column_count: int) -> List[Tuple[Optional[str], ...]]:
+    """
+    Splits text lines into rows with exactly column_count values, padding missing values with None.
+
+    Values are interned, as many columns (e.g. authors, magnitude types and event types) contain
+    only a few distinct values.
+    """
+    rows = []
+    intern = sys.intern
+    for line in lines:
+        if not line:
+            continue
+
+        values = tuple(map(intern, line.split('|')))
+        if len(values) != column_count:
+            values = (values + (None,) * column_count)[:column_count]
+        rows.append(values)
+    return rows
+
+
+def create_point_features(fields: QgsFields,  # pylint: disable=too-many-arguments
+                          columns: List[list],
+                          x_index: int,
+                          y_index: int,
+                          z_index: int = -1) -> Iterator[QgsFeature]:
+    """
+    Yields point features from columns of typed values
+    """
+    for attributes in zip(*columns):
+        f = QgsFeature(fields)
+        f.setAttributes(list(attributes))
+
+        x = attributes[x_index] if x_index >= 0 else None
+        y = attributes[y_index] if y_index >= 0 else None
+        if isinstance(x, float) and isinstance(y, float):
+            z = attributes[z_index] if z_index >= 0 else None
+            if isinstance(z, float):
+                geom = QgsPoint(x=x, y=y, z=z)
+            else:
+                geom = QgsPoint(x=x, y=y)
+            f.setGeometry(QgsGeometry(geom))
+
+        yield f
+
 
 class BasicTextParser:
     """
     Basic plain text parser
     """
 
+    # header line of text event replies, as stored in the local catalog
+    EVENT_HEADER = '#EventID|Time|Latitude|Longitude|Depth/km|Author|Catalog|Contributor|ContributorID|' \
+                   'MagType|Magnitude|MagAuthor|EventLocationName|EventType'
+
+    TIME_INDEX = 1
+    LATITUDE_INDEX = 2
+    LONGITUDE_INDEX = 3
+    DEPTH_INDEX = 4
+    MAGNITUDE_INDEX = 10
+    EVENT_TYPE_INDEX = 13
+
     def __init__(self, convert_negative_depths=False,
                  depth_unit=QgsUnitTypes.DistanceMeters):
-        self.headers = []
-        self.mdp_headers = []
-        self.events = []
-        self.mdp = []
+        self.headers: List[str] = []
+        self.mdp_headers: List[str] = []
+        # rows of text values, in header order
+        self.events: List[tuple] = []
+        self.mdp: List[tuple] = []
         self.convert_negative_depths = convert_negative_depths
         self.depth_unit = depth_unit
 
@@ -120,6 +266,16 @@ class BasicTextParser:
         self.parser_header_by_index()
         self._add_events(lines[1:])
 
+    @staticmethod
+    def count_events(content: QByteArray) -> int:
+        """
+        Returns the number of events contained in reply content
+        """
+        if not content:
+            return 0
+
+        return len([line for line in content.data().split(b'\n') if line and not line.startswith(b'#')])
+
     def add_events(self, content: QByteArray):
         """
         Adds events from reply content
@@ -131,11 +287,25 @@ class BasicTextParser:
         """
         Adds events from text
         """
-        for e in lines:
-            if not e:
-                continue
+        self.events.extend(split_rows(lines, len(self.headers)))
 
-            self.events.append(dict(zip(self.headers, e.split('|'))))
+    def merge(self, other: 'BasicTextParser', unique_events: bool = False):
+        """
+        Adds all results from another parser, e.g. one which was used to parse a reply in a background task
+
+        :param unique_events: if True, events which are already present in the results will be skipped
+         (e.g. events at the shared boundary of split date ranges)
+        """
+        if other.headers:
+            self.headers = other.headers
+        if unique_events and self.events:
+            event_ids = {e[0] for e in self.events}
+            self.events.extend(e for e in other.events if e[0] not in event_ids)
+        else:
+            self.events.extend(other.events)
+        if other.mdp_headers:
+            self.mdp_headers = other.mdp_headers
+        self.mdp.extend(other.mdp)
 
     def add_mdp(self, content: QByteArray):
         """
@@ -150,11 +320,7 @@ class BasicTextParser:
 
         assert lines[0][0] == '#'
         self.mdp_headers = [h.strip() for h in lines[0][1:].split('|')]
-        for e in lines[1:]:
-            if not e:
-                continue
-
-            self.mdp.append(dict(zip(self.mdp_headers, e.split('|'))))
+        self.mdp.extend(split_rows(lines[1:], len(self.mdp_headers)))
 
     @staticmethod
     def get_field_type(name: str) -> Optional[int]:
@@ -217,75 +383,25 @@ class BasicTextParser:
 
         return fields
 
-    def to_event_feature(self, event: dict, fields: QgsFields) -> QgsFeature:  # pylint: disable=too-many-branches
-        """
-        Converts an event to a feature
-        """
-        f = QgsFeature(fields)
-        for k, v in event.items():
-
-            if k == 'Depth/km' and self.depth_unit == QgsUnitTypes.DistanceMeters:
-                k = 'DepthMeters'
-            elif k == 'Depth/km':
-                k = 'DepthKm'
-
-            try:
-                if fields[fields.lookupField(k)].type() == QVariant.DateTime:
-                    v = v.replace('--', '00')
-                    v = QDateTime.fromString(v, Qt.ISODate)
-                elif fields[fields.lookupField(k)].type() == QVariant.Date:
-                    v = QDate.fromString(v, Qt.ISODate)
-                elif fields[fields.lookupField(k)].type() == QVariant.Time:
-                    v = QTime.fromString(v, Qt.ISODate)
-                elif fields[fields.lookupField(k)].type() == QVariant.Double:
-                    v = float(v)
-                elif fields[fields.lookupField(k)].type() == QVariant.Int:
-                    v = int(v)
-                elif fields[fields.lookupField(k)].type() == QVariant.String:
-                    v = v.replace('--', '')
-            except Exception:  # pylint: disable=broad-except
-                v = NULL
-
-            if k in ('DepthKm', 'DepthMeters') and v != NULL:
-                if self.depth_unit == QgsUnitTypes.DistanceMeters:
-                    v *= 1000
-                if self.convert_negative_depths:
-                    v = -v
-            f[k] = v
-            
-        z = None
-        depth_field_name = 'DepthMeters' if self.depth_unit == QgsUnitTypes.DistanceMeters else 'DepthKm'
-        depth_field_index = fields.lookupField(depth_field_name)
-        if depth_field_index >= 0:
-            depth_value = f[depth_field_name]
-            if depth_value != NULL:
-                try:
-                    z = float(depth_value)
-                except Exception:  # pylint: disable=broad-except
-                    z = None
-
-        if event.get('Latitude') and event.get('Longitude'):
-            if z is not None:
-                geom = QgsPoint(
-                    x=float(event['Longitude']),
-                    y=float(event['Latitude']),
-                    z=z)
-            else:
-                geom = QgsPoint(
-                    x=float(event['Longitude']),
-                    y=float(event['Latitude']))
-            f.setGeometry(QgsGeometry(geom))
-
-        return f
-
     def create_event_features(self, output_fields, preferred_origin_only, preferred_magnitudes_only) -> QgsFeature:   # pylint: disable=unused-argument
         """
         Yields an event feature
         """
         fields = self.to_event_fields()
+        if not fields:
+            return
+
+        columns = to_columns(self.events, column_converters(fields, strip_missing_strings=True))
 
-        for e in self.events:
-            yield self.to_event_feature(e, fields)
+        scale = 1000 if self.depth_unit == QgsUnitTypes.DistanceMeters else 1
+        if self.convert_negative_depths:
+            scale = -scale
+        if scale != 1:
+            columns[self.DEPTH_INDEX] = [v * scale if isinstance(v, float) else v
+                                         for v in columns[self.DEPTH_INDEX]]
+
+        yield from create_point_features(fields, columns, self.LONGITUDE_INDEX, self.LATITUDE_INDEX,
+                                         self.DEPTH_INDEX)
 
     def create_mdp_fields(self, selected_fields) -> QgsFields:  # pylint: disable=unused-argument
         """
@@ -302,45 +418,42 @@ class BasicTextParser:
         Yields an MDP feature
         """
         fields = self.create_mdp_fields(selected_fields)
+        columns = to_columns(self.mdp, column_converters(fields))
+
+        yield from create_point_features(fields, columns, fields.lookupField('ReferenceLongitude'),
+                                         fields.lookupField('ReferenceLatitude'))
 
-        for e in self.mdp:
-            yield self.to_mdp_feature(e, fields)
+    @staticmethod
+    def event_time(event: tuple) -> Optional[QDateTime]:
+        """
+        Returns the time of an event, if available
+        """
+        value = event[BasicTextParser.TIME_INDEX] if len(event) > BasicTextParser.TIME_INDEX else None
+        time = _datetime_value(value) if value else QDateTime()
+        return time if time.isValid() else None
 
-    def to_mdp_feature(self, event: dict, fields: QgsFields) -> QgsFeature:
+    def earliest_event_time(self) -> Optional[QDateTime]:
         """
-        Converts results to a MDP feature
+        Returns the time of the earliest event in the results
         """
-        f = QgsFeature(fields)
-        for k, v in event.items():
-            try:
-                if fields[fields.lookupField(k)].type() == QVariant.DateTime:
-                    v = v.replace('--', '00')
-                    v = QDateTime.fromString(v, Qt.ISODate)
-                elif fields[fields.lookupField(k)].type() == QVariant.Date:
-                    v = QDate.fromString(v, Qt.ISODate)
-                elif fields[fields.lookupField(k)].type() == QVariant.Time:
-                    v = QTime.fromString(v, Qt.ISODate)
-                elif fields[fields.lookupField(k)].type() == QVariant.Double:
-                    v = float(v)
-                elif fields[fields.lookupField(k)].type() == QVariant.Int:
-                    v = int(v)
-            except Exception:  # pylint: disable=broad-except
-                v = NULL
-
-            f[k] = v
-
-        if event.get('ReferenceLatitude') and event.get('ReferenceLongitude'):
-            geom = QgsPoint(x=float(event['ReferenceLongitude']), y=float(
-                event['ReferenceLatitude']))
-            f.setGeometry(QgsGeometry(geom))
+        times = [t for t in (self.event_time(e) for e in self.events) if t is not None]
+        return min(times) if times else None
 
-        return f
+    def remove_events_until(self, time: QDateTime):
+        """
+        Removes all events which occurred at or before the specified time
+        """
+        def keep_event(event: tuple) -> bool:
+            event_time = self.event_time(event)
+            return event_time is None or event_time > time
+
+        self.events = [e for e in self.events if keep_event(e)]
 
     def all_event_ids(self) -> List[str]:
         """
         Returns a list of all event IDs
         """
-        return [e['EventID'] for e in self.events]
+        return [e[0] for e in self.events]
 
 
 class BasicStationParser:
@@ -350,7 +463,8 @@ class BasicStationParser:
 
     def __init__(self):
         self.headers: List[str] = []
-        self.stations: List[dict] = []
+        # rows of text values, in header order
+        self.stations: List[tuple] = []
 
     def parser_header_line(self, line: str):
         """
@@ -382,11 +496,7 @@ class BasicStationParser:
         """
         Adds stations from text
         """
-        for e in lines:
-            if not e:
-                continue
-
-            self.stations.append(dict(zip(self.headers, e.split('|'))))
+        self.stations.extend(split_rows(lines, len(self.headers)))
 
     def to_station_fields(self, selected_fields=None) -> QgsFields:  # pylint: disable=unused-argument
         """
@@ -398,41 +508,12 @@ class BasicStationParser:
 
         return fields
 
-    def to_station_feature(self, station: dict, fields: QgsFields) -> QgsFeature:
-        """
-        Creates a station feature
-        """
-        f = QgsFeature(fields)
-        for k, v in station.items():
-            try:
-                if fields[fields.lookupField(k)].type() == QVariant.DateTime:
-                    v = v.replace('--', '00')
-                    v = QDateTime.fromString(v, Qt.ISODate)
-                elif fields[fields.lookupField(k)].type() == QVariant.Date:
-                    v = QDate.fromString(v, Qt.ISODate)
-                elif fields[fields.lookupField(k)].type() == QVariant.Time:
-                    v = QTime.fromString(v, Qt.ISODate)
-                elif fields[fields.lookupField(k)].type() == QVariant.Double:
-                    v = float(v)
-                elif fields[fields.lookupField(k)].type() == QVariant.Int:
-                    v = int(v)
-            except Exception:  # pylint: disable=broad-except
-                v = NULL
-
-            f[k] = v
-
-        if station.get('Latitude') and station.get('Longitude'):
-            geom = QgsPoint(
-                x=float(station['Longitude']), y=float(station['Latitude']))
-            f.setGeometry(QgsGeometry(geom))
-
-        return f
-
     def create_station_features(self) -> QgsFeature:
         """
         Yields station features
         """
         fields = self.to_station_fields()
+        columns = to_columns(self.stations, column_converters(fields))
 
-        for e in self.stations:
-            yield self.to_station_feature(e, fields)
+        yield from create_point_features(fields, columns, fields.lookupField('Longitude'),
+                                         fields.lookupField('Latitude'))
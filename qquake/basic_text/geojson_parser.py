@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+"""
+GeoJSON event parser
+"""
+
+# .. note:: This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+
+__author__ = 'Original authors: Mario Locati, Roberto Vallone, Matteo Ghetta, Nyall Dawson'
+__date__ = '29/01/2020'
+__copyright__ = 'Istituto Nazionale di Geofisica e Vulcanologia (INGV)'
+# This will get replaced with a git SHA1 when you do a git archive
+__revision__ = '$Format:%H$'
+
+import json
+import re
+import sys
+from typing import Optional
+
+from qgis.PyQt.QtCore import (
+    QByteArray,
+    QDateTime,
+    Qt
+)
+from qgis.core import QgsSettings
+
+from .basic_text_parser import BasicTextParser
+
+# candidate properties for each basic text column, in order of preference. Services use differing
+# property names for their JSON output (e.g. INGV, EMSC and USGS all differ)
+PROPERTY_MAP = (
+    ('EventID', ('eventId', 'unid', 'source_id')),
+    ('Time', ('time',)),
+    ('Latitude', ('lat', 'latitude')),
+    ('Longitude', ('lon', 'longitude')),
+    ('Depth', ('depth',)),
+    ('Author', ('author', 'auth')),
+    ('Catalog', ('catalog', 'source_catalog')),
+    ('Contributor', ('contributor', 'net')),
+    ('ContributorID', ('contributorId', 'code')),
+    ('MagType', ('magType', 'magtype')),
+    ('Magnitude', ('mag', 'magnitude')),
+    ('MagAuthor', ('magAuthor',)),
+    ('EventLocationName', ('place', 'flynn_region', 'region')),
+    ('EventType', ('type', 'evtype')),
+)
+
+# columns for which numeric JSON values are kept as numbers
+NUMERIC_COLUMNS = {'Latitude', 'Longitude', 'Depth', 'Magnitude'}
+
+
+class GeoJsonParser(BasicTextParser):
+    """
+    Parses JSON and GeoJSON event replies.
+
+    Events are converted to the same rows as basic text replies, so that the text output fields,
+    styles and the local catalog store are shared with text results.
+    """
+
+    FEATURE_REGEX = re.compile(rb'"type"\s*:\s*"Feature"')
+
+    @staticmethod
+    def is_enabled() -> bool:
+        """
+        Returns True if basic event results should be requested in JSON formats, where supported
+        """
+        return QgsSettings().value('/plugins/qquake/prefer_json_output', False, bool)
+
+    @staticmethod
+    def service_format(service_config: dict) -> Optional[str]:
+        """
+        Returns the JSON format to request from a service, or None if the service does not
+        support JSON output
+        """
+        if service_config['settings'].get('outputgeojson', False):
+            return 'geojson'
+        if service_config['settings'].get('outputjson', False):
+            return 'json'
+        return None
+
+    def parse(self, content: QByteArray):
+        """
+        Parses reply content
+        """
+        if not content:
+            return
+        self.parser_header_by_index()
+        self.add_events(content)
+
+    @staticmethod
+    def count_events(content: QByteArray) -> int:
+        """
+        Returns the number of events contained in reply content
+        """
+        if not content:
+            return 0
+
+        count = len(GeoJsonParser.FEATURE_REGEX.findall(content.data()))
+        if count:
+            return count
+
+        # e.g. plain JSON arrays of events, or differently formatted features
+        try:
+            return len(GeoJsonParser._features(content))
+        except ValueError:
+            return 0
+
+    @staticmethod
+    def _features(content: QByteArray) -> list:
+        """
+        Returns the features (or plain JSON objects) contained in reply content.
+
+        :raises ValueError: if the content is not a GeoJSON feature collection or a JSON array
+        """
+        try:
+            collection = json.loads(content.data())
+        except ValueError as e:
+            raise ValueError('Invalid JSON reply: {}'.format(e)) from e
+
+        if isinstance(collection, dict) and isinstance(collection.get('features'), list):
+            features = collection['features']
+        elif isinstance(collection, list):
+            features = collection
+        else:
+            raise ValueError('JSON reply is not a GeoJSON feature collection')
+
+        return [f for f in features if isinstance(f, dict)]
+
+    def add_events(self, content: QByteArray):
+        """
+        Adds events from reply content
+
+        :raises ValueError: if the content is not a GeoJSON feature collection or a JSON array
+        """
+        if not content:
+            return
+
+        self.events.extend(GeoJsonParser._to_row(f) for f in GeoJsonParser._features(content))
+
+    @staticmethod
+    def _to_row(feature: dict) -> tuple:
+        """
+        Converts a GeoJSON feature (or plain JSON object) to a row of basic text values
+        """
+        properties = feature.get('properties')
+        if not isinstance(properties, dict):
+            properties = feature
+
+        values = {}
+        for column, candidates in PROPERTY_MAP:
+            value = None
+            for candidate in candidates:
+                value = properties.get(candidate)
+                if value is not None:
+                    break
+            values[column] = value
+
+        if values['EventID'] is None:
+            values['EventID'] = feature.get('id')
+
+        coordinates = (feature.get('geometry') or {}).get('coordinates') or ()
+        if values['Longitude'] is None and len(coordinates) > 1:
+            values['Longitude'] = coordinates[0]
+            values['Latitude'] = coordinates[1]
+        if values['Depth'] is None and len(coordinates) > 2:
+            values['Depth'] = coordinates[2]
+
+        event_time = values['Time']
+        if isinstance(event_time, (int, float)):
+            # milliseconds since epoch
+            values['Time'] = QDateTime.fromMSecsSinceEpoch(int(event_time), Qt.UTC).toString(
+                'yyyy-MM-ddThh:mm:ss.zzz')
+
+        # missing values are empty, as in text replies
+        row = []
+        for column, _ in PROPERTY_MAP:
+            value = values[column]
+            if value is None:
+                value = ''
+            elif isinstance(value, str):
+                value = sys.intern(value)
+            elif column not in NUMERIC_COLUMNS:
+                value = str(value)
+            row.append(value)
+        return tuple(row)
+
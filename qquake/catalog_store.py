@@ -0,0 +1,761 @@
+# -*- coding: utf-8 -*-
+"""
+Local persistent earthquake catalog store
+"""
+
+# .. note:: This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+
+__author__ = 'Original authors: Mario Locati, Roberto Vallone, Matteo Ghetta, Nyall Dawson'
+__date__ = '29/01/2020'
+__copyright__ = 'Istituto Nazionale di Geofisica e Vulcanologia (INGV)'
+# This will get replaced with a git SHA1 when you do a git archive
+__revision__ = '$Format:%H$'
+
+import bisect
+import json
+import math
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Optional, List, Dict, Tuple
+from xml.sax.saxutils import unescape
+
+from qgis.PyQt.QtCore import (
+    Qt,
+    QByteArray,
+    QDateTime
+)
+from qgis.core import (
+    QgsSettings,
+    QgsUnitTypes
+)
+
+from qquake.basic_text import BasicTextParser
+from qquake.quakeml import QuakeMlParser
+from qquake.quakeml.fdsn_event import Event
+from qquake.services import ServiceManager
+
+KM_PER_DEGREE = 111.195
+
+# matches complete event elements in QuakeML content, capturing the element's namespace prefix and attributes
+EVENT_ELEMENT_REGEX = re.compile(rb'<((?:[\w.-]+:)?)event\b([^>]*)>.*?</\1event\s*>', re.DOTALL)
+PUBLIC_ID_REGEX = re.compile(rb'\bpublicID\s*=\s*"([^"]*)"')
+NAMESPACE_DECLARATION_REGEX = re.compile(rb'\b(xmlns(?::[\w.-]+)?)\s*=\s*"([^"]*)"')
+
+
+def to_msecs(value: Optional[QDateTime]) -> Optional[int]:
+    """
+    Converts a datetime to milliseconds since epoch, treating datetimes without an explicit time spec as UTC
+    (matching the values sent to services)
+    """
+    if value is None or not value.isValid():
+        return None
+
+    if value.timeSpec() == Qt.UTC:
+        return value.toMSecsSinceEpoch()
+
+    return QDateTime(value.date(), value.time(), Qt.UTC).toMSecsSinceEpoch()
+
+
+def split_quakeml_events(content: bytes) -> Tuple[Dict[str, str], Dict[str, str]]:
+    """
+    Splits QuakeML content into the text of each event element, without parsing the events.
+
+    Returns a tuple of the namespace declarations from the elements enclosing the events, and the
+    text of each event by public ID.
+    """
+    namespaces = {}
+    events = {}
+    for match in EVENT_ELEMENT_REGEX.finditer(content):
+        if not namespaces:
+            namespaces = {k.decode(): v.decode()
+                          for k, v in NAMESPACE_DECLARATION_REGEX.findall(content, 0, match.start())}
+
+        public_id = PUBLIC_ID_REGEX.search(match.group(2))
+        if public_id:
+            public_id = unescape(public_id.group(1).decode(), {'&quot;': '"', '&apos;': "'"})
+            events[public_id] = match.group(0).decode('utf8', errors='replace')
+
+    return namespaces, events
+
+
+def angular_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """
+    Returns the great circle distance between two points, in degrees
+    """
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    delta_phi = phi2 - phi1
+    delta_lambda = math.radians(lon2 - lon1)
+    a = math.sin(delta_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(delta_lambda / 2) ** 2
+    return math.degrees(2 * math.asin(min(1.0, math.sqrt(a))))
+
+
+class CatalogFootprint:  # pylint: disable=too-many-instance-attributes
+    """
+    Describes the filter parameters of a catalog query
+    """
+
+    def __init__(self,  # pylint: disable=too-many-locals
+                 service_id: str,
+                 result_format: str,
+                 include_all: bool = False,
+                 start: Optional[int] = None,
+                 end: Optional[int] = None,
+                 min_magnitude: Optional[float] = None,
+                 max_magnitude: Optional[float] = None,
+                 event_type: Optional[str] = None,
+                 rect: Optional[Tuple[float, float, float, float]] = None,
+                 circle: Optional[Tuple[float, float, Optional[float], Optional[float]]] = None):
+        """
+        :param start: start time, in milliseconds since epoch
+        :param end: end time, in milliseconds since epoch
+        :param rect: tuple of min latitude, max latitude, min longitude, max longitude
+        :param circle: tuple of latitude, longitude, min radius, max radius, with radii in degrees
+        """
+        self.service_id = service_id
+        self.format = result_format
+        self.include_all = include_all
+        self.start = start
+        self.end = end
+        self.min_magnitude = min_magnitude
+        self.max_magnitude = max_magnitude
+        self.event_type = event_type
+        self.rect = tuple(rect) if rect is not None else None
+        self.circle = tuple(circle) if circle is not None else None
+
+    def key(self) -> str:
+        """
+        Returns a unique key for the footprint
+        """
+        return json.dumps(self.to_dict(), sort_keys=True)
+
+    def to_dict(self) -> Dict[str, object]:
+        """
+        Returns the footprint as a dictionary
+        """
+        return {
+            'service_id': self.service_id,
+            'format': self.format,
+            'include_all': self.include_all,
+            'start': self.start,
+            'end': self.end,
+            'min_magnitude': self.min_magnitude,
+            'max_magnitude': self.max_magnitude,
+            'event_type': self.event_type,
+            'rect': list(self.rect) if self.rect is not None else None,
+            'circle': list(self.circle) if self.circle is not None else None
+        }
+
+    @staticmethod
+    def from_dict(definition: Dict[str, object]) -> 'CatalogFootprint':
+        """
+        Creates a footprint from a dictionary
+        """
+        return CatalogFootprint(service_id=definition['service_id'],
+                                result_format=definition['format'],
+                                include_all=definition['include_all'],
+                                start=definition['start'],
+                                end=definition['end'],
+                                min_magnitude=definition['min_magnitude'],
+                                max_magnitude=definition['max_magnitude'],
+                                event_type=definition['event_type'],
+                                rect=definition['rect'],
+                                circle=definition['circle'])
+
+    def bounding_box(self) -> Optional[Tuple[float, float, float, float]]:
+        """
+        Returns the spatial bounding box of the footprint, as min latitude, max latitude, min longitude,
+        max longitude, or None if the footprint is not spatially limited
+        """
+        if self.rect is not None:
+            return self.rect
+
+        if self.circle is not None:
+            latitude, longitude, _, max_radius = self.circle
+            if max_radius is None:
+                return None
+
+            min_lat = max(-90.0, latitude - max_radius)
+            max_lat = min(90.0, latitude + max_radius)
+            if min_lat <= -90 or max_lat >= 90:
+                return min_lat, max_lat, -180.0, 180.0
+
+            delta_lon = max_radius / max(math.cos(math.radians(max(abs(min_lat), abs(max_lat)))), 1e-6)
+            if delta_lon >= 180:
+                return min_lat, max_lat, -180.0, 180.0
+            return min_lat, max_lat, longitude - delta_lon, longitude + delta_lon
+
+        return None
+
+    def _spatially_contains(self, other: 'CatalogFootprint') -> bool:
+        """
+        Returns True if the spatial extent of this footprint contains the extent of another footprint
+        """
+        if self.rect is None and self.circle is None:
+            return True
+
+        if self.circle is not None:
+            if other.circle is None or other.circle[:2] != self.circle[:2]:
+                return False
+
+            min_radius, max_radius = self.circle[2:]
+            other_min_radius, other_max_radius = other.circle[2:]
+            if min_radius is not None and (other_min_radius is None or other_min_radius < min_radius):
+                return False
+            if max_radius is not None and (other_max_radius is None or other_max_radius > max_radius):
+                return False
+            return True
+
+        other_box = other.bounding_box()
+        if other_box is None:
+            return False
+
+        min_lat, max_lat, min_lon, max_lon = self.rect
+        other_min_lat, other_max_lat, other_min_lon, other_max_lon = other_box
+        return (other_min_lat >= min_lat and other_max_lat <= max_lat and
+                other_min_lon >= min_lon and other_max_lon <= max_lon)
+
+    def covers_time(self, msecs: Optional[int]) -> bool:
+        """
+        Returns True if the time window of the footprint contains a time, in milliseconds since epoch
+        """
+        if msecs is None:
+            # events without a time only match footprints without a time window
+            return self.start is None and self.end is None
+        return (self.start is None or msecs >= self.start) and (self.end is None or msecs <= self.end)
+
+    def contains(self, other: 'CatalogFootprint') -> bool:
+        """
+        Returns True if all events matching another footprint are also matched by this footprint
+        """
+        if self.service_id != other.service_id or self.format != other.format:
+            return False
+
+        if other.include_all and not self.include_all:
+            return False
+
+        if self.start is not None and (other.start is None or other.start < self.start):
+            return False
+        if self.end is not None and (other.end is None or other.end > self.end):
+            return False
+
+        if self.min_magnitude is not None and (other.min_magnitude is None or other.min_magnitude < self.min_magnitude):
+            return False
+        if self.max_magnitude is not None and (other.max_magnitude is None or other.max_magnitude > self.max_magnitude):
+            return False
+
+        if self.event_type is not None and other.event_type != self.event_type:
+            return False
+
+        return self._spatially_contains(other)
+
+
+class CatalogStore:
+    """
+    A local, persistent store of earthquake catalog results.
+
+    Events are stored as their original QuakeML or text representation, together with
+    indexed time, magnitude and location values so that queries which are covered by previously
+    fetched results can be answered locally. QuakeML events with all origins and magnitudes are
+    stored separately from events with only the preferred origin and magnitude.
+
+    The store is filled from replies as they are parsed in background tasks, so the connection is shared
+    between threads and all access is serialized.
+    """
+
+    DEFAULT_TTL = 24 * 60 * 60
+    DEFAULT_MAX_EVENTS = 1000000
+    DEFAULT_MAX_AGE_DAYS = 30
+
+    # overlap, in seconds, between successive incremental syncs (guards against clock differences
+    # between the client and the service)
+    SYNC_OVERLAP = 60
+
+    QUAKEML_TEMPLATE = '<?xml version="1.0" encoding="UTF-8"?><q:quakeml {}><eventParameters ' \
+                       'publicID="smi:local/qquake">{}</eventParameters></q:quakeml>'
+
+    DEFAULT_NAMESPACES = {
+        'xmlns': 'http://quakeml.org/xmlns/bed/1.2',
+        'xmlns:q': 'http://quakeml.org/xmlns/quakeml/1.2'
+    }
+
+    def __init__(self, path: Optional[Path] = None):
+        self._path = path
+        self._connection: Optional[sqlite3.Connection] = None
+        self._lock = threading.RLock()
+        self.has_rtree = True
+
+    def database_path(self) -> Path:
+        """
+        Returns the path to the store database
+        """
+        if self._path is not None:
+            return self._path
+
+        path = ServiceManager.user_service_path()
+        if not path.exists():
+            path.mkdir(parents=True)
+        return path / 'catalog.sqlite'
+
+    @staticmethod
+    def is_enabled() -> bool:
+        """
+        Returns True if the local catalog store is enabled
+        """
+        return QgsSettings().value('/plugins/qquake/local_catalog_enabled', False, bool)
+
+    @staticmethod
+    def max_events() -> int:
+        """
+        Returns the maximum number of events to store
+        """
+        return QgsSettings().value('/plugins/qquake/local_catalog_max_events', CatalogStore.DEFAULT_MAX_EVENTS, int)
+
+    @staticmethod
+    def max_age() -> int:
+        """
+        Returns the maximum age, in seconds, of stored events and footprints
+        """
+        return QgsSettings().value('/plugins/qquake/local_catalog_max_age_days', CatalogStore.DEFAULT_MAX_AGE_DAYS,
+                                   int) * 24 * 60 * 60
+
+    @staticmethod
+    def is_incremental_sync_enabled() -> bool:
+        """
+        Returns True if outdated stored results should be refreshed by fetching only the events
+        which were updated since the last sync
+        """
+        return QgsSettings().value('/plugins/qquake/local_catalog_incremental_sync', True, bool)
+
+    @staticmethod
+    def ttl_for_service(service_config: dict) -> int:
+        """
+        Returns the time, in seconds, for which locally stored results from a service are used to
+        answer queries
+        """
+        return int(service_config.get('settings', {}).get('querylocalcatalogttl', CatalogStore.DEFAULT_TTL))
+
+    def connection(self) -> sqlite3.Connection:
+        """
+        Returns the connection to the store database, creating the database if required
+        """
+        with self._lock:
+            if self._connection is None:
+                self._connection = self._create_connection()
+            return self._connection
+
+    def _create_connection(self) -> sqlite3.Connection:
+        """
+        Creates the connection to the store database, creating the database if required
+        """
+        connection = sqlite3.connect(str(self.database_path()), check_same_thread=False)
+        cursor = connection.cursor()
+        columns = [row[1] for row in cursor.execute('PRAGMA table_info(events)')]
+        if columns and 'include_all' not in columns:
+            # stores created by earlier versions are keyed differently, so their contents are discarded
+            for table in ('events', 'events_location', 'footprints'):
+                cursor.execute('DROP TABLE IF EXISTS {}'.format(table))
+
+        cursor.execute("""CREATE TABLE IF NOT EXISTS events (
+                            id INTEGER PRIMARY KEY,
+                            service_id TEXT NOT NULL,
+                            format TEXT NOT NULL,
+                            include_all INTEGER NOT NULL,
+                            event_id TEXT NOT NULL,
+                            time INTEGER,
+                            latitude REAL,
+                            longitude REAL,
+                            depth REAL,
+                            magnitude REAL,
+                            event_type TEXT,
+                            header TEXT,
+                            namespaces TEXT,
+                            content TEXT NOT NULL,
+                            stored REAL,
+                            UNIQUE (service_id, format, include_all, event_id))""")
+        cursor.execute('CREATE INDEX IF NOT EXISTS events_time ON events (service_id, format, time)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS events_stored ON events (stored)')
+        try:
+            cursor.execute('CREATE VIRTUAL TABLE IF NOT EXISTS events_location '
+                           'USING rtree(id, min_lon, max_lon, min_lat, max_lat)')
+        except sqlite3.OperationalError:
+            # sqlite built without the R*Tree module
+            self.has_rtree = False
+            cursor.execute('CREATE INDEX IF NOT EXISTS events_lat_lon ON events (latitude, longitude)')
+
+        cursor.execute("""CREATE TABLE IF NOT EXISTS footprints (
+                            key TEXT PRIMARY KEY,
+                            service_id TEXT NOT NULL,
+                            definition TEXT NOT NULL,
+                            fetched REAL NOT NULL)""")
+        connection.commit()
+        return connection
+
+    def close(self):
+        """
+        Closes the store database
+        """
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+    def _upsert_event(self, cursor: sqlite3.Cursor, values: Dict[str, object]):
+        """
+        Inserts or replaces a single event
+        """
+        cursor.execute('SELECT id FROM events WHERE service_id=? AND format=? AND include_all=? AND event_id=?',
+                       (values['service_id'], values['format'], values['include_all'], values['event_id']))
+        row = cursor.fetchone()
+        columns = ['service_id', 'format', 'include_all', 'event_id', 'time', 'latitude', 'longitude', 'depth', 'magnitude',
+                   'event_type', 'header', 'namespaces', 'content', 'stored']
+        if row:
+            row_id = row[0]
+            cursor.execute('UPDATE events SET {} WHERE id=?'.format(', '.join('{}=?'.format(c) for c in columns)),
+                           [values[c] for c in columns] + [row_id])
+            if self.has_rtree:
+                cursor.execute('DELETE FROM events_location WHERE id=?', (row_id,))
+        else:
+            cursor.execute('INSERT INTO events ({}) VALUES ({})'.format(', '.join(columns),
+                                                                        ', '.join('?' for _ in columns)),
+                           [values[c] for c in columns])
+            row_id = cursor.lastrowid
+
+        if self.has_rtree and values['latitude'] is not None and values['longitude'] is not None:
+            cursor.execute('INSERT INTO events_location (id, min_lon, max_lon, min_lat, max_lat) VALUES (?,?,?,?,?)',
+                           (row_id, values['longitude'], values['longitude'], values['latitude'],
+                            values['latitude']))
+
+    def add_quakeml(self, service_id: str, content: QByteArray, parser: QuakeMlParser,
+                    events: Optional[List[Event]] = None) -> int:
+        """
+        Adds (or updates) all events from a QuakeML reply to the store.
+
+        :param service_id: service ID
+        :param content: reply content
+        :param parser: parser containing the results parsed from the reply
+        :param events: events parsed from the reply, if not all events from the parser
+
+        Returns the number of events stored.
+        """
+        namespaces, event_contents = split_quakeml_events(content.data())
+        namespaces = json.dumps(namespaces)
+        # matches CatalogFootprint.include_all for the query
+        include_all = int(not (parser.preferred_origins_only and parser.preferred_magnitudes_only))
+
+        def optional(quantity) -> Optional[float]:
+            value = quantity.value if quantity is not None else None
+            return value if isinstance(value, (int, float)) and not math.isnan(value) else None
+
+        stored = time.time()
+        count = 0
+        with self._lock:
+            connection = self.connection()
+            cursor = connection.cursor()
+            for event in parser.events if events is None else events:
+                event_content = event_contents.get(event.publicID)
+                if event_content is None:
+                    continue
+
+                # only the preferred origin and magnitude values are indexed
+                origin = event.origins.get(event.preferredOriginID) or parser.origins.get(event.preferredOriginID)
+                magnitude = event.magnitudes.get(event.preferredMagnitudeID) or parser.magnitudes.get(
+                    event.preferredMagnitudeID)
+
+                values = {
+                    'service_id': service_id,
+                    'format': 'xml',
+                    'include_all': include_all,
+                    'event_id': event.publicID,
+                    'time': None,
+                    'latitude': optional(origin.latitude) if origin is not None else None,
+                    'longitude': optional(origin.longitude) if origin is not None else None,
+                    'depth': optional(origin.depth) if origin is not None else None,
+                    'magnitude': optional(magnitude.mag) if magnitude is not None else None,
+                    'event_type': event.type,
+                    'header': None,
+                    'namespaces': namespaces,
+                    'content': event_content,
+                    'stored': stored
+                }
+                if origin is not None and origin.time and origin.time.is_valid():
+                    values['time'] = to_msecs(origin.time.value)
+                if values['latitude'] is None or values['longitude'] is None:
+                    values['latitude'] = None
+                    values['longitude'] = None
+
+                self._upsert_event(cursor, values)
+                count += 1
+
+            connection.commit()
+        return count
+
+    def add_text(self, service_id: str, parser: BasicTextParser) -> int:
+        """
+        Adds (or updates) all events from a parsed text (or JSON) format reply to the store.
+
+        Returns the number of events stored.
+        """
+        def float_value(value) -> Optional[float]:
+            try:
+                return float(value)
+            except (TypeError, ValueError):
+                return None
+
+        stored = time.time()
+        count = 0
+        with self._lock:
+            connection = self.connection()
+            cursor = connection.cursor()
+            for row in parser.events:
+                if len(row) <= BasicTextParser.EVENT_TYPE_INDEX or not row[0]:
+                    continue
+
+                depth = float_value(row[BasicTextParser.DEPTH_INDEX])
+                self._upsert_event(cursor, {
+                    'service_id': service_id,
+                    'format': 'text',
+                    'include_all': 0,
+                    'event_id': str(row[0]),
+                    'time': to_msecs(BasicTextParser.event_time(row)),
+                    'latitude': float_value(row[BasicTextParser.LATITUDE_INDEX]),
+                    'longitude': float_value(row[BasicTextParser.LONGITUDE_INDEX]),
+                    'depth': depth * 1000 if depth is not None else None,
+                    'magnitude': float_value(row[BasicTextParser.MAGNITUDE_INDEX]),
+                    'event_type': row[BasicTextParser.EVENT_TYPE_INDEX] or None,
+                    'header': BasicTextParser.EVENT_HEADER,
+                    'namespaces': None,
+                    'content': '|'.join('' if value is None else str(value) for value in row),
+                    'stored': stored
+                })
+                count += 1
+
+            connection.commit()
+        return count
+
+    def add_parsed(self, service_id: str, content: QByteArray, parsed, events: Optional[List[Event]] = None) -> int:
+        """
+        Adds (or updates) all events from a parsed reply to the store
+
+        :param service_id: service ID
+        :param content: reply content
+        :param parsed: parser containing the results parsed from the reply
+        :param events: QuakeML events parsed from the reply, if not all events from the parser
+        """
+        if isinstance(parsed, QuakeMlParser):
+            count = self.add_quakeml(service_id, content, parsed, events)
+        else:
+            count = self.add_text(service_id, parsed)
+
+        self.evict(self.max_events(), self.max_age())
+        return count
+
+    def evict(self, max_events: int, max_age: float):
+        """
+        Removes events which were stored more than max_age seconds ago, and then the least recently stored
+        events until no more than max_events remain.
+
+        Footprints whose time window contains removed events are also removed, as they can no longer
+        be answered from the store.
+        """
+        with self._lock:
+            connection = self.connection()
+            cutoff = time.time() - max_age
+            evicted = connection.execute('SELECT id, service_id, format, time FROM events '
+                                         'WHERE stored IS NULL OR stored<?', (cutoff,)).fetchall()
+
+            excess = connection.execute('SELECT COUNT(*) FROM events').fetchone()[0] - len(evicted) - max_events
+            if excess > 0:
+                evicted.extend(connection.execute('SELECT id, service_id, format, time FROM events WHERE stored>=? '
+                                                  'ORDER BY stored LIMIT ?', (cutoff, excess)).fetchall())
+
+            if evicted:
+                ids = [(row[0],) for row in evicted]
+                connection.executemany('DELETE FROM events WHERE id=?', ids)
+                if self.has_rtree:
+                    connection.executemany('DELETE FROM events_location WHERE id=?', ids)
+
+                # sorted event times by service and format, with None for events without a time
+                evicted_times: Dict[Tuple[str, str], List[Optional[int]]] = {}
+                for _, service_id, result_format, event_time in evicted:
+                    evicted_times.setdefault((service_id, result_format), []).append(event_time)
+
+                for service_id in {service_id for service_id, _ in evicted_times}:
+                    for footprint, _ in self.footprints(service_id):
+                        times = evicted_times.get((service_id, footprint.format))
+                        if times is not None and self._covers_any_time(footprint, times):
+                            connection.execute('DELETE FROM footprints WHERE key=?', (footprint.key(),))
+
+            connection.execute('DELETE FROM footprints WHERE fetched<?', (cutoff,))
+            connection.commit()
+
+    @staticmethod
+    def _covers_any_time(footprint: CatalogFootprint, times: List[Optional[int]]) -> bool:
+        """
+        Returns True if the time window of a footprint contains any of a list of times
+        """
+        if None in times and footprint.covers_time(None):
+            return True
+
+        times = sorted(t for t in times if t is not None)
+        index = bisect.bisect_left(times, footprint.start) if footprint.start is not None else 0
+        return index < len(times) and footprint.covers_time(times[index])
+
+    def record_footprint(self, footprint: CatalogFootprint, fetched: Optional[float] = None):
+        """
+        Records that all events matching a footprint have been stored
+        """
+        with self._lock:
+            connection = self.connection()
+            connection.execute('INSERT OR REPLACE INTO footprints (key, service_id, definition, fetched) '
+                               'VALUES (?,?,?,?)',
+                               (footprint.key(), footprint.service_id, json.dumps(footprint.to_dict()),
+                                fetched if fetched is not None else time.time()))
+            connection.commit()
+
+    def footprints(self, service_id: str) -> List[Tuple[CatalogFootprint, float]]:
+        """
+        Returns all recorded footprints for a service, along with the time they were last fetched
+        """
+        with self._lock:
+            rows = self.connection().execute('SELECT definition, fetched FROM footprints WHERE service_id=?',
+                                             (service_id,)).fetchall()
+        return [(CatalogFootprint.from_dict(json.loads(definition)), fetched) for definition, fetched in rows]
+
+    def last_sync(self, footprint: CatalogFootprint) -> Optional[float]:
+        """
+        Returns the last time at which all events matching a footprint were fetched, or None if the
+        footprint has never been fetched
+        """
+        res = None
+        for covered, fetched in self.footprints(footprint.service_id):
+            if covered.contains(footprint) and (res is None or fetched > res):
+                res = fetched
+        return res
+
+    def covers(self, footprint: CatalogFootprint, ttl: int) -> bool:
+        """
+        Returns True if the store contains all events matching a footprint, fetched within the last ttl seconds
+        """
+        if ttl <= 0:
+            return False
+
+        last_sync = self.last_sync(footprint)
+        return last_sync is not None and time.time() - last_sync <= ttl
+
+    def matching_rows(self, footprint: CatalogFootprint,  # pylint: disable=too-many-branches
+                      columns: str = 'content') -> List[tuple]:
+        """
+        Returns the requested columns for all stored events matching a footprint, ordered by descending time
+
+        Queries for events with all origins and magnitudes only match events stored with all origins and
+        magnitudes. Other queries use the most recently stored version of each event.
+        """
+        conditions = ['e.service_id=?', 'e.format=?']
+        params: List[object] = [footprint.service_id, footprint.format]
+        if footprint.include_all:
+            conditions.append('e.include_all=1')
+
+        if footprint.start is not None:
+            conditions.append('e.time>=?')
+            params.append(footprint.start)
+        if footprint.end is not None:
+            conditions.append('e.time<=?')
+            params.append(footprint.end)
+        if footprint.min_magnitude is not None:
+            conditions.append('e.magnitude>=?')
+            params.append(footprint.min_magnitude)
+        if footprint.max_magnitude is not None:
+            conditions.append('e.magnitude<=?')
+            params.append(footprint.max_magnitude)
+        if footprint.event_type is not None:
+            conditions.append('e.event_type=?')
+            params.append(footprint.event_type)
+
+        join = ''
+        bounding_box = footprint.bounding_box()
+        if bounding_box is not None:
+            min_lat, max_lat, min_lon, max_lon = bounding_box
+            if self.has_rtree:
+                join = ' JOIN events_location l ON l.id=e.id'
+                conditions.extend(['l.min_lat>=?', 'l.max_lat<=?', 'l.min_lon>=?', 'l.max_lon<=?'])
+            else:
+                conditions.extend(['e.latitude>=?', 'e.latitude<=?', 'e.longitude>=?', 'e.longitude<=?'])
+            params.extend([min_lat, max_lat, min_lon, max_lon])
+        elif footprint.circle is not None:
+            conditions.append('e.latitude IS NOT NULL AND e.longitude IS NOT NULL')
+
+        sql = 'SELECT e.latitude, e.longitude, e.event_id, e.stored, {} FROM events e{} WHERE {} ' \
+              'ORDER BY e.time DESC'.format(columns, join, ' AND '.join(conditions))
+        with self._lock:
+            rows = self.connection().execute(sql, params).fetchall()
+
+        if footprint.circle is not None:
+            latitude, longitude, min_radius, max_radius = footprint.circle
+            res = []
+            for row in rows:
+                distance = angular_distance(latitude, longitude, row[0], row[1])
+                if min_radius is not None and distance < min_radius:
+                    continue
+                if max_radius is not None and distance > max_radius:
+                    continue
+                res.append(row)
+            rows = res
+
+        if not footprint.include_all:
+            latest = {}
+            for row in rows:
+                if row[2] not in latest or (row[3] or 0) > (latest[row[2]][3] or 0):
+                    latest[row[2]] = row
+            rows = [row for row in rows if latest[row[2]] is row]
+
+        return [row[4:] for row in rows]
+
+    def query_content(self, footprint: CatalogFootprint) -> QByteArray:
+        """
+        Returns all stored events matching a footprint, in the same format as a service reply
+        """
+        rows = self.matching_rows(footprint, 'e.header, e.namespaces, e.content')
+
+        if footprint.format == 'xml':
+            namespaces = dict(CatalogStore.DEFAULT_NAMESPACES)
+            for _, event_namespaces, _ in rows:
+                if event_namespaces:
+                    namespaces.update(json.loads(event_namespaces))
+
+            declarations = ' '.join('{}="{}"'.format(k, v) for k, v in namespaces.items())
+            return QByteArray(CatalogStore.QUAKEML_TEMPLATE.format(
+                declarations, ''.join(content for _, _, content in rows)).encode('utf8'))
+
+        header = rows[0][0] if rows else BasicTextParser.EVENT_HEADER
+        return QByteArray('\n'.join([header] + [content for _, _, content in rows]).encode('utf8'))
+
+    def event_count(self, service_id: Optional[str] = None) -> int:
+        """
+        Returns the number of events stored, optionally for a single service
+        """
+        with self._lock:
+            if service_id is None:
+                return self.connection().execute('SELECT COUNT(*) FROM events').fetchone()[0]
+            return self.connection().execute('SELECT COUNT(*) FROM events WHERE service_id=?',
+                                             (service_id,)).fetchone()[0]
+
+
+def circle_radii_in_degrees(min_radius: Optional[float], max_radius: Optional[float],
+                            unit: QgsUnitTypes.DistanceUnit) -> Tuple[Optional[float], Optional[float]]:
+    """
+    Converts circle radii to degrees
+    """
+    if unit == QgsUnitTypes.DistanceKilometers:
+        return (min_radius / KM_PER_DEGREE if min_radius is not None else None,
+                max_radius / KM_PER_DEGREE if max_radius is not None else None)
+    return min_radius, max_radius
+
+
+CATALOG_STORE = CatalogStore()
@@ -14,15 +14,19 @@ __copyright__ = 'Istituto Nazionale di Geofisica e Vulcanologia (INGV)'
 # This will get replaced with a git SHA1 when you do a git archive
 __revision__ = '$Format:%H$'
 
+import queue
 import re
+import time
 from pathlib import Path
-from typing import List, Tuple, Dict
+from typing import Callable, Iterable, List, Tuple, Dict
 from typing import Union, Optional
 
 from qgis.PyQt.QtCore import (
     Qt,
     QUrl,
+    QByteArray,
     QObject,
+    QTimer,
     pyqtSignal,
     QDateTime,
     QCoreApplication
@@ -30,28 +34,121 @@ from qgis.PyQt.QtCore import (
 from qgis.PyQt.QtNetwork import QNetworkRequest, QNetworkReply
 from qgis.core import (
     Qgis,
+    QgsApplication,
+    QgsFeature,
+    QgsFields,
+    QgsMessageLog,
     QgsNetworkAccessManager,
+    QgsTask,
     QgsVectorLayer,
-    QgsSettings,
     QgsUnitTypes,
+    QgsWkbTypes
 )
 
 from qquake.basic_text import (
     BasicTextParser,
-    BasicStationParser
+    BasicStationParser,
+    GeoJsonParser
 )
 
 from qquake.quakeml import (
     QuakeMlParser,
-    MissingOriginException
+    MissingOriginException,
+    InvalidXmlException
 )
+from qquake.quakeml.fields import OutputOptions
 from qquake.quakeml.fdsn_station import (
     FDSNStationXMLParser,
     Station,
     Fdsn
 )
-from qquake.services import SERVICE_MANAGER
+from qquake.services import (
+    SERVICE_MANAGER,
+    RESPONSE_CACHE
+)
 from qquake.style_utils import StyleUtils
+from qquake.catalog_store import (
+    CATALOG_STORE,
+    CatalogStore,
+    CatalogFootprint,
+    to_msecs,
+    circle_radii_in_degrees
+)
+from qquake.layer_output import LayerOutput
+from qquake.parse_cache import (
+    PARSE_CACHE,
+    ParseCache
+)
+from qquake.parse_pool import (
+    PARSE_POOL,
+    ParsePool
+)
+from qquake.parse_worker import parse_content
+
+
+class SplitRange:
+    """
+    A single date range from a split query
+    """
+
+    def __init__(self, start: QDateTime, end: QDateTime):
+        self.start = start
+        self.end = end
+        self.in_flight = False
+        self.content: Optional[QByteArray] = None
+        # results parsed from the content, once available
+        self.parsed = None
+
+
+class ReplyStream:
+    """
+    A reply which is parsed in a background task as its content is received
+    """
+
+    def __init__(self):
+        self.chunks: queue.Queue = queue.Queue()
+        self.received: List[bytes] = []
+        # complete reply content, once the reply is finished
+        self.content: Optional[QByteArray] = None
+
+    def add_data(self, data: bytes):
+        """
+        Adds content received for the reply
+        """
+        self.received.append(data)
+        self.chunks.put(data)
+
+    def complete(self) -> QByteArray:
+        """
+        Marks the reply as finished, and returns its complete content
+        """
+        self.content = QByteArray(b''.join(self.received))
+        self.received = []
+        self.chunks.put(None)
+        return self.content
+
+    def parse(self, task: QgsTask, parser: QuakeMlParser) -> Optional[QuakeMlParser]:
+        """
+        Parses the reply content as it is added, blocking until the reply is finished.
+
+        Returns the parser containing the results, or None if the task was canceled.
+        """
+        reader = parser.begin_stream()
+        while True:
+            try:
+                chunk = self.chunks.get(timeout=0.1)
+            except queue.Empty:
+                if task.isCanceled():
+                    return None
+                continue
+
+            if chunk is None:
+                break
+            reader.add_data(QByteArray(chunk))
+
+        if not reader.finish():
+            raise InvalidXmlException('Invalid QuakeML reply, {}'.format(reader.error_string()))
+        return parser
 
 
 class Fetcher(QObject):
@@ -65,13 +162,21 @@ class Fetcher(QObject):
     SPLIT_STRATEGY_YEAR = 'SPLIT_STRATEGY_YEAR'
     SPLIT_STRATEGY_MONTH = 'SPLIT_STRATEGY_MONTH'
     SPLIT_STRATEGY_DAY = 'SPLIT_STRATEGY_DAY'
+    SPLIT_STRATEGY_ADAPTIVE = 'SPLIT_STRATEGY_ADAPTIVE'
 
     STRATEGIES = {
+        QCoreApplication.translate('QQuake', 'Split Adaptively'): SPLIT_STRATEGY_ADAPTIVE,
         QCoreApplication.translate('QQuake', 'Split by Years'): SPLIT_STRATEGY_YEAR,
         QCoreApplication.translate('QQuake', 'Split by Months'): SPLIT_STRATEGY_MONTH,
         QCoreApplication.translate('QQuake', 'Split by Days'): SPLIT_STRATEGY_DAY,
     }
 
+    # default number of split range requests which can be in flight at once
+    DEFAULT_MAX_CONCURRENT_REQUESTS = 4
+    # maximum distance (as a multiple of the concurrent request limit) which split ranges are fetched
+    # ahead of the earliest unmerged range
+    SPLIT_RANGE_LOOK_AHEAD = 2
+
     started = pyqtSignal()
     progress = pyqtSignal(float)
     finished = pyqtSignal(bool)
@@ -144,6 +249,17 @@ class Fetcher(QObject):
         else:
             self.ranges = None
 
+        self.split_ranges: Optional[List[SplitRange]] = None
+        self.split_range_count = 0
+        self.active_split_replies: List[QNetworkReply] = []
+        self.is_aborted = False
+        # background tasks for parsing replies and building features
+        self.active_tasks: List[QgsTask] = []
+        # features built in the background once all results are fetched, by layer type
+        self.prepared_features: Dict[str, Union[List[QgsFeature], Exception]] = {}
+        self.max_concurrent_requests = max(1, int(self.service_config['settings'].get(
+            'querymaxconcurrentrequests', Fetcher.DEFAULT_MAX_CONCURRENT_REQUESTS)))
+
         self.event_min_magnitude = event_min_magnitude
         self.event_max_magnitude = event_max_magnitude
         self.event_type = event_type
@@ -173,12 +289,13 @@ class Fetcher(QObject):
         self.updated_after = updated_after
         self.url = url
 
-        s = QgsSettings()
-        self.preferred_origins_only = s.value('/plugins/qquake/output_preferred_origins', True, bool) or not \
+        # output settings are captured once, so that results are consistent if settings change mid-fetch
+        self.output_options = OutputOptions.from_settings()
+        self.preferred_origins_only = self.output_options.preferred_origins_only or not \
             self.service_config['settings'].get('queryincludeallorigins', False)
-        self.preferred_magnitudes_only = s.value('/plugins/qquake/output_preferred_magnitude', True, bool) or not \
+        self.preferred_magnitudes_only = self.output_options.preferred_magnitudes_only or not \
             self.service_config['settings'].get('queryincludeallmagnitudes', False)
-        self.preferred_mdp_only = s.value('/plugins/qquake/output_preferred_mdp', True, bool)
+        self.preferred_mdp_only = self.output_options.preferred_mdp_only
 
         self.output_fields = output_fields[:] if output_fields else []
 
@@ -190,20 +307,45 @@ class Fetcher(QObject):
             if not self.preferred_mdp_only and "!IsPrefMdpset" not in self.output_fields:
                 self.output_fields.append("!IsPrefMdpset")
 
-            self.result = QuakeMlParser(convert_negative_depths=self.convert_negative_depths,
-                                        depth_unit=self.depth_unit)
-        else:
-            self.result = BasicTextParser(convert_negative_depths=self.convert_negative_depths,
-                                          depth_unit=self.depth_unit)
+        # basic event results are requested as JSON instead of text, if preferred and supported by the service
+        self.json_format = GeoJsonParser.service_format(self.service_config) if (
+            self.output_type == self.BASIC and self.service_type == SERVICE_MANAGER.FDSNEVENT and self.url is None
+            and GeoJsonParser.is_enabled()) else None
+        self.is_local_catalog_result = False
+
+        self.result = self._create_result_parser()
 
         self.missing_origins = set()
         self.is_missing_origin_request = False
         self.require_mdp_basic_text_request = self.output_type == self.BASIC and self.service_type == SERVICE_MANAGER.MACROSEISMIC
         self.is_mdp_basic_text_request = False
         self.is_first_request = True
+        self.reply_stream: Optional[ReplyStream] = None
+        self.is_incremental_sync = False
+        self.sync_started: Optional[float] = None
         self.query_limit = None
         self.styles = styles
 
+    def _create_result_parser(self) -> Union[QuakeMlParser, BasicTextParser]:
+        """
+        Creates a new parser for event results
+        """
+        if self.output_type == self.EXTENDED:
+            return QuakeMlParser(convert_negative_depths=self.convert_negative_depths,
+                                 depth_unit=self.depth_unit,
+                                 output_options=self.output_options,
+                                 preferred_origins_only=self.preferred_origins_only,
+                                 preferred_magnitudes_only=self.preferred_magnitudes_only,
+                                 output_fields=self.output_fields)
+
+        if self.json_format is not None and not self.is_local_catalog_result:
+            # locally stored results are always in the text format
+            return GeoJsonParser(convert_negative_depths=self.convert_negative_depths,
+                                 depth_unit=self.depth_unit)
+
+        return BasicTextParser(convert_negative_depths=self.convert_negative_depths,
+                               depth_unit=self.depth_unit)
+
     def suggest_split_strategy(self) -> str:
         """
         Suggests a split strategy based on the fetchers' date range
@@ -230,6 +372,10 @@ class Fetcher(QObject):
         """
         Splits a date range by the specified strategy
         """
+        if strategy == Fetcher.SPLIT_STRATEGY_ADAPTIVE:
+            # ranges are only split further if they exceed the service's result limit
+            return [(begin, end)]
+
         res = []
         current = begin
         while current < end:
@@ -248,15 +394,91 @@ class Fetcher(QObject):
 
         return res
 
-    def generate_url(self):  # pylint: disable=too-many-statements,too-many-branches
+    @staticmethod
+    def bisect_range(begin: QDateTime, end: QDateTime) -> Optional[List[Tuple[QDateTime, QDateTime]]]:
+        """
+        Splits a date range into two halves, or returns None if the range
+        is too short to be split any further.
+
+        The halves share their boundary, so that no events are missed between them. Events
+        at the boundary are returned for both halves, and are de-duplicated when merged.
+        """
+        seconds = begin.secsTo(end)
+        if seconds < 2:
+            return None
+
+        middle = begin.addSecs(seconds // 2)
+        return [(begin, middle), (middle, end)]
+
+    def can_resume_with_split_strategy(self) -> bool:
+        """
+        Returns True if the fetcher can continue an oversized query using a split strategy, keeping
+        the results which have already been fetched
+        """
+        # macroseismic queries fetch per-event details based on the initial results, so these must be
+        # rerun from scratch
+        return self.url is None and self.service_type == SERVICE_MANAGER.FDSNEVENT and self.split_strategy is None
+
+    def resume_with_split_strategy(self, split_strategy: str) -> bool:
+        """
+        Continues an oversized query using a split strategy.
+
+        Services return events ordered by descending time, so the results already fetched are complete
+        from the earliest returned event onwards. These events are kept and only the time span which
+        was not covered is requested.
+
+        Returns False if the query could not be resumed.
+        """
+        if not self.can_resume_with_split_strategy():
+            return False
+
+        earliest_time = self.result.earliest_event_time()
+        if earliest_time is None:
+            return False
+
+        start_date = self.event_start_date if self.event_start_date is not None else QDateTime.fromString(
+            self.service_config.get('datestart'), Qt.ISODate)
+        end_date = self.event_end_date if self.event_end_date is not None else (
+            QDateTime.fromString(self.service_config.get('dateend'), Qt.ISODate) if self.service_config.get(
+                'dateend') else QDateTime.currentDateTime()
+        )
+
+        # requests are made with a precision of seconds, so refetch the whole second containing the earliest
+        # event (other events may have been truncated from the same second)
+        boundary = earliest_time.addMSecs(-earliest_time.time().msec()).addSecs(1)
+        if not start_date.isValid() or boundary <= start_date:
+            return False
+
+        self.result.remove_events_until(boundary)
+
+        self.split_strategy = split_strategy
+        self.exceeded_limit = False
+        self.event_start_date_limit = start_date
+        self.event_end_date_limit = end_date
+
+        self.ranges = Fetcher.split_range_by_strategy(self.split_strategy, start_date, boundary)
+        self.event_start_date, self.event_end_date = self.ranges[0]
+        del self.ranges[0]
+        self.split_ranges = None
+
+        self.fetch_data()
+        return True
+
+    def generate_url(self,  # pylint: disable=too-many-statements,too-many-branches
+                     include_pending_event_id: bool = True):
         """
         Returns the URL request for the query
+
+        :param include_pending_event_id: if False, the URL is for the full query rather than the
+         next pending event (e.g. for split range requests)
         """
         if self.url is not None:
             return self.url
 
         if self.is_mdp_basic_text_request:
             result_format = 'textmacro'
+        elif self.json_format is not None:
+            result_format = self.json_format
         else:
             result_format = 'text' if self.output_type == Fetcher.BASIC else 'xml'
 
@@ -316,8 +538,9 @@ class Fetcher(QObject):
             self.query_limit = self.service_config['settings']['querylimitmaxentries']
             query.append('limit={}'.format(self.query_limit))
 
-        if self.pending_event_ids:
-            query.append('eventid={}'.format(self.pending_event_ids[0]))
+        event_id = self.pending_event_ids[0] if include_pending_event_id and self.pending_event_ids else None
+        if event_id:
+            query.append('eventid={}'.format(event_id))
 
         if self.station_codes:
             query.append('station={}'.format(self.station_codes))
@@ -333,12 +556,10 @@ class Fetcher(QObject):
 
         if self.output_type == Fetcher.EXTENDED:
             if not self.preferred_origins_only:
-                if self.pending_event_ids or self.service_config['settings'].get('queryincludeallorigins_multiple',
-                                                                                 False):
+                if event_id or self.service_config['settings'].get('queryincludeallorigins_multiple', False):
                     query.append('includeallorigins=true')
             if not self.preferred_magnitudes_only:
-                if self.pending_event_ids or self.service_config['settings'].get('queryincludeallmagnitudes_multiple',
-                                                                                 False):
+                if event_id or self.service_config['settings'].get('queryincludeallmagnitudes_multiple', False):
                     query.append('includeallmagnitudes=true')
 
         if self.service_type == SERVICE_MANAGER.MACROSEISMIC:
@@ -356,13 +577,359 @@ class Fetcher(QObject):
             self.started.emit()
             self.is_first_request = False
 
-        request = QNetworkRequest(QUrl(self.generate_url()))
+            if self._fetch_from_catalog_store():
+                return
+
+        if self.ranges is not None and self.split_ranges is None:
+            # first request for a split query -- queue up all the ranges and fire off the initial batch
+            self.split_ranges = [SplitRange(self.event_start_date, self.event_end_date)] + \
+                                [SplitRange(start, end) for start, end in self.ranges]
+            self.split_range_count = len(self.split_ranges)
+            self.ranges = []
+            self._dispatch_split_ranges()
+            return
+
+        self._fetch_url(self.generate_url())
+
+    def catalog_footprint(self) -> Optional[CatalogFootprint]:
+        """
+        Returns the footprint of the query in the local catalog store, or None if the
+        query cannot be stored or answered locally
+        """
+        if self.url is not None or self.service_type != SERVICE_MANAGER.FDSNEVENT:
+            return None
+
+        if self.event_ids or self.contributor_id:
+            return None
+
+        # an explicit updated after filter is part of the user's query, so those results are incomplete
+        if not self.is_incremental_sync and self.updated_after is not None and self.updated_after.isValid():
+            return None
+
+        rect = None
+        circle = None
+        if self.limit_extent_rect:
+            rect = (self.min_latitude if self.min_latitude is not None else -90,
+                    self.max_latitude if self.max_latitude is not None else 90,
+                    self.min_longitude if self.min_longitude is not None else -180,
+                    self.max_longitude if self.max_longitude is not None else 180)
+        elif self.limit_extent_circle and self.circle_latitude is not None and self.circle_longitude is not None and \
+                (self.circle_min_radius is not None or self.circle_max_radius is not None):
+            min_radius, max_radius = circle_radii_in_degrees(self.circle_min_radius, self.circle_max_radius,
+                                                             self.circle_radius_unit)
+            circle = (self.circle_latitude, self.circle_longitude, min_radius, max_radius)
+
+        return CatalogFootprint(service_id=self.service_id,
+                                result_format='text' if self.output_type == Fetcher.BASIC else 'xml',
+                                include_all=self.output_type == Fetcher.EXTENDED and not (
+                                    self.preferred_origins_only and self.preferred_magnitudes_only),
+                                start=to_msecs(self.event_start_date_limit),
+                                end=to_msecs(self.event_end_date_limit),
+                                min_magnitude=self.event_min_magnitude,
+                                max_magnitude=self.event_max_magnitude,
+                                event_type=self.event_type,
+                                rect=rect,
+                                circle=circle)
+
+    def _fetch_from_catalog_store(self) -> bool:
+        """
+        Answers the query from the local catalog store, if the store contains all matching events.
+
+        If the stored events are outdated, the query is switched to an incremental sync which
+        only requests the events updated since the last sync.
+
+        Returns False if the query must be requested from the service.
+        """
+        if not CATALOG_STORE.is_enabled():
+            return False
+
+        footprint = self.catalog_footprint()
+        if footprint is None:
+            return False
+
+        self.sync_started = time.time()
+        last_sync = CATALOG_STORE.last_sync(footprint)
+        if last_sync is None:
+            return False
+
+        if self.sync_started - last_sync <= CATALOG_STORE.ttl_for_service(self.service_config):
+            self.message.emit(self.tr('Using locally stored results'), Qgis.Info)
+            self.is_local_catalog_result = True
+            self.ranges = None
+            self.event_start_date = self.event_start_date_limit
+            self.event_end_date = self.event_end_date_limit
+
+            content = CATALOG_STORE.query_content(footprint)
+            # always deliver content asynchronously, matching the network request behavior
+            QTimer.singleShot(0, lambda c=content: self._content_received(c))
+            return True
+
+        if CATALOG_STORE.is_incremental_sync_enabled():
+            self.is_incremental_sync = True
+
+            # services expect times without an explicit time zone, in UTC
+            updated_after = QDateTime.fromSecsSinceEpoch(int(last_sync) - CatalogStore.SYNC_OVERLAP, Qt.UTC)
+            self.updated_after = QDateTime(updated_after.date(), updated_after.time())
+            self.message.emit(self.tr('Fetching events updated since {}').format(
+                self.updated_after.toString(Qt.ISODate)), Qgis.Info)
+
+        return False
+
+    def _should_store_in_catalog(self) -> bool:
+        """
+        Returns True if the events from replies should be added to the local catalog store
+        """
+        return not self.is_local_catalog_result and CATALOG_STORE.is_enabled() and \
+            self.catalog_footprint() is not None
+
+    def _load_from_catalog_store(self, on_loaded: Callable[[], None]):
+        """
+        Replaces the fetched results with all stored events matching the query.
+
+        The stored events are parsed in a background task, and on_loaded is called once the results
+        have been replaced.
+        """
+        content = CATALOG_STORE.query_content(self.catalog_footprint())
+        self.is_local_catalog_result = True
+
+        def stored_parsed(parsed):
+            self.result = parsed
+            if self.output_type == self.EXTENDED:
+                self.missing_origins = self.result.scan_for_missing_origins()
+            on_loaded()
+
+        self._parse_in_background(content, stored_parsed)
+
+    def _finish_fetch(self):
+        """
+        Called when all results have been fetched
+        """
+        if not self.is_local_catalog_result and CATALOG_STORE.is_enabled():
+            footprint = self.catalog_footprint()
+            if footprint is not None:
+                if not self.exceeded_limit:
+                    CATALOG_STORE.record_footprint(footprint, self.sync_started)
+                elif self.is_incremental_sync:
+                    self.message.emit(self.tr('Too many events were updated since the last sync, stored results '
+                                              'are incomplete'), Qgis.Warning)
+
+            if self.is_incremental_sync:
+                # the updated events have been merged into the store, so the complete results
+                # are now available locally
+                self._load_from_catalog_store(
+                    lambda: self._fetch_next() if self.missing_origins else self._prepare_features())
+                return
+
+        self._prepare_features()
+
+    def is_past_time_window(self) -> bool:
+        """
+        Returns True if the requested time window ends in the past, so that no new events
+        can be added to its results
+        """
+        return self.url is None and self.event_end_date is not None and self.event_end_date.isValid() and \
+            to_msecs(self.event_end_date) < QDateTime.currentMSecsSinceEpoch()
+
+    def _fetch_url(self, url: str, split_range: Optional[SplitRange] = None):
+        """
+        Requests a URL, using cached content where available
+        """
+        use_cache = RESPONSE_CACHE.is_enabled() and RESPONSE_CACHE.is_cacheable(url)
+        if use_cache:
+            # results for open ended or future time windows can gain new events at any time, so cached
+            # content for these is always revalidated
+            ttl = RESPONSE_CACHE.ttl_for_service(self.service_config) if self.is_past_time_window() else 0
+            content = RESPONSE_CACHE.fresh_content(url, ttl)
+            if content is not None:
+                # always deliver content asynchronously, matching the network request behavior
+                QTimer.singleShot(0, lambda c=content, s=split_range: self._content_received(c, s))
+                return
+
+        request = QNetworkRequest(QUrl(url))
         request.setAttribute(QNetworkRequest.FollowRedirectsAttribute, True)
+        if use_cache:
+            RESPONSE_CACHE.add_validators(request, url)
 
         reply = QgsNetworkAccessManager.instance().get(request)
 
-        reply.finished.connect(lambda r=reply: self._reply_finished(r))
-        reply.downloadProgress.connect(self._reply_progress)
+        if split_range is not None:
+            self.active_split_replies.append(reply)
+        else:
+            reply.downloadProgress.connect(self._reply_progress)
+            if self._can_stream_reply():
+                reply.readyRead.connect(lambda r=reply: self._reply_data_received(r))
+
+        reply.finished.connect(lambda r=reply, u=url, s=split_range: self._reply_finished(r, u, s))
+
+    def _dispatch_split_ranges(self):
+        """
+        Fires off requests for queued split ranges, up to the maximum number of concurrent requests.
+
+        Only ranges within the look ahead window are fetched, so that the completed ranges which are
+        waiting for an earlier range to finish before they can be merged remain bounded.
+        """
+        in_flight = len([r for r in self.split_ranges if r.in_flight])
+        look_ahead = self.max_concurrent_requests * Fetcher.SPLIT_RANGE_LOOK_AHEAD
+        for split_range in self.split_ranges[:look_ahead]:
+            if in_flight >= self.max_concurrent_requests:
+                break
+
+            if split_range.in_flight or split_range.content is not None:
+                continue
+
+            self._fetch_split_range(split_range)
+            in_flight += 1
+
+    def _fetch_split_range(self, split_range: SplitRange):
+        """
+        Fetches a single split range
+        """
+        self.event_start_date, self.event_end_date = split_range.start, split_range.end
+        split_range.in_flight = True
+
+        self._fetch_url(self.generate_url(include_pending_event_id=False), split_range)
+
+    def _abort(self, error: str):
+        """
+        Aborts the fetch, cancelling all pending requests and background tasks
+        """
+        self.is_aborted = True
+        self._abort_split_ranges()
+        for task in self.active_tasks:
+            task.cancel()
+        self.message.emit(error, Qgis.Critical)
+        self.finished.emit(False)
+
+    def _run_task(self, description: str, function: Callable[[QgsTask], object], on_finished: Callable[[object], None],
+                  report_progress: bool = False):
+        """
+        Runs a function in a background task.
+
+        on_finished will be called on the main thread with the function's result once the task is complete.
+        If the task fails or is canceled then the fetch is aborted.
+        """
+
+        def task_finished(exception, result=None):
+            self.active_tasks.remove(task)
+            if self.is_aborted:
+                return
+
+            if task.isCanceled():
+                self._abort(self.tr('Canceled'))
+            elif exception is not None:
+                self._abort(self.tr('Error: {}').format(exception))
+            else:
+                on_finished(result)
+
+        task = QgsTask.fromFunction(description, function, on_finished=task_finished)
+        if report_progress:
+            task.progressChanged.connect(self.progress)
+        # tasks must be kept alive until they are finished
+        self.active_tasks.append(task)
+        QgsApplication.taskManager().addTask(task)
+
+    def _parse_in_background(self, content: QByteArray, on_parsed: Callable[[object], None]):
+        """
+        Parses reply content into a new results object in a background task.
+
+        on_parsed will be called on the main thread with the parsed results, which can then
+        be added to the fetcher's results.
+        """
+        # parsers are created on the main thread, while the output settings are resolved
+        if self.service_type == SERVICE_MANAGER.FDSNSTATION:
+            parser = BasicStationParser() if self.output_type == self.BASIC else None
+        else:
+            parser = self._create_result_parser()
+        if parser is None:
+            mode = ParsePool.MODE_STATIONS
+        elif self.is_mdp_basic_text_request:
+            mode = ParsePool.MODE_MDP
+        elif isinstance(parser, QuakeMlParser):
+            mode = ParsePool.MODE_INITIAL
+        else:
+            mode = ParsePool.MODE_PARSE
+        use_parse_pool = PARSE_POOL.is_available()
+        use_parse_cache = PARSE_CACHE.is_enabled()
+        # the already parsed events are stored, rather than parsing the reply again
+        store_in_catalog = mode in (ParsePool.MODE_INITIAL, ParsePool.MODE_PARSE) and self._should_store_in_catalog()
+        service_id = self.service_id
+
+        def parse(task: QgsTask):
+            if task.isCanceled():
+                return None
+
+            parsed = None
+            cache_key = None
+            if use_parse_cache:
+                # unchanged replies (e.g. from the response cache) are restored without parsing
+                cache_key = ParseCache.key(parser, content, mode)
+                parsed = PARSE_CACHE.retrieve(cache_key)
+
+            if parsed is None:
+                parsed = PARSE_POOL.parse(parser, content, mode) if use_parse_pool else None
+                if parsed is None:
+                    parsed = parse_content(parser, content, mode)
+
+                if cache_key is not None:
+                    PARSE_CACHE.store(cache_key, parsed)
+
+            if store_in_catalog:
+                CATALOG_STORE.add_parsed(service_id, content, parsed)
+            return parsed
+
+        self._run_task(self.tr('Parsing {}').format(self.service_id), parse, on_parsed)
+
+    def _abort_split_ranges(self):
+        """
+        Aborts all in flight split range requests
+        """
+        replies = self.active_split_replies
+        self.active_split_replies = []
+        for reply in replies:
+            reply.finished.disconnect()
+            reply.abort()
+
+    def _bisect_saturated_range(self, split_range: SplitRange, content: QByteArray) -> bool:
+        """
+        Replaces a split range with its two halves if its reply reached the service's result limit.
+
+        Returns True if the range was bisected and its reply should be discarded.
+        """
+        if not self.query_limit or self.result.count_events(content) < self.query_limit:
+            return False
+
+        halves = Fetcher.bisect_range(split_range.start, split_range.end)
+        if not halves:
+            return False
+
+        index = self.split_ranges.index(split_range)
+        self.split_ranges[index:index + 1] = [SplitRange(start, end) for start, end in halves]
+        self.split_range_count += 1
+        return True
+
+    def _split_range_finished(self):
+        """
+        Parses all completed split ranges in chronological order, and then
+        either fetches the next ranges or continues with any follow up requests
+        """
+        while self.split_ranges and self.split_ranges[0].parsed is not None:
+            split_range = self.split_ranges.pop(0)
+            self._parse_reply(split_range.content, split_range.parsed, is_split_range_reply=True)
+
+        completed = self.split_range_count - len(self.split_ranges)
+        self.progress.emit(float(completed) / self.split_range_count * 100)
+
+        if self.split_ranges:
+            self._dispatch_split_ranges()
+        else:
+            # restore the full date range for any follow up requests
+            self.event_start_date = self.event_start_date_limit
+            self.event_end_date = self.event_end_date_limit
+            if self.output_type == self.EXTENDED and \
+                    self.service_type in (SERVICE_MANAGER.FDSNEVENT, SERVICE_MANAGER.MACROSEISMIC):
+                # per event requests are only queued once the events from all ranges are available
+                self._queue_event_requests()
+            self._fetch_next()
 
     def fetch_missing(self):
         """
@@ -383,13 +950,7 @@ class Fetcher(QObject):
 
         self.is_missing_origin_request = True
 
-        request = QNetworkRequest(QUrl(next_origin))
-        request.setAttribute(QNetworkRequest.FollowRedirectsAttribute, True)
-
-        reply = QgsNetworkAccessManager.instance().get(request)
-
-        reply.finished.connect(lambda r=reply: self._reply_finished(r))
-        reply.downloadProgress.connect(self._reply_progress)
+        self._fetch_url(next_origin)
 
     def fetch_next_event_by_id(self):
         """
@@ -409,12 +970,7 @@ class Fetcher(QObject):
 
         self.pending_event_ids = self.macro_pending_event_ids[:1]
         self.macro_pending_event_ids = self.macro_pending_event_ids[1:]
-        request = QNetworkRequest(QUrl(self.generate_url()))
-        request.setAttribute(QNetworkRequest.FollowRedirectsAttribute, True)
-
-        reply = QgsNetworkAccessManager.instance().get(request)
-        reply.finished.connect(lambda r=reply: self._reply_finished(r))
-        reply.downloadProgress.connect(self._reply_progress)
+        self._fetch_url(self.generate_url())
 
     def _reply_progress(self, received, total):
         """
@@ -423,118 +979,359 @@ class Fetcher(QObject):
         if total > 0:
             self.progress.emit(float(received) / total * 100)
 
-    def _reply_finished(self, reply: QNetworkReply):  # pylint: disable=too-many-branches,too-many-statements
+    def _can_stream_reply(self) -> bool:
+        """
+        Returns True if the current reply can be parsed incrementally, as it is received
+        """
+        # when parsing in worker processes or using the parse cache, replies are parsed once complete instead
+        return self.output_type == self.EXTENDED and \
+            self.service_type in (SERVICE_MANAGER.FDSNEVENT, SERVICE_MANAGER.MACROSEISMIC) and \
+            not self.is_missing_origin_request and not PARSE_POOL.is_available() and not PARSE_CACHE.is_enabled()
+
+    def _begin_stream(self) -> ReplyStream:
+        """
+        Starts parsing the current reply in a background task, as its content is received
+        """
+        stream = ReplyStream()
+        parser = self._create_result_parser()
+        store_in_catalog = self._should_store_in_catalog()
+        service_id = self.service_id
+
+        def parse(task: QgsTask):
+            parsed = stream.parse(task, parser)
+            if parsed is not None and store_in_catalog:
+                CATALOG_STORE.add_parsed(service_id, stream.content, parsed)
+            return parsed
+
+        self._run_task(self.tr('Parsing {}').format(self.service_id), parse,
+                       lambda parsed: self._content_received(stream.content, parsed=parsed))
+        return stream
+
+    def _reply_data_received(self, reply: QNetworkReply):
+        """
+        Triggered when content is received for a reply which can be parsed incrementally
+        """
+        if reply.attribute(QNetworkRequest.HttpStatusCodeAttribute) != 200:
+            # leave content for non-standard replies to be handled when the reply is finished
+            return
+
+        data = reply.readAll()
+        if self.reply_stream is None:
+            self.reply_stream = self._begin_stream()
+
+        self.reply_stream.add_data(data.data())
+
+    def _reply_finished(self, reply: QNetworkReply, url: str, split_range: Optional[SplitRange] = None):
         """
         Triggered when a reply is finished
         """
+        if split_range is not None:
+            self.active_split_replies.remove(reply)
+
+        stream = self.reply_stream if split_range is None else None
+        self.reply_stream = None
+
         if reply.error() != QNetworkReply.NoError:
-            self.message.emit(self.tr('Error: {}').format(reply.errorString()), Qgis.Critical)
-            self.finished.emit(False)
+            self._abort(self.tr('Error: {}').format(reply.errorString()))
+            return
+
+        if reply.attribute(QNetworkRequest.HttpStatusCodeAttribute) == 304:
+            # cached content is still valid
+            content = RESPONSE_CACHE.revalidated(url)
+            if content is None:
+                # cached content was evicted while the request was in flight
+                self._fetch_url(url, split_range)
+                return
+        else:
+            content = reply.readAll()
+            if stream is not None:
+                # the reply has been parsed as it was received, just the final content remains
+                stream.add_data(content.data())
+                content = stream.complete()
+
+            if RESPONSE_CACHE.is_enabled() and RESPONSE_CACHE.is_cacheable(url):
+                etag = reply.rawHeader(b'ETag').data().decode() or None
+                last_modified = reply.rawHeader(b'Last-Modified').data().decode() or None
+                RESPONSE_CACHE.store(url, content, etag, last_modified)
+
+        if stream is not None:
+            # the results are added once the background task has parsed the remaining content
+            return
+
+        self._content_received(content, split_range)
+
+    def _content_received(self, content: QByteArray, split_range: Optional[SplitRange] = None,
+                          parsed=None):
+        """
+        Triggered when the content for a request has been received, either from the network or the cache
+
+        :param parsed: results parsed from the content, if the content was parsed as it was received
+        """
+        if self.is_aborted:
+            return
+
+        if split_range is not None:
+            split_range.in_flight = False
+            if self._bisect_saturated_range(split_range, content):
+                self._split_range_finished()
+                return
+
+            split_range.content = content
+
+            def split_range_parsed(parsed):
+                split_range.parsed = parsed
+                self._split_range_finished()
+
+            # ranges are parsed in parallel, while the next ranges are fetched
+            self._parse_in_background(content, split_range_parsed)
+            self._dispatch_split_ranges()
+            return
+
+        if self.is_missing_origin_request:
+            # missing origin replies only contain a single event
+            try:
+                self._parse_reply(content)
+            except InvalidXmlException as e:
+                self._abort(self.tr('Error: {}').format(e))
+                return
+            self._fetch_next()
             return
 
-        if self.output_type == self.EXTENDED:  # pylint:disable=too-many-nested-blocks
+        def reply_parsed(parsed):
+            self._parse_reply(content, parsed)
+            self._fetch_next()
+
+        if parsed is not None:
+            reply_parsed(parsed)
+        else:
+            self._parse_in_background(content, reply_parsed)
+
+    def _queue_event_requests(self, had_events_ids: bool = False):
+        """
+        Queues the per event requests required to complete the initial results, if any
+
+        :param had_events_ids: True if the initial results were requested by event id
+        """
+        if self.service_type == SERVICE_MANAGER.MACROSEISMIC and not self.event_ids:
+            # for a macroseismic parameter based search, we have to then go and fetch events
+            # one by one in order to get all the mdp location information required
+            self.pending_event_ids = [e.publicID for e in self.result.events]
+        elif not had_events_ids and ((not self.service_config['settings'].get(
+                'queryincludeallorigins_multiple', False) and not self.preferred_origins_only) or
+                                     (not self.service_config['settings'].get(
+                                         'queryincludeallmagnitudes_multiple',
+                                         False) and not self.preferred_magnitudes_only)):
+            # hmmm....
+            extract_numeric_id_regex = re.compile('^.*=(.*?)$')
+            self.pending_event_ids = []
+            for e in self.result.events:
+                public_id = e.publicID
+                id_match = extract_numeric_id_regex.match(public_id)
+                assert id_match
+                self.pending_event_ids.append(id_match.group(1))
+
+    def _parse_reply(self, content: QByteArray,  # pylint: disable=too-many-branches
+                     parsed=None,
+                     is_split_range_reply: bool = False):
+        """
+        Adds the content of a finished reply to the results.
+
+        :param content: reply content
+        :param parsed: results parsed from the content in a background task, if available
+        :param is_split_range_reply: True if the reply is for a split range
+        """
+        if self.output_type == self.EXTENDED:
             if self.service_type in (SERVICE_MANAGER.FDSNEVENT, SERVICE_MANAGER.MACROSEISMIC):
                 if self.is_missing_origin_request:
-                    self.result.parse_missing_origin(reply.readAll())
+                    self.result.parse_missing_origin(content)
                     self.is_missing_origin_request = False
                 else:
-                    had_events_ids = bool(self.pending_event_ids)
-                    if self.pending_event_ids:
+                    had_events_ids = not is_split_range_reply and bool(self.pending_event_ids)
+                    if had_events_ids:
                         self.pending_event_ids = self.pending_event_ids[1:]
 
                     prev_event_count = len(self.result.events)
+                    if not self.result.events:
+                        self.result.clear()
+                    self.result.merge(parsed, unique_events=is_split_range_reply)
 
-                    if self.result.events:
-                        self.result.add_events(reply.readAll())
-                    else:
-                        self.result.parse_initial(reply.readAll())
-                        if self.service_type == SERVICE_MANAGER.MACROSEISMIC and not self.event_ids:
-                            # for a macroseismic parameter based search, we have to then go and fetch events
-                            # one by one in order to get all the mdp location information required
-                            self.pending_event_ids = [e.publicID for e in self.result.events]
-                        elif not had_events_ids and ((not self.service_config['settings'].get(
-                                'queryincludeallorigins_multiple', False) and not self.preferred_origins_only) or
-                                                     (not self.service_config['settings'].get(
-                                                         'queryincludeallmagnitudes_multiple',
-                                                         False) and not self.preferred_magnitudes_only)):
-                            # hmmm....
-                            extract_numeric_id_regex = re.compile('^.*=(.*?)$')
-                            self.pending_event_ids = []
-                            for e in self.result.events:
-                                public_id = e.publicID
-                                id_match = extract_numeric_id_regex.match(public_id)
-                                assert id_match
-                                self.pending_event_ids.append(id_match.group(1))
+                    if not prev_event_count and not is_split_range_reply:
+                        self._queue_event_requests(had_events_ids)
 
                     if self.query_limit and len(self.result.events) - prev_event_count >= self.query_limit:
                         self.exceeded_limit = True
 
                     self.missing_origins = self.missing_origins.union(self.result.scan_for_missing_origins())
             elif self.service_type == SERVICE_MANAGER.FDSNSTATION:
-                self.result = FDSNStationXMLParser.parse(reply.readAll())
+                self.result = parsed
             else:
                 assert False
+        else:
+            # basic output types
+            if self.service_type == SERVICE_MANAGER.FDSNSTATION:
+                self.result = parsed
+            else:
+                if self.pending_event_ids and not is_split_range_reply:
+                    self.pending_event_ids = self.pending_event_ids[1:]
 
+                if not self.is_mdp_basic_text_request:
+                    prev_event_count = len(self.result.events)
+                    self.result.merge(parsed, unique_events=is_split_range_reply)
+
+                    if self.query_limit and len(self.result.events) - prev_event_count >= self.query_limit:
+                        self.exceeded_limit = True
+                else:
+                    self.result.merge(parsed)
+
+    def _fetch_next(self):  # pylint: disable=too-many-branches
+        """
+        Fires off the next request required to complete the results, or emits the finished signal
+        when all results have been fetched
+        """
+        if self.output_type == self.EXTENDED:
             if self.missing_origins:
                 if self.url is not None:
                     self.message.emit(
                         self.tr('QuakeML file is incomplete. {} origins are missing from the data').format(
                             len(self.missing_origins)),
                         Qgis.Warning)
-                    self.finished.emit(True)
+                    self._prepare_features()
                 else:
                     self.fetch_missing()
             elif self.pending_event_ids:
                 self.fetch_next_event_by_id()
-            elif self.ranges:
-                # fetch next range
-                self.event_start_date, self.event_end_date = self.ranges[0]
-                del self.ranges[0]
-                self.fetch_data()
             else:
-                self.finished.emit(True)
+                self._finish_fetch()
         else:
             # basic output types
             if self.service_type == SERVICE_MANAGER.FDSNSTATION:
-                self.result = BasicStationParser()
-                self.result.parse(reply.readAll())
-                self.finished.emit(True)
+                self._prepare_features()
+            elif self.pending_event_ids:
+                self.fetch_next_event_by_id()
+            elif self.require_mdp_basic_text_request:
+                if not self.pending_event_ids:
+                    # we don't yet have an explicit list of event ids to fetch -- build that now, then fire
+                    # off the one-by-one requests for their details
+                    self.macro_pending_event_ids = self.result.all_event_ids()
+
+                self.fetch_basic_mdp()
+            elif self.is_mdp_basic_text_request and self.macro_pending_event_ids:
+                self.fetch_basic_mdp()
             else:
-                if self.pending_event_ids:
-                    self.pending_event_ids = self.pending_event_ids[1:]
-
-                if not self.is_mdp_basic_text_request:
-                    prev_event_count = len(self.result.events)
-                    if self.result.events:
-                        self.result.add_events(reply.readAll())
-                    else:
-                        self.result.parse(reply.readAll())
+                self._finish_fetch()
 
-                    if self.query_limit and len(self.result.events) - prev_event_count >= self.query_limit:
-                        self.exceeded_limit = True
+    def _prepare_features(self):
+        """
+        Builds the features for the fetched results in a background task, and then emits the
+        finished signal
+        """
+        self.prepared_features = {}
+        result = self.result
+        service_type = self.service_type
+        output_type = self.output_type
+
+        # features are either written to files, or collected for memory layers
+        output_format = LayerOutput.output_format()
+        layer_names = {}
+        if output_format is not None:
+            # file paths are only created for the layers which are actually written
+            layer_names = {
+                'events': self._generate_layer_name(),
+                'mdp': self._generate_layer_name(layer_type='mdp'),
+                'stations': self._generate_layer_name('Stations')
+            }
+            max_age = LayerOutput.max_age()
+            if max_age:
+                LayerOutput.remove_expired_files(max_age, LayerOutput.project_file_paths())
+
+        def collect(task: QgsTask, features, expected_count: int) -> List[QgsFeature]:
+            res = []
+            for f in features:
+                if task.isCanceled():
+                    return []
+                res.append(f)
+                if expected_count and len(res) % 1000 == 0:
+                    task.setProgress(min(99.0, len(res) / expected_count * 100))
+            return res
+
+        def prepare(task: QgsTask,  # pylint: disable=too-many-arguments
+                    layer_type: str,
+                    create: Callable[[], Iterable[QgsFeature]],
+                    expected_count: int,
+                    fields: Callable[[], QgsFields],
+                    wkb_type: QgsWkbTypes.Type) -> Union[List[QgsFeature], Path]:
+            if output_format is None:
+                return collect(task, create(), expected_count)
+
+            def progress(count: int):
+                if expected_count:
+                    task.setProgress(min(99.0, count / expected_count * 100))
+
+            path = LayerOutput.file_path(layer_names[layer_type], output_format)
+            error = LayerOutput.write_features(path, fields(), wkb_type, create(), output_format,
+                                               task.isCanceled, progress)
+            if error is None:
+                return path
+            if task.isCanceled():
+                return []
+
+            QgsMessageLog.logMessage('Writing features to a file failed, using a memory layer instead: {}'.format(
+                error), 'QQuake', Qgis.Warning)
+            return collect(task, create(), expected_count)
+
+        def build(task: QgsTask) -> Dict[str, Union[List[QgsFeature], Path, Exception]]:
+            features = {}
+            if service_type in (SERVICE_MANAGER.FDSNEVENT, SERVICE_MANAGER.MACROSEISMIC):
+                try:
+                    features['events'] = prepare(task, 'events', lambda: result.create_event_features(
+                        self.output_fields, self.preferred_origins_only, self.preferred_magnitudes_only),
+                                                 len(result.events),
+                                                 lambda: result.to_event_fields(self.output_fields),
+                                                 QgsWkbTypes.PointZ)
+                except MissingOriginException as e:
+                    # reported when the layer is created
+                    features['events'] = e
+
+                if service_type == SERVICE_MANAGER.MACROSEISMIC:
+                    features['mdp'] = prepare(task, 'mdp', lambda: result.create_mdp_features(
+                        self.output_fields, self.preferred_mdp_only), 0,
+                                              lambda: result.create_mdp_fields(self.output_fields),
+                                              QgsWkbTypes.Point)
+            elif service_type == SERVICE_MANAGER.FDSNSTATION:
+                if output_type == Fetcher.BASIC:
+                    features['stations'] = prepare(task, 'stations', result.create_station_features,
+                                                   len(result.stations), result.to_station_fields,
+                                                   QgsWkbTypes.PointZ)
+                elif result is not None:
+                    features['stations'] = prepare(task, 'stations', lambda: result.to_station_features(
+                        self.output_fields, self.output_options), 0,
+                                                   lambda: Station.to_fields(self.output_fields, self.output_options),
+                                                   QgsWkbTypes.PointZ)
+            return features
+
+        def built(features: Optional[Dict[str, Union[List[QgsFeature], Path, Exception]]]):
+            self.prepared_features = features or {}
+            self.finished.emit(True)
+
+        self._run_task(self.tr('Creating features'), build, built, report_progress=True)
+
+    def _features(self, layer_type: str, source,
+                  create: Callable[[], List[QgsFeature]]) -> Union[List[QgsFeature], Path]:
+        """
+        Returns the features which were prepared in the background for a layer type, or creates
+        them if they were not prepared from the specified source.
 
-                if self.pending_event_ids:
-                    self.fetch_next_event_by_id()
-                elif self.require_mdp_basic_text_request:
-                    if not self.pending_event_ids:
-                        # we don't yet have an explicit list of event ids to fetch -- build that now, then fire
-                        # off the one-by-one requests for their details
-                        self.macro_pending_event_ids = self.result.all_event_ids()
+        If the features were written to a file then the path to the file is returned instead.
+        """
+        if source is not self.result:
+            return create()
 
-                    self.fetch_basic_mdp()
-                else:
-                    if self.is_mdp_basic_text_request:
-                        self.result.add_mdp(reply.readAll())
-
-                    if self.is_mdp_basic_text_request and self.macro_pending_event_ids:
-                        self.fetch_basic_mdp()
-                    elif self.ranges:
-                        # fetch next range
-                        self.event_start_date, self.event_end_date = self.ranges[0]
-                        del self.ranges[0]
-                        self.fetch_data()
-                    else:
-                        self.finished.emit(True)
+        features = self.prepared_features.pop(layer_type, None)
+        if isinstance(features, Exception):
+            raise features
+        if features is None:
+            features = create()
+        return features
 
     def _generate_layer_name(self, layer_type: Optional[str] = None) -> str:
         """
@@ -560,6 +1357,21 @@ class Fetcher(QObject):
 
         return name
 
+    @staticmethod
+    def _create_layer(features: Union[List[QgsFeature], Path], name: str,
+                      create_empty: Callable[[], QgsVectorLayer]) -> QgsVectorLayer:
+        """
+        Creates a layer for prepared features, either by opening the file they were written to
+        or by adding them to a new memory layer
+        """
+        if isinstance(features, Path):
+            return QgsVectorLayer(str(features), name, 'ogr')
+
+        vl = create_empty()
+        ok, _ = vl.dataProvider().addFeatures(features)
+        assert ok
+        return vl
+
     def _create_empty_event_layer(self) -> QgsVectorLayer:
         """
         Creates an empty layer for earthquake data
@@ -569,6 +1381,13 @@ class Fetcher(QObject):
         vl.dataProvider().addAttributes(self.result.to_event_fields(self.output_fields))
         vl.updateFields()
 
+        return vl
+
+    @staticmethod
+    def _setup_event_layer_temporal_properties(vl: QgsVectorLayer):
+        """
+        Sets up temporal handling for an event layer
+        """
         try:
             # QGIS 3.14 - setup temporal handling automatically if time field was selected
             if vl.fields().lookupField('time') >= 0:
@@ -581,8 +1400,6 @@ class Fetcher(QObject):
         except AttributeError:
             pass
 
-        return vl
-
     def _create_empty_mdp_layer(self) -> QgsVectorLayer:
         """
         Creates an empty layer for mdp
@@ -603,7 +1420,7 @@ class Fetcher(QObject):
         if self.output_type == Fetcher.BASIC:
             vl.dataProvider().addAttributes(self.result.to_station_fields())
         else:
-            vl.dataProvider().addAttributes(Station.to_fields(self.output_fields))
+            vl.dataProvider().addAttributes(Station.to_fields(self.output_fields, self.output_options))
         vl.updateFields()
 
         return vl
@@ -615,20 +1432,17 @@ class Fetcher(QObject):
         """
         Returns a new vector layer containing the reply contents
         """
-        vl = self._create_empty_event_layer()
-
-        features = []
         try:
-            for f in parser.create_event_features(self.output_fields, preferred_origin_only, preferred_magnitudes_only):
-                features.append(f)
+            features = self._features('events', parser, lambda: list(
+                parser.create_event_features(self.output_fields, preferred_origin_only, preferred_magnitudes_only)))
         except MissingOriginException as e:
             self.message.emit(
                 str(e),
                 Qgis.Critical)
             return None
 
-        ok, _ = vl.dataProvider().addFeatures(features)
-        assert ok
+        vl = self._create_layer(features, self._generate_layer_name(), self._create_empty_event_layer)
+        self._setup_event_layer_temporal_properties(vl)
 
         epicenter_style_url = StyleUtils.style_url(
             self.styles[SERVICE_MANAGER.FDSNEVENT]) if SERVICE_MANAGER.FDSNEVENT in self.styles else None
@@ -672,14 +1486,10 @@ class Fetcher(QObject):
         """
         Returns a new vector layer containing the reply contents
         """
-        vl = self._create_empty_mdp_layer()
-
-        features = []
-        for f in parser.create_mdp_features(self.output_fields, self.preferred_mdp_only):
-            features.append(f)
+        features = self._features('mdp', parser, lambda: list(
+            parser.create_mdp_features(self.output_fields, self.preferred_mdp_only)))
 
-        ok, _ = vl.dataProvider().addFeatures(features)
-        assert ok
+        vl = self._create_layer(features, self._generate_layer_name(layer_type='mdp'), self._create_empty_mdp_layer)
 
         mdp_style_url = StyleUtils.style_url(
             self.styles[SERVICE_MANAGER.MACROSEISMIC]) if SERVICE_MANAGER.MACROSEISMIC in self.styles else None
@@ -723,17 +1533,13 @@ class Fetcher(QObject):
         """
         Returns a new vector layer containing the reply contents
         """
-        vl = self._create_empty_stations_layer()
-
-        features = []
         if self.output_type == Fetcher.BASIC:
-            for f in self.result.create_station_features():
-                features.append(f)
+            features = self._features('stations', self.result, lambda: list(self.result.create_station_features()))
         else:
-            features.extend(fdsn.to_station_features(self.output_fields))
+            features = self._features('stations', fdsn, lambda: list(fdsn.to_station_features(self.output_fields,
+                                                                                              self.output_options)))
 
-        ok, _ = vl.dataProvider().addFeatures(features)
-        assert ok
+        vl = self._create_layer(features, self._generate_layer_name('Stations'), self._create_empty_stations_layer)
 
         station_style_url = StyleUtils.style_url(
             self.styles[SERVICE_MANAGER.FDSNSTATION]) if SERVICE_MANAGER.FDSNSTATION in self.styles else None
@@ -759,7 +1565,8 @@ class Fetcher(QObject):
                 if isinstance(self.result, BasicTextParser):
                     style_attr = style.get('classified_attribute_text')
                 else:
-                    style_attr = FDSNStationXMLParser.remap_attribute_name(style.get('classified_attribute_xml'))
+                    style_attr = FDSNStationXMLParser.remap_attribute_name(style.get('classified_attribute_xml'),
+                                                                            self.output_options)
 
                 err = StyleUtils.fetch_and_apply_style(vl, style_url, style_attr)
                 if err:
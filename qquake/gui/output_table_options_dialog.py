@@ -27,6 +27,7 @@ from qgis.gui import QgsGui
 
 from qquake.gui.gui_utils import GuiUtils
 from qquake.gui.simple_node_model import SimpleNodeModel, ModelNode
+from qquake.quakeml.fields import clear_service_fields_cache
 from qquake.services import SERVICE_MANAGER
 
 FORM_CLASS, _ = uic.loadUiType(GuiUtils.get_ui_file_path('output_table_options.ui'))
@@ -172,6 +173,8 @@ class OutputTableOptionsDialog(QDialog, FORM_CLASS):
             s.setValue('/plugins/qquake/include_quake_details_in_mdp',
                        self.check_include_event_params_in_mdp.isChecked())
 
+        clear_service_fields_cache()
+
         super().accept()
 
     def change_field_names(self):
@@ -977,7 +977,8 @@ class QQuakeDialog(QDialog, FORM_CLASS):
 
                 service_limit = self.fetcher.service_config['settings'].get('querylimitmaxentries', None)
                 self.message_bar.clearWidgets()
-                if service_limit is not None and events_count >= service_limit:
+                if service_limit is not None and events_count >= service_limit and \
+                        not self.fetcher.is_local_catalog_result:
                     if self.fetcher.split_strategy is None:
                         choices = list(Fetcher.STRATEGIES)
                         default_choice = \
@@ -991,6 +992,13 @@ class QQuakeDialog(QDialog, FORM_CLASS):
                                                              choices.index(default_choice), False)
                         if ok:
                             split_strategy = Fetcher.STRATEGIES[selection]
+                            if self.fetcher.resume_with_split_strategy(split_strategy):
+                                # the fetcher keeps the results already downloaded, and only requests
+                                # the remaining time span
+                                self.button_box.button(QDialogButtonBox.Ok).setText(self.tr('Fetching'))
+                                self.button_box.button(QDialogButtonBox.Ok).setEnabled(False)
+                                return
+
                             self.fetcher.deleteLater()
                             self.fetcher = None
                             self._getEventList(split_strategy=split_strategy)
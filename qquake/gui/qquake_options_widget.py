@@ -18,12 +18,17 @@ from copy import deepcopy
 
 from qgis.PyQt import uic
 from qgis.PyQt.QtCore import Qt
+from qgis.core import QgsSettings
 from qgis.gui import (
     QgsOptionsPageWidget
 )
 
+from qquake.catalog_store import CatalogStore
 from qquake.gui.gui_utils import GuiUtils
-from qquake.services import SERVICE_MANAGER
+from qquake.layer_output import LayerOutput
+from qquake.parse_cache import ParseCache
+from qquake.parse_pool import ParsePool
+from qquake.services import SERVICE_MANAGER, ResponseCache
 
 FORM_CLASS, _ = uic.loadUiType(GuiUtils.get_ui_file_path('qquake_options.ui'))
 
@@ -64,6 +69,17 @@ class QQuakeOptionsWidget(FORM_CLASS, QgsOptionsPageWidget):
 
         self.block_style_updates = False
 
+        self.check_cache_enabled.setChecked(ResponseCache.is_enabled())
+        self.check_local_catalog_enabled.setChecked(CatalogStore.is_enabled())
+        self.check_parse_pool_enabled.setChecked(ParsePool.is_enabled())
+        self.check_parse_cache_enabled.setChecked(ParseCache.is_enabled())
+
+        self.layer_output_format_combo.addItem(self.tr('Memory layers'), LayerOutput.FORMAT_MEMORY)
+        self.layer_output_format_combo.addItem(self.tr('GeoPackage files'), LayerOutput.FORMAT_GEOPACKAGE)
+        self.layer_output_format_combo.addItem(self.tr('FlatGeobuf files'), LayerOutput.FORMAT_FLATGEOBUF)
+        self.layer_output_format_combo.setCurrentIndex(
+            self.layer_output_format_combo.findData(LayerOutput.output_format() or LayerOutput.FORMAT_MEMORY))
+
     def _refresh_styles_list(self):
         """
         Refreshes the list of available styles
@@ -181,3 +197,10 @@ class QQuakeOptionsWidget(FORM_CLASS, QgsOptionsPageWidget):
 
     def apply(self):  # pylint:disable=missing-docstring
         SERVICE_MANAGER.set_user_styles(self._user_styles)
+
+        s = QgsSettings()
+        s.setValue('/plugins/qquake/cache_enabled', self.check_cache_enabled.isChecked())
+        s.setValue('/plugins/qquake/local_catalog_enabled', self.check_local_catalog_enabled.isChecked())
+        s.setValue('/plugins/qquake/parse_pool_enabled', self.check_parse_pool_enabled.isChecked())
+        s.setValue('/plugins/qquake/parse_cache_enabled', self.check_parse_cache_enabled.isChecked())
+        s.setValue('/plugins/qquake/layer_output_format', self.layer_output_format_combo.currentData())
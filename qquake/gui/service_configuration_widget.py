@@ -79,6 +79,9 @@ class ServiceConfigurationWidget(QWidget, FORM_CLASS):
         'querycircular': 'check_can_filter_using_circular_area',
         'querycircularradiuskm': 'check_radius_of_circular_area_is_specified_in_km',
         'querydepth': 'check_can_filter_by_depth',
+        'querymaxconcurrentrequests': 'spin_max_concurrent_requests',
+        'querycachettl': 'spin_cache_ttl',
+        'querylocalcatalogttl': 'spin_local_catalog_ttl',
         'outputtext': 'check_can_output_text',
         'outputxml': 'check_can_output_xml',
         'outputgeojson': 'check_can_output_geojson',
@@ -0,0 +1,308 @@
+# -*- coding: utf-8 -*-
+"""
+File backed output layers
+"""
+
+# .. note:: This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+
+__author__ = 'Original authors: Mario Locati, Roberto Vallone, Matteo Ghetta, Nyall Dawson'
+__date__ = '29/01/2020'
+__copyright__ = 'Istituto Nazionale di Geofisica e Vulcanologia (INGV)'
+# This will get replaced with a git SHA1 when you do a git archive
+__revision__ = '$Format:%H$'
+
+import re
+import time
+from pathlib import Path
+from typing import Callable, Iterable, List, Optional
+
+from qgis.PyQt.QtCore import QDateTime
+from qgis.core import (
+    NULL,
+    QgsCoordinateReferenceSystem,
+    QgsCoordinateTransformContext,
+    QgsDataProvider,
+    QgsFeature,
+    QgsFeatureSink,
+    QgsFields,
+    QgsProject,
+    QgsProviderRegistry,
+    QgsSettings,
+    QgsVectorDataProvider,
+    QgsVectorFileWriter,
+    QgsWkbTypes
+)
+
+from qquake.services import ServiceManager
+
+
+class LayerOutput:
+    """
+    Writes features to file backed layers (GeoPackage or FlatGeobuf) in fixed size chunks, instead of
+    collecting them all for a memory layer.
+
+    Memory use no longer grows with the number of features, and the layers persist between sessions.
+
+    Layer files may be referenced by saved projects, so they are never removed automatically unless
+    a maximum age is set via /plugins/qquake/layer_output_max_age_days. Even then, only files in the
+    default output folder which are not used by the current project are removed.
+    """
+
+    FORMAT_MEMORY = 'memory'
+    FORMAT_GEOPACKAGE = 'gpkg'
+    FORMAT_FLATGEOBUF = 'fgb'
+
+    DRIVERS = {
+        FORMAT_GEOPACKAGE: 'GPKG',
+        FORMAT_FLATGEOBUF: 'FlatGeobuf'
+    }
+
+    CHUNK_SIZE = 10000
+
+    # fields for which attribute indexes are created, where the format supports them
+    INDEXED_FIELDS = ('EventID', 'MDPsetID', 'Time', 'Network', 'Station', 'NetCode', 'StaCode')
+
+    @staticmethod
+    def output_format() -> Optional[str]:
+        """
+        Returns the file format for output layers, or None if memory layers should be used
+        """
+        output_format = QgsSettings().value('/plugins/qquake/layer_output_format', LayerOutput.FORMAT_MEMORY, str)
+        return output_format if output_format in LayerOutput.DRIVERS else None
+
+    @staticmethod
+    def default_output_folder() -> Path:
+        """
+        Returns the default folder in which file backed layers are created, which is managed by the plugin
+        """
+        return ServiceManager.user_service_path() / 'layers'
+
+    @staticmethod
+    def output_folder() -> Path:
+        """
+        Returns the folder in which file backed layers are created.
+
+        The folder is only created once a layer is written to it.
+        """
+        folder = QgsSettings().value('/plugins/qquake/layer_output_folder', '', str)
+        return Path(folder) if folder else LayerOutput.default_output_folder()
+
+    @staticmethod
+    def max_age() -> int:
+        """
+        Returns the age, in seconds, after which unused layer files in the default output folder are removed,
+        or 0 if layer files should be kept indefinitely
+        """
+        return max(0, QgsSettings().value('/plugins/qquake/layer_output_max_age_days', 0, int)) * 24 * 60 * 60
+
+    @staticmethod
+    def file_path(name: str, output_format: str) -> Path:
+        """
+        Returns a new, unique file path for a layer with the specified name
+        """
+        stem = '{}_{}'.format(re.sub(r'[^\w\-]+', '_', name).strip('_') or 'layer',
+                              QDateTime.currentDateTime().toString('yyyyMMdd_hhmmss'))
+        folder = LayerOutput.output_folder()
+        path = folder / '{}.{}'.format(stem, output_format)
+        counter = 1
+        while path.exists():
+            path = folder / '{}_{}.{}'.format(stem, counter, output_format)
+            counter += 1
+        return path
+
+    @staticmethod
+    def _create_writer(path: Path, fields: QgsFields, wkb_type: QgsWkbTypes.Type, output_format: str):
+        """
+        Creates a file writer for a new layer
+        """
+        crs = QgsCoordinateReferenceSystem('EPSG:4326')
+        # GeoPackage spatial indexes are created after all features are added, rather than updated for each feature
+        layer_options = ['SPATIAL_INDEX=NO'] if output_format == LayerOutput.FORMAT_GEOPACKAGE else []
+        try:
+            # QGIS 3.20+
+            options = QgsVectorFileWriter.SaveVectorOptions()
+            options.driverName = LayerOutput.DRIVERS[output_format]
+            options.fileEncoding = 'UTF-8'
+            options.layerOptions = layer_options
+            return QgsVectorFileWriter.create(str(path), fields, wkb_type, crs, QgsCoordinateTransformContext(),
+                                              options)
+        except AttributeError:
+            return QgsVectorFileWriter(str(path), 'UTF-8', fields, wkb_type, crs, LayerOutput.DRIVERS[output_format],
+                                       [], layer_options)
+
+    @staticmethod
+    def write_features(path: Path,  # pylint: disable=too-many-arguments
+                       fields: QgsFields,
+                       wkb_type: QgsWkbTypes.Type,
+                       features: Iterable[QgsFeature],
+                       output_format: str,
+                       is_canceled: Optional[Callable[[], bool]] = None,
+                       progress: Optional[Callable[[int], None]] = None) -> Optional[str]:
+        """
+        Writes features to a new file, in chunks of CHUNK_SIZE features.
+
+        Spatial and attribute indexes are created once all features have been written.
+
+        Returns None if the features were written, or an error message if writing failed or was canceled.
+        Partially written files are removed.
+        """
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+        except OSError as e:
+            return str(e)
+
+        writer = LayerOutput._create_writer(path, fields, wkb_type, output_format)
+        if writer.hasError() != QgsVectorFileWriter.NoError:
+            error = writer.errorMessage()
+            del writer
+            LayerOutput.remove(path)
+            return error
+
+        if output_format == LayerOutput.FORMAT_GEOPACKAGE:
+            # the ogr provider adds each chunk in a single transaction, which the file writer does not.
+            # The provider is used directly (rather than via a layer), as this is run in background tasks
+            del writer
+            provider = QgsProviderRegistry.instance().createProvider('ogr', str(path),
+                                                                     QgsDataProvider.ProviderOptions())
+            if provider is None or not provider.isValid():
+                LayerOutput.remove(path)
+                return 'Could not open {}'.format(path)
+
+            # GeoPackage layers have an additional fid field, so attributes are mapped to the provider's fields
+            provider_fields = provider.fields()
+            attribute_map = [provider_fields.lookupField(field.name()) for field in fields]
+            if -1 in attribute_map:
+                del provider
+                LayerOutput.remove(path)
+                return 'Could not create fields in {}'.format(path)
+
+            def add_chunk(chunk: List[QgsFeature]) -> bool:
+                ok, _ = provider.addFeatures([LayerOutput._remap_feature(f, provider_fields, attribute_map)
+                                              for f in chunk], QgsFeatureSink.FastInsert)
+                return ok
+        else:
+            # FlatGeobuf files can only be written sequentially, and have their spatial index built on closing
+            provider = None
+
+            def add_chunk(chunk: List[QgsFeature]) -> bool:
+                return writer.addFeatures(chunk, QgsFeatureSink.FastInsert)
+
+        ok = False
+        count = 0
+        chunk = []
+        try:
+            for feature in features:
+                chunk.append(feature)
+                if len(chunk) < LayerOutput.CHUNK_SIZE:
+                    continue
+
+                if (is_canceled is not None and is_canceled()) or not add_chunk(chunk):
+                    break
+                count += len(chunk)
+                chunk = []
+                if progress is not None:
+                    progress(count)
+            else:
+                ok = (not chunk or add_chunk(chunk)) and not (is_canceled is not None and is_canceled())
+
+            if ok and provider is not None:
+                LayerOutput.create_indexes(provider)
+        finally:
+            # closes the file
+            if provider is not None:
+                del provider
+            else:
+                del writer
+
+            if not ok:
+                LayerOutput.remove(path)
+
+        return None if ok else 'Could not write features to {}'.format(path)
+
+    @staticmethod
+    def _remap_feature(feature: QgsFeature, provider_fields: QgsFields, attribute_map: List[int]) -> QgsFeature:
+        """
+        Returns a copy of a feature with its attributes mapped to a provider's fields
+        """
+        attributes = [NULL] * provider_fields.count()
+        for value, index in zip(feature.attributes(), attribute_map):
+            attributes[index] = value
+
+        remapped = QgsFeature(provider_fields)
+        remapped.setAttributes(attributes)
+        remapped.setGeometry(feature.geometry())
+        return remapped
+
+    @staticmethod
+    def create_indexes(provider: QgsVectorDataProvider):
+        """
+        Creates the spatial index and attribute indexes for the INDEXED_FIELDS present in a provider,
+        if supported
+        """
+        if provider.capabilities() & QgsVectorDataProvider.CreateSpatialIndex:
+            provider.createSpatialIndex()
+
+        if not provider.capabilities() & QgsVectorDataProvider.CreateAttributeIndex:
+            return
+
+        fields = provider.fields()
+        for name in LayerOutput.INDEXED_FIELDS:
+            index = fields.lookupField(name)
+            if index >= 0:
+                provider.createAttributeIndex(index)
+
+    @staticmethod
+    def remove(path: Path):
+        """
+        Removes a layer file, along with any GeoPackage journal files
+        """
+        for file_path in (path, path.with_name(path.name + '-wal'), path.with_name(path.name + '-shm')):
+            try:
+                file_path.unlink()
+            except FileNotFoundError:
+                pass
+
+    @staticmethod
+    def project_file_paths() -> List[Path]:
+        """
+        Returns the paths of all files used by layers in the current project
+        """
+        return [Path(layer.source().split('|')[0]) for layer in QgsProject.instance().mapLayers().values()]
+
+    @staticmethod
+    def remove_expired_files(max_age: int, used_paths: Iterable[Path], folder: Optional[Path] = None) -> int:
+        """
+        Removes layer files which were last modified more than max_age seconds ago and are not in used_paths.
+
+        Only files in the default output folder (or the specified folder) are removed, as custom output folders
+        may contain files which were not created by the plugin.
+
+        Returns the number of removed files.
+        """
+        folder = folder if folder is not None else LayerOutput.default_output_folder()
+        if max_age <= 0 or not folder.exists():
+            return 0
+
+        used = set()
+        for used_path in used_paths:
+            try:
+                used.add(used_path.resolve())
+            except OSError:
+                continue
+
+        cutoff = time.time() - max_age
+        count = 0
+        for output_format in LayerOutput.DRIVERS:
+            for path in folder.glob('*.{}'.format(output_format)):
+                try:
+                    if path.stat().st_mtime >= cutoff or path.resolve() in used:
+                        continue
+                    LayerOutput.remove(path)
+                except OSError:
+                    continue
+                count += 1
+
+        return count
@@ -0,0 +1,235 @@
+# -*- coding: utf-8 -*-
+"""
+Persistent cache for parsed replies
+"""
+
+# .. note:: This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+
+__author__ = 'Original authors: Mario Locati, Roberto Vallone, Matteo Ghetta, Nyall Dawson'
+__date__ = '29/01/2020'
+__copyright__ = 'Istituto Nazionale di Geofisica e Vulcanologia (INGV)'
+# This will get replaced with a git SHA1 when you do a git archive
+__revision__ = '$Format:%H$'
+
+import configparser
+import hashlib
+import os
+import pickle
+import threading
+from pathlib import Path
+from typing import Optional
+
+from qgis.PyQt.QtCore import QByteArray
+from qgis.core import QgsSettings
+
+from qquake.quakeml.element import QuakeMlElement
+from qquake.services import ServiceManager
+
+
+def canonical_repr(value) -> str:
+    """
+    Returns a representation of a value which is stable between sessions, for use in cache keys.
+
+    Unlike pickling, sets are ordered and objects are described by their attributes.
+    """
+    if isinstance(value, dict):
+        return '{' + ','.join(sorted('{}:{}'.format(canonical_repr(k), canonical_repr(v))
+                                     for k, v in value.items())) + '}'
+    if isinstance(value, (set, frozenset)):
+        return '{' + ','.join(sorted(canonical_repr(v) for v in value)) + '}'
+    if isinstance(value, (list, tuple)):
+        return '[' + ','.join(canonical_repr(v) for v in value) + ']'
+    if hasattr(value, '__dict__') and not isinstance(value, type):
+        return '{}({})'.format(value.__class__.__name__, canonical_repr(vars(value)))
+    return repr(value)
+
+
+class ParseCache:
+    """
+    A size bounded, least recently used disk cache for parsed replies, keyed by a digest of the
+    reply content and the parser settings.
+
+    Entries are stored in a compact binary form (elements are pickled as tuples of their attribute values),
+    so that re-loading an unchanged reply skips parsing entirely.
+
+    Entries are unpickled when retrieved, so the cache is disabled by default and must only be enabled
+    for cache folders which are not writable by others.
+    """
+
+    MAGIC = b'QQPC'
+    DEFAULT_MAX_SIZE_MB = 256
+
+    _format_version: Optional[bytes] = None
+
+    def __init__(self, path: Optional[Path] = None):
+        self._path = path
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def format_version() -> bytes:
+        """
+        Returns a digest identifying the format of cache entries.
+
+        The digest is derived from the plugin version and the attributes of all parsed element classes,
+        so that entries written by other versions are discarded without any manual version bumps.
+        """
+        if ParseCache._format_version is None:
+            metadata = configparser.ConfigParser()
+            metadata.read(Path(__file__).parent / 'metadata.txt', encoding='utf8')
+            digest = hashlib.sha1(metadata.get('general', 'version', fallback='').encode())
+
+            def element_classes(cls):
+                for subclass in cls.__subclasses__():
+                    yield subclass
+                    yield from element_classes(subclass)
+
+            for cls in sorted(set(element_classes(QuakeMlElement)), key=lambda c: (c.__module__, c.__qualname__)):
+                digest.update('{}.{}:{}'.format(cls.__module__, cls.__qualname__,
+                                                ','.join(cls.dict_attributes())).encode())
+
+            ParseCache._format_version = digest.digest()
+
+        return ParseCache._format_version
+
+    def cache_path(self) -> Path:
+        """
+        Returns the path to the cache folder
+        """
+        path = self._path if self._path is not None else ServiceManager.user_service_path() / 'parsed'
+        if not path.exists():
+            path.mkdir(parents=True, exist_ok=True)
+        return path
+
+    @staticmethod
+    def is_enabled() -> bool:
+        """
+        Returns True if caching of parsed replies is enabled
+        """
+        return QgsSettings().value('/plugins/qquake/parse_cache_enabled', False, bool)
+
+    @staticmethod
+    def max_size() -> int:
+        """
+        Returns the maximum size of the cache, in bytes
+        """
+        return QgsSettings().value('/plugins/qquake/parse_cache_max_size_mb', ParseCache.DEFAULT_MAX_SIZE_MB,
+                                   int) * 1024 * 1024
+
+    @staticmethod
+    def key(parser, content: QByteArray, mode: str) -> str:
+        """
+        Returns the cache key for parsing content with a parser, which must not yet contain any results
+        """
+        digest = hashlib.sha1('{}:{}:{}:'.format(ParseCache.format_version().hex(), mode,
+                                                 canonical_repr(parser)).encode())
+        digest.update(content.data())
+        return digest.hexdigest()
+
+    def _entry_path(self, key: str) -> Path:
+        """
+        Returns the path for a cache entry
+        """
+        return self.cache_path() / (key + '.parsed')
+
+    def _header(self) -> bytes:
+        """
+        Returns the header written at the start of each entry
+        """
+        return self.MAGIC + self.format_version()
+
+    def retrieve(self, key: str):
+        """
+        Returns the parsed results for a cache key, or None if no valid entry exists
+        """
+        path = self._entry_path(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except OSError:
+            return None
+
+        header = self._header()
+        if not data.startswith(header):
+            # written by an incompatible version
+            self._remove(path)
+            return None
+
+        try:
+            result = pickle.loads(data[len(header):])
+        except Exception:  # pylint: disable=broad-except
+            self._remove(path)
+            return None
+
+        try:
+            path.touch()
+        except OSError:
+            pass
+        return result
+
+    def store(self, key: str, result):
+        """
+        Stores parsed results for a cache key
+        """
+        try:
+            data = pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL)
+        except (pickle.PicklingError, TypeError, AttributeError, RecursionError):
+            return
+
+        path = self._entry_path(key)
+        # entries are written from background tasks, so are moved into place only once complete
+        temp_path = path.with_name('{}.{}.tmp'.format(path.name, threading.get_ident()))
+        try:
+            with open(temp_path, 'wb') as f:
+                f.write(self._header())
+                f.write(data)
+            os.replace(temp_path, path)
+        except OSError:
+            self._remove(temp_path)
+            return
+
+        self.evict(self.max_size())
+
+    @staticmethod
+    def _remove(path: Path):
+        """
+        Removes a cache entry, ignoring entries which were already removed
+        """
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
+
+    def evict(self, max_size: int):
+        """
+        Removes the least recently used entries until the cache is no larger than max_size bytes
+        """
+        with self._lock:
+            entries = []
+            for path in self.cache_path().glob('*.parsed'):
+                try:
+                    stat = path.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+
+            total_size = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total_size <= max_size:
+                    break
+
+                self._remove(path)
+                total_size -= size
+
+    def clear(self):
+        """
+        Removes all cached results
+        """
+        with self._lock:
+            for path in self.cache_path().glob('*.parsed'):
+                self._remove(path)
+
+
+PARSE_CACHE = ParseCache()
@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+"""
+Process pool for parsing replies
+"""
+
+# .. note:: This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+
+__author__ = 'Original authors: Mario Locati, Roberto Vallone, Matteo Ghetta, Nyall Dawson'
+__date__ = '29/01/2020'
+__copyright__ = 'Istituto Nazionale di Geofisica e Vulcanologia (INGV)'
+# This will get replaced with a git SHA1 when you do a git archive
+__revision__ = '$Format:%H$'
+
+import multiprocessing
+import os
+import pickle
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+
+from qgis.PyQt.QtCore import QByteArray
+from qgis.core import (
+    Qgis,
+    QgsMessageLog,
+    QgsSettings
+)
+
+from qquake.parse_worker import (
+    MODE_PARSE,
+    MODE_INITIAL,
+    MODE_MDP,
+    MODE_STATIONS,
+    parse_content
+)
+from qquake.quakeml.exceptions import InvalidXmlException
+
+
+def python_executable() -> Optional[str]:
+    """
+    Returns the path to the Python interpreter used to launch worker processes, or None if it cannot be found.
+
+    Within QGIS sys.executable refers to the QGIS application itself, so the interpreter is located
+    within the Python installation instead.
+    """
+    if os.path.basename(sys.executable).lower().startswith('python'):
+        return sys.executable
+
+    for candidate in (os.path.join(sys.exec_prefix, 'pythonw.exe'),
+                      os.path.join(sys.exec_prefix, 'python.exe'),
+                      os.path.join(sys.exec_prefix, 'bin', 'python{}.{}'.format(*sys.version_info[:2])),
+                      os.path.join(sys.exec_prefix, 'bin', 'python3')):
+        if os.path.exists(candidate):
+            return candidate
+
+    return None
+
+
+class ParsePool:
+    """
+    Parses replies in worker processes, so that parsing large batches of replies (e.g. split range requests)
+    is not limited to a single core.
+
+    Parsers are sent to the workers along with the raw reply content, and returned with their results
+    (elements are pickled as compact tuples of their attribute values).
+    """
+
+    MODE_PARSE = MODE_PARSE
+    MODE_INITIAL = MODE_INITIAL
+    MODE_MDP = MODE_MDP
+    MODE_STATIONS = MODE_STATIONS
+
+    def __init__(self):
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._is_broken = False
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def is_enabled() -> bool:
+        """
+        Returns True if parsing in worker processes is enabled
+        """
+        return QgsSettings().value('/plugins/qquake/parse_pool_enabled', False, bool)
+
+    @staticmethod
+    def worker_count() -> int:
+        """
+        Returns the number of worker processes to use
+        """
+        return max(1, QgsSettings().value('/plugins/qquake/parse_pool_workers', os.cpu_count() or 1, int))
+
+    def is_available(self) -> bool:
+        """
+        Returns True if replies should be parsed in worker processes
+        """
+        return self.is_enabled() and not self._is_broken and python_executable() is not None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        """
+        Returns the executor, creating it if required
+        """
+        with self._lock:
+            if self._executor is None:
+                # worker processes are always spawned, as forking a process with running threads is unsafe
+                context = multiprocessing.get_context('spawn')
+                context.set_executable(python_executable())
+                self._executor = ProcessPoolExecutor(max_workers=self.worker_count(), mp_context=context)
+            return self._executor
+
+    def parse(self, parser, content: QByteArray, mode: str = MODE_PARSE):
+        """
+        Parses reply content using a parser in a worker process, blocking until the results are available.
+
+        Returns the parser containing the results (or the parsed stations for MODE_STATIONS),
+        or None if the content could not be parsed in a worker process and should be parsed locally instead.
+
+        :raises InvalidXmlException: if the content is not valid
+        """
+        try:
+            return self._get_executor().submit(parse_content, parser, content.data(), mode).result()
+        except InvalidXmlException:
+            # invalid content is reported, there's no point parsing it again locally
+            raise
+        except (BrokenProcessPool, OSError, pickle.PicklingError) as e:
+            QgsMessageLog.logMessage('Parsing in worker processes failed, falling back to local parsing: {}'.format(e),
+                                     'QQuake', Qgis.Warning)
+        except Exception as e:  # pylint: disable=broad-except
+            QgsMessageLog.logMessage('Parsing in worker processes failed, falling back to local parsing: {}: {}'.format(
+                type(e).__name__, e), 'QQuake', Qgis.Warning)
+
+        self._is_broken = True
+        self.shutdown()
+        return None
+
+    def shutdown(self):
+        """
+        Stops all worker processes
+        """
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+                self._executor = None
+
+
+PARSE_POOL = ParsePool()
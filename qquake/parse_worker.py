@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+"""
+Reply parsing within worker processes
+"""
+
+# .. note:: This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+
+__author__ = 'Original authors: Mario Locati, Roberto Vallone, Matteo Ghetta, Nyall Dawson'
+__date__ = '29/01/2020'
+__copyright__ = 'Istituto Nazionale di Geofisica e Vulcanologia (INGV)'
+# This will get replaced with a git SHA1 when you do a git archive
+__revision__ = '$Format:%H$'
+
+# Worker processes have no QgsApplication, so this module (and the parsers sent to the workers)
+# must only import the parser modules, and never the service manager, settings or plugin GUI.
+
+from typing import Union
+
+from qgis.PyQt.QtCore import QByteArray
+
+from qquake.quakeml.fdsn_station.parser import FDSNStationXMLParser
+
+MODE_PARSE = 'parse'
+MODE_INITIAL = 'initial'
+MODE_MDP = 'mdp'
+MODE_STATIONS = 'stations'
+
+
+def parse_content(parser, content: Union[bytes, QByteArray], mode: str):
+    """
+    Parses reply content using a parser, returning the parser containing the results.
+
+    This is run within the worker processes, or locally if the content cannot be parsed in a worker.
+    """
+    if not isinstance(content, QByteArray):
+        content = QByteArray(content)
+    if mode == MODE_STATIONS:
+        return FDSNStationXMLParser.parse(content)
+    if mode == MODE_MDP:
+        parser.add_mdp(content)
+    elif mode == MODE_INITIAL:
+        parser.parse_initial(content)
+    else:
+        parser.parse(content)
+    return parser
@@ -35,6 +35,7 @@ from qquake.gui.gui_utils import GuiUtils
 # Import the code for the dialog
 from qquake.gui.qquake_dialog import QQuakeDialog
 from qquake.gui.qquake_options_widget import QQuakeOptionsWidget
+from qquake.parse_pool import PARSE_POOL
 
 
 class QQuakeOptionsFactory(QgsOptionsWidgetFactory):
@@ -218,6 +219,8 @@ class QQuake:
         if self.options_factory:
             self.iface.unregisterOptionsWidgetFactory(self.options_factory)
 
+        PARSE_POOL.shutdown()
+
     def show_dialog(self):
         """
         Shows the QQuake dialog
@@ -2,5 +2,5 @@
 QuakeML parsing module
 """
 from .parser import QuakeMlParser
-from .exceptions import MissingOriginException
+from .exceptions import MissingOriginException, InvalidXmlException
 from .fdsn_station import FDSNStationXMLParser
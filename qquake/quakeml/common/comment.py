@@ -23,6 +23,8 @@ class Comment(QuakeMlElement):
     Comment
     """
 
+    __slots__ = ('text', 'id', 'creationInfo')
+
     def __init__(self,
                  text,
                  comment_id,
@@ -25,6 +25,8 @@ class CompositeTime(QuakeMlElement):
     CompositeTime
     """
 
+    __slots__ = ('year', 'month', 'day', 'hour', 'minute', 'second')
+
     def __init__(self,
                  year,
                  month,
@@ -23,6 +23,8 @@ class CreationInfo(QuakeMlElement):
     CreationInfo
     """
 
+    __slots__ = ('agencyID', 'agencyURI', 'author', 'authorURI', 'creationTime', 'version')
+
     def __init__(self,
                  agencyID,
                  agencyURI,
@@ -23,6 +23,8 @@ class Epoch(QuakeMlElement):
     Epoch
     """
 
+    __slots__ = ('startTime', 'endTime')
+
     def __init__(self,
                  startTime,
                  endTime):
@@ -23,6 +23,8 @@ class IntegerQuantity(QuakeMlElement):
     IntegerQuantity
     """
 
+    __slots__ = ('value', 'uncertainty', 'lowerUncertainty', 'upperUncertainty', 'confidenceLevel')
+
     def __init__(self,
                  value,
                  uncertainty,
@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+"""
+Fast ISO 8601 datetime decoding
+"""
+
+# .. note:: This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+
+__author__ = 'Original authors: Mario Locati, Roberto Vallone, Matteo Ghetta, Nyall Dawson'
+__date__ = '29/01/2020'
+__copyright__ = 'Istituto Nazionale di Geofisica e Vulcanologia (INGV)'
+# This will get replaced with a git SHA1 when you do a git archive
+__revision__ = '$Format:%H$'
+
+from functools import lru_cache
+from typing import Optional
+
+# number of distinct datetime strings to remember. Values such as station epochs repeat heavily
+# across a reply, so even a modest cache avoids most decoding work
+CACHE_SIZE = 16384
+
+MSECS_PER_DAY = 86400000
+
+_DAYS_IN_MONTH = (31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31)
+
+
+def _days_from_civil(year: int, month: int, day: int) -> int:
+    """
+    Returns the number of days since 1970-01-01 for a proleptic Gregorian date
+    """
+    year -= month <= 2
+    era = year // 400
+    year_of_era = year - era * 400
+    day_of_year = (153 * (month + (-3 if month > 2 else 9)) + 2) // 5 + day - 1
+    day_of_era = year_of_era * 365 + year_of_era // 4 - year_of_era // 100 + day_of_year
+    return era * 146097 + day_of_era - 719468
+
+
+def _is_valid_date(year: int, month: int, day: int) -> bool:
+    """
+    Returns True if a date is valid
+    """
+    if year < 1 or not 1 <= month <= 12 or day < 1:
+        return False
+
+    if month == 2 and (year % 4 == 0 and (year % 100 != 0 or year % 400 == 0)):
+        return day <= 29
+
+    return day <= _DAYS_IN_MONTH[month - 1]
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def decode_iso_datetime(value: str) -> Optional[int]:  # pylint: disable=too-many-return-statements
+    """
+    Decodes a UTC datetime string in one of the fixed width layouts used by FDSN services, i.e.
+    "yyyy-MM-dd", "yyyy-MM-ddThh:mm:ss" or "yyyy-MM-ddThh:mm:ss.z..." (with an optional trailing "Z").
+
+    Fractions of a second are truncated to milliseconds.
+
+    Returns the datetime as milliseconds since epoch, or None if the value does not match one of the
+    supported layouts (e.g. includes a time zone offset) or is not a valid datetime.
+    """
+    length = len(value)
+    if length < 10 or value[4] != '-' or value[7] != '-':
+        return None
+
+    date_part = value[:4] + value[5:7] + value[8:10]
+    if not date_part.isdigit() or not date_part.isascii():
+        return None
+
+    year = int(value[:4])
+    month = int(value[5:7])
+    day = int(value[8:10])
+    if not _is_valid_date(year, month, day):
+        return None
+
+    msecs = _days_from_civil(year, month, day) * MSECS_PER_DAY
+    if length == 10:
+        return msecs
+
+    if value[-1] in 'Zz':
+        value = value[:-1]
+        length -= 1
+
+    if length < 19 or value[10] != 'T' or value[13] != ':' or value[16] != ':':
+        return None
+
+    time_part = value[11:13] + value[14:16] + value[17:19]
+    if not time_part.isdigit() or not time_part.isascii():
+        return None
+
+    hour = int(value[11:13])
+    minute = int(value[14:16])
+    second = int(value[17:19])
+    if hour > 23 or minute > 59 or second > 59:
+        return None
+
+    millisecond = 0
+    if length > 19:
+        fraction = value[20:]
+        if value[19] != '.' or not fraction or not fraction.isdigit() or not fraction.isascii():
+            return None
+        millisecond = int((fraction + '00')[:3])
+
+    return msecs + ((hour * 60 + minute) * 60 + second) * 1000 + millisecond
@@ -14,7 +14,7 @@ __copyright__ = 'Istituto Nazionale di Geofisica e Vulcanologia (INGV)'
 # This will get replaced with a git SHA1 when you do a git archive
 __revision__ = '$Format:%H$'
 
-from typing import Dict
+from typing import Dict, Tuple, Type
 
 from qgis.PyQt.QtCore import (
     QDateTime,
@@ -23,11 +23,59 @@ from qgis.PyQt.QtCore import (
 from qgis.core import NULL
 
 
+# attributes to include in dictionary representations, by element class
+_DICT_ATTRIBUTES: Dict[type, Tuple[str, ...]] = {}
+
+
+def _restore_element(cls: Type['QuakeMlElement'], values: tuple, null_indexes: Tuple[int, ...]) -> 'QuakeMlElement':
+    """
+    Restores a pickled element from its attribute values
+    """
+    element = cls.__new__(cls)
+    for index, (name, value) in enumerate(zip(cls.dict_attributes(), values)):
+        setattr(element, name, NULL if index in null_indexes else value)
+    return element
+
+
 class QuakeMlElement:
     """
-    Base class for QuakeML elements
+    Base class for QuakeML elements.
+
+    Element classes declare their attributes via __slots__, so that large results (with millions of
+    small element objects) do not require a per-instance dictionary.
     """
 
+    __slots__ = ()
+
+    @classmethod
+    def dict_attributes(cls) -> Tuple[str, ...]:
+        """
+        Returns the attributes to include in the dictionary representation of the element class
+        """
+        attributes = _DICT_ATTRIBUTES.get(cls)
+        if attributes is None:
+            attributes = tuple(sorted({name for klass in cls.__mro__ for name in klass.__dict__.get('__slots__', ())}))
+            _DICT_ATTRIBUTES[cls] = attributes
+
+        return attributes
+
+    def __reduce__(self):
+        """
+        Pickles elements as a compact tuple of attribute values, e.g. for transferring parsed results
+        between processes
+        """
+        values = []
+        null_indexes = []
+        for index, name in enumerate(self.dict_attributes()):
+            value = getattr(self, name)
+            if value is not None and value == NULL:
+                # NULL variants can't be pickled
+                null_indexes.append(index)
+                value = None
+            values.append(value)
+
+        return _restore_element, (self.__class__, tuple(values), tuple(null_indexes))
+
     def to_dict(self) -> Dict[str, object]:
         """
         Converts the element to a python dictionary
@@ -55,14 +103,8 @@ class QuakeMlElement:
 
             raise NotImplementedError()
 
-        for _attr in dir(self):
-            if _attr.startswith('__'):
-                continue
-
+        for _attr in self.dict_attributes():
             val = getattr(self, _attr)
-            if callable(val):
-                continue
-
             try:
                 res[_attr] = convert_value(val)
             except NotImplementedError:
@@ -14,7 +14,7 @@ __copyright__ = 'Istituto Nazionale di Geofisica e Vulcanologia (INGV)'
 # This will get replaced with a git SHA1 when you do a git archive
 __revision__ = '$Format:%H$'
 
-from typing import Optional
+from typing import FrozenSet, Optional
 
 from qgis.PyQt.QtCore import (
     QDateTime,
@@ -22,16 +22,41 @@ from qgis.PyQt.QtCore import (
     QTime,
     Qt
 )
+from qgis.PyQt.QtXml import QDomElement
 from qgis.core import NULL
 
+from .datetime_decoder import decode_iso_datetime
+
 
 class ElementParser:  # pylint: disable=too-many-public-methods
     """
     QuakeML Element parser
     """
 
-    def __init__(self, element):
+    def __init__(self, element, children: Optional[FrozenSet[str]] = None):
+        """
+        :param element: element to parse
+        :param children: names of the child elements to parse, or None to parse all children. Other child
+         elements are treated as missing.
+        """
         self.element = element
+        self.children = children
+
+    def includes(self, name: str) -> bool:
+        """
+        Returns True if the child element with the specified name should be parsed
+        """
+        return self.children is None or name in self.children
+
+    def child_element(self, name: str) -> QDomElement:
+        """
+        Returns the first child element with the specified name, or a null element if the child is not present
+        or is not included in the parsed children
+        """
+        if self.children is not None and name not in self.children:
+            return QDomElement()
+
+        return self.element.firstChildElement(name)
 
     def text(self) -> Optional[str]:
         """
@@ -49,7 +74,7 @@ class ElementParser:  # pylint: disable=too-many-public-methods
             else:
                 res = self.element.attribute(attribute)
         else:
-            child = self.element.firstChildElement(attribute)
+            child = self.child_element(attribute)
             if optional and child.isNull():
                 res = None
             else:
@@ -60,7 +85,7 @@ class ElementParser:  # pylint: disable=too-many-public-methods
         """
         Returns a resource reference as a string
         """
-        child = self.element.firstChildElement(attribute)
+        child = self.child_element(attribute)
         if optional and child.isNull():
             return None
 
@@ -74,6 +99,12 @@ class ElementParser:  # pylint: disable=too-many-public-methods
         def to_datetime(val):
             if not val:
                 return NULL
+
+            msecs = decode_iso_datetime(val)
+            if msecs is not None:
+                return QDateTime.fromMSecsSinceEpoch(msecs, Qt.UTC)
+
+            # non-standard layouts
             if 'T' in val:
                 if '.' not in val:
                     val += '.000'
@@ -93,7 +124,7 @@ class ElementParser:  # pylint: disable=too-many-public-methods
             else:
                 res = to_datetime(self.element.attribute(attribute))
         else:
-            child = self.element.firstChildElement(attribute)
+            child = self.child_element(attribute)
             if optional and child.isNull():
                 res = None
             else:
@@ -104,7 +135,7 @@ class ElementParser:  # pylint: disable=too-many-public-methods
         """
         Returns an attribute as a TimeQuantity
         """
-        child = self.element.firstChildElement(attribute)
+        child = self.child_element(attribute)
         if optional and child.isNull():
             return None
 
@@ -115,7 +146,7 @@ class ElementParser:  # pylint: disable=too-many-public-methods
         """
         Returns an attribute as a RealQuantity
         """
-        child = self.element.firstChildElement(attribute)
+        child = self.child_element(attribute)
         if optional and child.isNull():
             return None
 
@@ -131,7 +162,7 @@ class ElementParser:  # pylint: disable=too-many-public-methods
         """
         Returns an attributes as an IntegerQuantity
         """
-        child = self.element.firstChildElement(attribute)
+        child = self.child_element(attribute)
         if optional and child.isNull():
             return None
 
@@ -153,7 +184,7 @@ class ElementParser:  # pylint: disable=too-many-public-methods
             else:
                 res = float(self.element.attribute(attribute))
         else:
-            child = self.element.firstChildElement(attribute)
+            child = self.child_element(attribute)
             if optional:
                 res = float(child.text()) if not child.isNull() else None
             else:
@@ -170,7 +201,7 @@ class ElementParser:  # pylint: disable=too-many-public-methods
             else:
                 res = int(self.element.attribute(attribute))
         else:
-            child = self.element.firstChildElement(attribute)
+            child = self.child_element(attribute)
             if optional:
                 res = int(child.text()) if not child.isNull() else None
             else:
@@ -181,7 +212,7 @@ class ElementParser:  # pylint: disable=too-many-public-methods
         """
         Returns an attribute as a boolean value
         """
-        child = self.element.firstChildElement(attribute)
+        child = self.child_element(attribute)
         if optional:
             return bool(child.text()) if not child.isNull() else None
 
@@ -191,7 +222,7 @@ class ElementParser:  # pylint: disable=too-many-public-methods
         """
         Returns an attribute as an CreationInfo
         """
-        child = self.element.firstChildElement(attribute)
+        child = self.child_element(attribute)
         if optional and child.isNull():
             return None
 
@@ -202,7 +233,7 @@ class ElementParser:  # pylint: disable=too-many-public-methods
         """
         Returns an attribute as a CompositeTime
         """
-        child = self.element.firstChildElement(attribute)
+        child = self.child_element(attribute)
         if optional and child.isNull():
             return None
 
@@ -213,7 +244,7 @@ class ElementParser:  # pylint: disable=too-many-public-methods
         """
         Returns an attribute as a Epoch
         """
-        child = self.element.firstChildElement(attribute)
+        child = self.child_element(attribute)
         if optional and child.isNull():
             return None
 
@@ -19,3 +19,9 @@ class MissingOriginException(Exception):
     """
     Raised when a referenced origin is not present
     """
+
+
+class InvalidXmlException(Exception):
+    """
+    Raised when reply content is not valid (or is truncated) XML
+    """
@@ -23,6 +23,11 @@ class ConfidenceEllipsoid(QuakeMlElement):
     ConfidenceEllipsoid
     """
 
+    __slots__ = (
+        'semiMajorAxisLength', 'semiMinorAxisLength', 'semiIntermediateAxisLength', 'majorAxisPlunge',
+        'majorAxisAzimuth', 'majorAxisRotation'
+    )
+
     def __init__(self,
                  semiMajorAxisLength,
                  semiMinorAxisLength,
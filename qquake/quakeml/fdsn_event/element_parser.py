@@ -27,7 +27,7 @@ class FDSNEventElementParser(ElementParser):
         """
         Returns an attributes as a ConfidenceEllipsoid
         """
-        child = self.element.firstChildElement(attribute)
+        child = self.child_element(attribute)
         if optional and child.isNull():
             return None
 
@@ -38,7 +38,7 @@ class FDSNEventElementParser(ElementParser):
         """
         Returns an attributes as an origin uncertainty string
         """
-        child = self.element.firstChildElement(attribute)
+        child = self.child_element(attribute)
         if optional and child.isNull():
             return None
 
@@ -48,7 +48,7 @@ class FDSNEventElementParser(ElementParser):
         """
         Returns an attribute as a OriginQuality
         """
-        child = self.element.firstChildElement(attribute)
+        child = self.child_element(attribute)
         if optional and child.isNull():
             return None
 
@@ -59,7 +59,7 @@ class FDSNEventElementParser(ElementParser):
         """
         Returns an attribute as a origin type
         """
-        child = self.element.firstChildElement(attribute)
+        child = self.child_element(attribute)
         if optional and child.isNull():
             return None
 
@@ -69,7 +69,7 @@ class FDSNEventElementParser(ElementParser):
         """
         Returns an attribute as an origin depth type
         """
-        child = self.element.firstChildElement(attribute)
+        child = self.child_element(attribute)
         if optional and child.isNull():
             return None
 
@@ -13,20 +13,18 @@ __copyright__ = 'Istituto Nazionale di Geofisica e Vulcanologia (INGV)'
 # This will get replaced with a git SHA1 when you do a git archive
 __revision__ = '$Format:%H$'
 
-from typing import Dict, Optional, List
+from typing import Dict, FrozenSet, Optional, List
 
 from qgis.PyQt.QtXml import QDomElement
 from qgis.core import (
     QgsFields,
     QgsFeature,
     QgsUnitTypes,
-    QgsSettings,
     QgsPoint,
-    QgsGeometry,
-    NULL
+    QgsGeometry
 )
 
-from qquake.services import SERVICE_MANAGER
+from ..field_config import FDSNEVENT
 from .event_description import EventDescription
 from .magnitude import Magnitude
 from .origin import Origin
@@ -34,7 +32,9 @@ from ..common import Comment
 from ..element import QuakeMlElement
 from ..exceptions import MissingOriginException
 from ..fields import (
-    CONFIG_FIELDS,
+    ExtractionPlan,
+    OutputOptions,
+    compile_extraction_plan,
     get_service_fields
 )
 
@@ -44,6 +44,11 @@ class Event(QuakeMlElement):
     QuakeML Event
     """
 
+    __slots__ = (
+        'publicID', 'type', 'typeCertainty', 'description', 'preferredOriginID', 'preferredMagnitudeID',
+        'preferredFocalMechanismID', 'creationInfo', 'origins', 'magnitudes', 'comments'
+    )
+
     def __init__(self,
                  publicID,
                  event_type,
@@ -72,127 +77,58 @@ class Event(QuakeMlElement):
         self.comments = comments
 
     @staticmethod
-    def to_fields(selected_fields: Optional[List[str]] = None) -> QgsFields:
+    def to_fields(selected_fields: Optional[List[str]] = None,
+                  output_options: Optional[OutputOptions] = None) -> QgsFields:
         """
         Returns the event field definition
         """
-        return get_service_fields(SERVICE_MANAGER.FDSNEVENT, selected_fields)
+        return get_service_fields(FDSNEVENT, selected_fields, output_options)
+
+    @staticmethod
+    def compile_extraction_plans(fields: QgsFields,
+                                 convert_negative_depths: bool,
+                                 depth_unit: QgsUnitTypes.DistanceUnit,
+                                 output_options: Optional[OutputOptions] = None) -> Dict[str, ExtractionPlan]:
+        """
+        Compiles the plans for extracting event, origin and magnitude attributes to the specified fields
+        """
+
+        def convert_depth(value):
+            if depth_unit == QgsUnitTypes.DistanceKilometers:
+                value /= 1000
+            if convert_negative_depths:
+                value = -value
+            return value
+
+        if output_options is None:
+            output_options = OutputOptions.from_settings()
+
+        return {
+            'event': compile_extraction_plan(FDSNEVENT, 'basic_event_info',
+                                             'eventParameters>event', fields,
+                                             output_options=output_options),
+            'origin': compile_extraction_plan(FDSNEVENT, 'origin',
+                                              'eventParameters>event>origin', fields,
+                                              converters={'eventParameters>event>origin>depth>value': convert_depth},
+                                              flag='!IsPrefOrigin', output_options=output_options),
+            'magnitude': compile_extraction_plan(FDSNEVENT, 'magnitude',
+                                                 'eventParameters>event>magnitude', fields,
+                                                 flag='!IsPrefMag', output_options=output_options),
+        }
 
     @staticmethod
-    def add_origin_attributes(origin: Origin,  # pylint: disable=too-many-locals,too-many-branches,too-many-statements
+    def add_origin_attributes(origin: Origin,
                               feature: QgsFeature,
-                              output_fields: Optional[List[str]],
+                              plan: ExtractionPlan,
                               convert_negative_depths: bool,
                               depth_unit: QgsUnitTypes.DistanceUnit,
                               is_preferred_origin: bool):
         """
         Adds origin related attributes to a feature
         """
-        settings = QgsSettings()
-
-        short_field_names = settings.value('/plugins/qquake/output_short_field_names', False, bool)
-        field_config_key = 'field_short' if short_field_names else 'field_long'
-
-        if output_fields:
-            output_is_preferred_origin = '!IsPrefOrigin' in output_fields
-        else:
-            output_is_preferred_origin = settings.value('/plugins/qquake/output_field_!IsPrefOrigin', False, bool)
-        if output_is_preferred_origin:
-            dest_field = \
-                [f for f in CONFIG_FIELDS['field_groups']['basic_event_info']['fields'] if
-                 f['source'] == '!IsPrefOrigin'][
-                    0]
-            feature[dest_field[field_config_key]] = is_preferred_origin or NULL
-
-        for dest_field in CONFIG_FIELDS['field_groups']['origin']['fields']:
-            if dest_field.get('skip'):
-                continue
-
-            if dest_field.get('one_to_many'):
-                continue
-
-            is_depth_field = dest_field['source'] == "eventParameters>event>origin>depth>value"
-
-            source = dest_field['source'].replace('§', '>').split('>')
-            assert source[0] == 'eventParameters'
-            source = source[1:]
-            assert source[0] == 'event'
-            source = source[1:]
+        plan.set_flag(feature, is_preferred_origin)
+        plan.apply(feature, origin)
 
-            if output_fields:
-                selected = dest_field['source'] in output_fields
-            else:
-                selected = settings.value('/plugins/qquake/output_field_{}'.format('_'.join(source)), True,
-                                          bool)
-            if not selected:
-                continue
-
-            assert source[0] == 'origin'
-            source = source[1:]
-
-            source_obj = origin
-            for s in source:
-                assert hasattr(source_obj, s)
-                source_obj = getattr(source_obj, s)
-                if source_obj is None:
-                    break
-
-            if is_depth_field and source_obj != NULL and source_obj is not None:
-                if depth_unit == QgsUnitTypes.DistanceKilometers:
-                    source_obj /= 1000
-                if convert_negative_depths:
-                    source_obj = -source_obj
-
-            feature[dest_field[field_config_key]] = source_obj
-
-        # link associated components
-        for dest_field in CONFIG_FIELDS['field_groups']['origin']['fields']:
-            if dest_field.get('skip') or dest_field.get('one_to_many'):
-                continue
-
-            associated_components = dest_field.get('associated_components')
-            if not associated_components:
-                continue
-
-            composite_value = feature[dest_field[field_config_key]]
-            if not composite_value or not composite_value.isValid():
-                continue
-
-            # find field linked to associated component and populate if empty
-            for component, source in associated_components.items():
-                if output_fields:
-                    selected = source in output_fields
-                else:
-                    selected = settings.value('/plugins/qquake/output_field_{}'.format('_'.join(source)), True,
-                                              bool)
-                if not selected:
-                    continue
-
-                matching_field = [field for field in CONFIG_FIELDS['field_groups']['origin']['fields'] if
-                                  field['source'] == source]
-                assert matching_field
-
-                current_value = feature[matching_field[0][field_config_key]]
-                if current_value and current_value != NULL:
-                    continue
-
-                if component == 'year':
-                    component_value = composite_value.date().year()
-                elif component == 'month':
-                    component_value = composite_value.date().month()
-                elif component == 'day':
-                    component_value = composite_value.date().day()
-                elif component == 'hour':
-                    component_value = composite_value.time().hour()
-                elif component == 'minute':
-                    component_value = composite_value.time().minute()
-                elif component == 'second':
-                    component_value = composite_value.time().second()
-                else:
-                    assert False
-
-                feature[matching_field[0][field_config_key]] = component_value
-        
         z = None
         if origin.depth is not None:
             z = origin.depth.value
@@ -215,109 +151,28 @@ class Event(QuakeMlElement):
     @staticmethod
     def add_magnitude_attributes(magnitude: Magnitude,
                                  feature: QgsFeature,
-                                 output_fields: Optional[List[str]],
+                                 plan: ExtractionPlan,
                                  is_preferred_magnitude: bool):
         """
         Adds magnitude related attributes to a feature
         """
-        settings = QgsSettings()
-
-        short_field_names = settings.value('/plugins/qquake/output_short_field_names', False, bool)
-        field_config_key = 'field_short' if short_field_names else 'field_long'
-
-        if output_fields:
-            output_is_preferred_mag = '!IsPrefMag' in output_fields
-        else:
-            output_is_preferred_mag = settings.value('/plugins/qquake/output_field_!IsPrefMag', False, bool)
-        if output_is_preferred_mag:
-            dest_field = \
-                [f for f in CONFIG_FIELDS['field_groups']['basic_event_info']['fields'] if f['source'] == '!IsPrefMag'][
-                    0]
-            feature[dest_field[field_config_key]] = is_preferred_magnitude or NULL
-
-        for dest_field in CONFIG_FIELDS['field_groups']['magnitude']['fields']:
-            if dest_field.get('skip'):
-                continue
+        plan.set_flag(feature, is_preferred_magnitude)
+        plan.apply(feature, magnitude)
 
-            if dest_field.get('one_to_many'):
-                continue
-
-            source = dest_field['source'].replace('§', '>').split('>')
-            assert source[0] == 'eventParameters'
-            source = source[1:]
-            assert source[0] == 'event'
-            source = source[1:]
-
-            if output_fields:
-                selected = dest_field['source'] in output_fields
-            else:
-                selected = settings.value('/plugins/qquake/output_field_{}'.format('_'.join(source)), True, bool)
-            if not selected:
-                continue
-
-            assert source[0] == 'magnitude'
-            source = source[1:]
-
-            source_obj = magnitude
-            for s in source:
-                assert hasattr(source_obj, s)
-                source_obj = getattr(source_obj, s)
-                if source_obj is None:
-                    source_obj = NULL
-                    break
-
-            feature[dest_field[field_config_key]] = source_obj
-
-    def to_features(self,  # pylint: disable=too-many-locals,too-many-branches,too-many-statements
-                    output_fields: Optional[List[str]],
+    def to_features(self,  # pylint: disable=too-many-arguments
+                    fields: QgsFields,
+                    plans: Dict[str, ExtractionPlan],
                     preferred_origin_only: bool,
                     preferred_magnitudes_only: bool, all_origins,
                     convert_negative_depths, depth_unit) -> QgsFeature:
         """
         Yields event features
-        """
-        settings = QgsSettings()
-
-        short_field_names = settings.value('/plugins/qquake/output_short_field_names', False, bool)
-        field_config_key = 'field_short' if short_field_names else 'field_long'
-
-        f = QgsFeature(self.to_fields(output_fields))
-        for dest_field in CONFIG_FIELDS['field_groups']['basic_event_info']['fields']:
-            if dest_field.get('skip'):
-                continue
-
-            if dest_field.get('one_to_many'):
-                continue
-
-            if dest_field['source'].startswith('!'):
-                continue
-
-            source = dest_field['source'].replace('§', '>').split('>')
-            assert source[0] == 'eventParameters'
-            source = source[1:]
-            assert source[0] == 'event'
-            source = source[1:]
 
-            if output_fields:
-                selected = dest_field['source'] in output_fields
-            else:
-                selected = settings.value('/plugins/qquake/output_field_{}'.format('_'.join(source)), True, bool)
-
-            if not selected:
-                continue
-
-            source_obj = self
-            for s in source:
-                if source_obj is None:
-                    source_obj = NULL
-                    break
-                assert hasattr(source_obj, s)
-                source_obj = getattr(source_obj, s)
-                if isinstance(source_obj, list):
-                    # hack to handle 1:many joins for now -- discard all but first
-                    source_obj = source_obj[0]
-
-            f[dest_field[field_config_key]] = source_obj
+        :param fields: output fields
+        :param plans: extraction plans, as returned by compile_extraction_plans()
+        """
+        f = QgsFeature(fields)
+        plans['event'].apply(f, self)
 
         origins_handled = set()
         for _, m in self.magnitudes.items():
@@ -338,8 +193,8 @@ class Event(QuakeMlElement):
 
             magnitude_feature = QgsFeature(f)
 
-            self.add_magnitude_attributes(m, magnitude_feature, output_fields, is_preferred_magnitude)
-            self.add_origin_attributes(magnitude_origin, magnitude_feature, output_fields,
+            self.add_magnitude_attributes(m, magnitude_feature, plans['magnitude'], is_preferred_magnitude)
+            self.add_origin_attributes(magnitude_origin, magnitude_feature, plans['origin'],
                                        convert_negative_depths=convert_negative_depths,
                                        depth_unit=depth_unit, is_preferred_origin=is_preferred_origin)
 
@@ -356,48 +211,77 @@ class Event(QuakeMlElement):
                 continue
 
             origin_feature = QgsFeature(f)
-            self.add_origin_attributes(o, origin_feature, output_fields,
+            self.add_origin_attributes(o, origin_feature, plans['origin'],
                                        convert_negative_depths=convert_negative_depths,
                                        depth_unit=depth_unit, is_preferred_origin=is_preferred_origin)
 
             yield origin_feature
 
     @staticmethod
-    def from_element(element: QDomElement) -> 'Event':
+    def from_element(element: QDomElement,
+                     preferred_origins_only: bool = False,
+                     preferred_magnitudes_only: bool = False,
+                     projection: Optional[Dict[str, FrozenSet[str]]] = None) -> 'Event':
         """
         Constructs an Event from a DOM element
+
+        :param preferred_origins_only: if True, only the preferred origin (and any origins referenced by
+         retained magnitudes) will be parsed
+        :param preferred_magnitudes_only: if True, only the preferred magnitude will be parsed
+        :param projection: optional names of the child elements to parse for the event, origin and magnitude
+         elements, as returned by element_projection(). If not set, all child elements are parsed.
         """
+        projection = projection or {}
         from .element_parser import FDSNEventElementParser  # pylint: disable=import-outside-toplevel
-        parser = FDSNEventElementParser(element)
+        parser = FDSNEventElementParser(element, projection.get('event'))
 
-        description_nodes = element.elementsByTagName('description')
         descriptions = []
-        for e in range(description_nodes.length()):
-            descriptions.append(EventDescription.from_element(description_nodes.at(e).toElement()))
-
-        origin_nodes = element.elementsByTagName('origin')
-        origins = {}
-        for e in range(origin_nodes.length()):
-            origin = Origin.from_element(origin_nodes.at(e).toElement())
-            origins[origin.publicID] = origin
+        origin_elements = []
+        magnitude_elements = []
+        comments = []
 
-        magnitude_nodes = element.elementsByTagName('magnitude')
+        # single pass over direct children only -- nested elements (e.g. origin comments) belong to the child
+        child = element.firstChildElement()
+        while not child.isNull():
+            tag = child.tagName()
+            if tag == 'origin':
+                origin_elements.append(child)
+            elif tag == 'magnitude':
+                magnitude_elements.append(child)
+            elif tag == 'description' and parser.includes(tag):
+                descriptions.append(EventDescription.from_element(child))
+            elif tag == 'comment' and parser.includes(tag):
+                comments.append(Comment.from_element(child))
+            child = child.nextSiblingElement()
+
+        preferred_origin_id = parser.resource_reference('preferredOriginID')
+        preferred_magnitude_id = parser.resource_reference('preferredMagnitudeID')
+
+        # non-preferred subtrees are skipped without parsing when they won't be output
         magnitudes = {}
-        for e in range(magnitude_nodes.length()):
-            magnitude = Magnitude.from_element(magnitude_nodes.at(e).toElement())
+        for magnitude_element in magnitude_elements:
+            if preferred_magnitudes_only and magnitude_element.attribute('publicID') != preferred_magnitude_id:
+                continue
+            magnitude = Magnitude.from_element(magnitude_element, projection.get('magnitude'))
             magnitudes[magnitude.publicID] = magnitude
 
-        comment_nodes = element.elementsByTagName('comment')
-        comments = []
-        for e in range(comment_nodes.length()):
-            comments.append(Comment.from_element(comment_nodes.at(e).toElement()))
+        # origins referenced by retained magnitudes are always required
+        required_origin_ids = {preferred_origin_id}
+        required_origin_ids.update(m.originID for m in magnitudes.values())
+
+        origins = {}
+        for origin_element in origin_elements:
+            if preferred_origins_only and origin_element.attribute('publicID') not in required_origin_ids:
+                continue
+            origin = Origin.from_element(origin_element, projection.get('origin'))
+            origins[origin.publicID] = origin
 
         return Event(publicID=parser.string('publicID', is_attribute=True, optional=False),
                      event_type=parser.string('type'),
                      typeCertainty=parser.string('typeCertainty'),
                      description=descriptions,
-                     preferredOriginID=parser.resource_reference('preferredOriginID'),
-                     preferredMagnitudeID=parser.resource_reference('preferredMagnitudeID'),
+                     preferredOriginID=preferred_origin_id,
+                     preferredMagnitudeID=preferred_magnitude_id,
                      preferredFocalMechanismID=parser.resource_reference('preferredFocalMechanismID'),
                      comments=comments,
                      creationInfo=parser.creation_info('creationInfo'),
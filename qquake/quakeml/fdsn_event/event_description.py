@@ -23,6 +23,8 @@ class EventDescription(QuakeMlElement):
     EventDescription
     """
 
+    __slots__ = ('text', 'type')
+
     def __init__(self, text, event_description_type):
         self.text = text
         self.type = event_description_type
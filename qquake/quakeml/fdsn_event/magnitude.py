@@ -13,6 +13,8 @@ __copyright__ = 'Istituto Nazionale di Geofisica e Vulcanologia (INGV)'
 # This will get replaced with a git SHA1 when you do a git archive
 __revision__ = '$Format:%H$'
 
+from typing import FrozenSet, Optional
+
 from qgis.PyQt.QtXml import QDomElement
 
 from ..element import QuakeMlElement
@@ -24,6 +26,11 @@ class Magnitude(QuakeMlElement):
     Magnitude
     """
 
+    __slots__ = (
+        'publicID', 'mag', 'originID', 'methodID', 'azimuthalGap', 'stationCount', 'evaluationMode', 'type',
+        'evaluationStatus', 'comments', 'creationInfo'
+    )
+
     def __init__(self,
                  publicID,
                  mag,
@@ -50,17 +57,21 @@ class Magnitude(QuakeMlElement):
         self.creationInfo = creationInfo
 
     @staticmethod
-    def from_element(element: QDomElement) -> 'Magnitude':
+    def from_element(element: QDomElement, children: Optional[FrozenSet[str]] = None) -> 'Magnitude':
         """
         Constructs a Magnitude from a DOM element
+
+        :param children: names of the child elements to parse, or None to parse all children
         """
-        comment_nodes = element.elementsByTagName('comment')
+        from .element_parser import FDSNEventElementParser  # pylint: disable=import-outside-toplevel
+        parser = FDSNEventElementParser(element, children)
+
         comments = []
-        for e in range(comment_nodes.length()):
-            comments.append(Comment.from_element(comment_nodes.at(e).toElement()))
+        comment_node = parser.child_element('comment')
+        while not comment_node.isNull():
+            comments.append(Comment.from_element(comment_node))
+            comment_node = comment_node.nextSiblingElement('comment')
 
-        from .element_parser import FDSNEventElementParser  # pylint: disable=import-outside-toplevel
-        parser = FDSNEventElementParser(element)
         return Magnitude(publicID=parser.string('publicID', is_attribute=True),
                          mag=parser.real_quantity('mag', optional=False),
                          magnitude_type=parser.string('type'),
@@ -13,6 +13,8 @@ __copyright__ = 'Istituto Nazionale di Geofisica e Vulcanologia (INGV)'
 # This will get replaced with a git SHA1 when you do a git archive
 __revision__ = '$Format:%H$'
 
+from typing import FrozenSet, Optional
+
 from qgis.PyQt.QtXml import QDomElement
 
 from .origin_uncertainty import OriginUncertainty
@@ -25,6 +27,12 @@ class Origin(QuakeMlElement):
     Origin
     """
 
+    __slots__ = (
+        'publicID', 'time', 'longitude', 'latitude', 'depth', 'depthType', 'timeFixed', 'epicenterFixed',
+        'referenceSystemID', 'methodID', 'earthModelID', 'compositeTime', 'quality', 'type', 'region',
+        'evaluationMode', 'evaluationStatus', 'comments', 'creationInfo', 'originUncertainty'
+    )
+
     def __init__(self,  # pylint: disable=too-many-locals
                  publicID,
                  time,
@@ -73,22 +81,28 @@ class Origin(QuakeMlElement):
             self.time = self.compositeTime.to_timequantity()
 
     @staticmethod
-    def from_element(element: QDomElement) -> 'Origin':
+    def from_element(element: QDomElement, children: Optional[FrozenSet[str]] = None) -> 'Origin':
         """
         Constructs an Origin from a DOM element
+
+        :param children: names of the child elements to parse, or None to parse all children
         """
-        comment_nodes = element.elementsByTagName('comment')
-        comments = []
-        for e in range(comment_nodes.length()):
-            comments.append(Comment.from_element(comment_nodes.at(e).toElement()))
+        from .element_parser import FDSNEventElementParser  # pylint: disable=import-outside-toplevel
+        parser = FDSNEventElementParser(element, children)
 
-        origin_uncertainty_nodes = element.elementsByTagName('originUncertainty')
+        comments = []
         origin_uncertainty = None
-        if origin_uncertainty_nodes.length():
-            OriginUncertainty.from_element(origin_uncertainty_nodes.at(0).toElement())
 
-        from .element_parser import FDSNEventElementParser  # pylint: disable=import-outside-toplevel
-        parser = FDSNEventElementParser(element)
+        if parser.includes('comment') or parser.includes('originUncertainty'):
+            child = element.firstChildElement()
+            while not child.isNull():
+                tag = child.tagName()
+                if tag == 'comment' and parser.includes(tag):
+                    comments.append(Comment.from_element(child))
+                elif tag == 'originUncertainty' and origin_uncertainty is None and parser.includes(tag):
+                    origin_uncertainty = OriginUncertainty.from_element(child)
+                child = child.nextSiblingElement()
+
         return Origin(publicID=parser.string('publicID', optional=False, is_attribute=True),
                       time=parser.time_quantity('time'),
                       longitude=parser.real_quantity('longitude'),
@@ -23,6 +23,12 @@ class OriginQuality(QuakeMlElement):
     OriginQuality
     """
 
+    __slots__ = (
+        'associatedPhaseCount', 'usedPhaseCount', 'associatedStationCount', 'usedStationCount', 'depthPhaseCount',
+        'standardError', 'azimuthalGap', 'secondaryAzimuthalGap', 'groundTruthLevel', 'maximumDistance',
+        'minimumDistance', 'medianDistance'
+    )
+
     def __init__(self,
                  associatedPhaseCount,
                  usedPhaseCount,
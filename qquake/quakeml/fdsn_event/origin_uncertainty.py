@@ -23,6 +23,11 @@ class OriginUncertainty(QuakeMlElement):
     OriginUncertainty
     """
 
+    __slots__ = (
+        'horizontalUncertainty', 'minHorizontalUncertainty', 'maxHorizontalUncertainty',
+        'azimuthMaxHorizontalUncertainty', 'confidenceEllipsoid', 'preferredDescription', 'confidenceLevel'
+    )
+
     def __init__(self,
                  horizontalUncertainty,
                  minHorizontalUncertainty,
@@ -23,6 +23,11 @@ class BaseNodeType(QuakeMlElement):
     A base node type for derivation from: Network, Station and Channel types.
     """
 
+    __slots__ = (
+        'Code', 'StartDate', 'EndDate', 'SourceID', 'RestrictedStatus', 'AlternateCode', 'HistoricalCode',
+        'Description', 'DataAvailability', 'Comment', 'Identifier'
+    )
+
     def __init__(self,
                  Code,
                  StartDate,
@@ -23,6 +23,8 @@ class Comment(QuakeMlElement):
     Container for a comment or log entry. Corresponds to SEED blockettes 31, 51 and 59.
     """
 
+    __slots__ = ('Value', 'BeginEffectiveTime', 'EndEffectiveTime', 'Author', 'Id', 'subject')
+
     def __init__(self,
                  value,
                  begin_effective_time,
@@ -23,6 +23,8 @@ class DataAvailability(QuakeMlElement):
     An type for describing data availability.
     """
 
+    __slots__ = ('Extent', 'Span')
+
     def __init__(self,
                  extent,
                  span
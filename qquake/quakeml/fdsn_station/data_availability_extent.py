@@ -23,6 +23,8 @@ class DataAvailabilityExtent(QuakeMlElement):
     A type for describing data availability extents, the earliest and latest data available. No information is included about the continuity of the data is included or implied.
     """
 
+    __slots__ = ('start', 'end')
+
     def __init__(self,
                  start,
                  end):
@@ -27,6 +27,8 @@ class DataAvailabilitySpan(QuakeMlElement):
     depending on the data characteristics.
     """
 
+    __slots__ = ('start', 'end', 'numberSegments', 'maximumTimeTear')
+
     def __init__(self,
                  start,
                  end,
@@ -23,6 +23,11 @@ class Equipment(QuakeMlElement):
     Equipment
     """
 
+    __slots__ = (
+        'Type', 'Description', 'Manufacturer', 'Vendor', 'Model', 'SerialNumber', 'InstallationDate', 'RemovalDate',
+        'CalibrationDate', 'resourceId'
+    )
+
     def __init__(self, Type, Description, Manufacturer, Vendor, Model, SerialNumber, InstallationDate, RemovalDate,
                  CalibrationDate, resourceId):
         self.Type = Type
@@ -23,6 +23,8 @@ class ExternalReference(QuakeMlElement):
     ExternalReference
     """
 
+    __slots__ = ('URI', 'Description')
+
     def __init__(self, URI, Description):
         self.URI = URI
         self.Description = Description
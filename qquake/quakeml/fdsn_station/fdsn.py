@@ -17,15 +17,20 @@ from typing import List, Optional
 
 from qgis.PyQt.QtXml import QDomElement
 from qgis.core import (
+    NULL,
     QgsFeature,
-    QgsSettings,
     QgsPoint,
     QgsGeometry
 )
 
-from qquake.services import SERVICE_MANAGER
+from ..field_config import FDSNSTATION
+from .network import Network
 from .station import Station
 from ..element import QuakeMlElement
+from ..fields import (
+    OutputOptions,
+    compile_extraction_plan
+)
 
 
 class Fdsn(QuakeMlElement):
@@ -33,6 +38,8 @@ class Fdsn(QuakeMlElement):
     Root type for FDSN
     """
 
+    __slots__ = ('Source', 'Sender', 'Module', 'ModuleURI', 'Created', 'networks', 'schemaVersion')
+
     def __init__(self,
                  source,
                  sender,
@@ -51,20 +58,22 @@ class Fdsn(QuakeMlElement):
         self.schemaVersion = schema_version
 
     @staticmethod
-    def from_element(element: QDomElement) -> 'Fdsn':
+    def from_element(element: QDomElement, networks: Optional[List[Network]] = None) -> 'Fdsn':
         """
         Constructs a DataAvailability from a DOM element
+
+        :param networks: optional list of already parsed networks. If not set, networks will be parsed
+         from the element.
         """
         from ..element_parser import ElementParser  # pylint: disable=import-outside-toplevel
         parser = ElementParser(element)
 
-        network_elements = element.elementsByTagName('Network')
-
-        from .network import Network  # pylint: disable=import-outside-toplevel
-        networks = []
-        for e in range(network_elements.length()):
-            network_element = network_elements.at(e).toElement()
-            networks.append(Network.from_element(network_element))
+        if networks is None:
+            networks = []
+            network_element = element.firstChildElement('Network')
+            while not network_element.isNull():
+                networks.append(Network.from_element(network_element))
+                network_element = network_element.nextSiblingElement('Network')
 
         return Fdsn(
             source=parser.string('Source'),
@@ -76,119 +85,49 @@ class Fdsn(QuakeMlElement):
             schema_version=parser.float('schemaVersion', is_attribute=True)
         )
 
-    def to_station_features(self, selected_fields: Optional[List[str]]) -> List[QgsFeature]:  # pylint: disable=too-many-locals,too-many-branches,too-many-statements
+    def to_station_features(self,
+                            selected_fields: Optional[List[str]],
+                            output_options: Optional[OutputOptions] = None) -> List[QgsFeature]:
         """
         Converts the network to a list of station features
         """
         features = []
-        settings = QgsSettings()
-
-        short_field_names = settings.value('/plugins/qquake/output_short_field_names', False, bool)
-        field_config_key = 'field_short' if short_field_names else 'field_long'
-
-        general_feature = QgsFeature(Station.to_fields(selected_fields))
-
-        for dest_field in SERVICE_MANAGER.get_field_config(SERVICE_MANAGER.FDSNSTATION)['field_groups']['general'][
-            'fields']:
-            if dest_field.get('skip'):
-                continue
-
-            if dest_field.get('one_to_many'):
-                continue
-
-            source = dest_field['source'].replace('§', '>').split('>')
-            assert source[0] == 'FDSNStationXML'
-            source = source[1:]
-            source_obj = self
-
-            if selected_fields:
-                selected = dest_field['source'] in selected_fields
-            else:
-                selected = settings.value('/plugins/qquake/output_field_{}'.format('_'.join(source)), True, bool)
-            if not selected:
-                continue
-
-            for s in source:
-                assert hasattr(source_obj, s)
-                source_obj = getattr(source_obj, s)
-                if source_obj is None:
-                    break
-
-            general_feature[dest_field[field_config_key]] = source_obj
 
+        if output_options is None:
+            output_options = OutputOptions.from_settings()
+
+        fields = Station.to_fields(selected_fields, output_options)
+        general_plan = compile_extraction_plan(FDSNSTATION, 'general', 'FDSNStationXML', fields,
+                                               output_options=output_options)
+        network_plan = compile_extraction_plan(FDSNSTATION, 'network', 'FDSNStationXML>Network',
+                                               fields, output_options=output_options)
+        station_plan = compile_extraction_plan(FDSNSTATION, 'station',
+                                               'FDSNStationXML>Network>Station', fields,
+                                               output_options=output_options)
+
+        # attributes are collected in plain lists, with the general and network attributes
+        # used as a prototype for all stations from a network
+        general_attributes = [NULL] * fields.count()
+        general_plan.apply_to_attributes(general_attributes, self)
+
+        station_attributes = []
+        points = []
         for network in self.networks:
-            network_feature = QgsFeature(general_feature)
-
-            for dest_field in SERVICE_MANAGER.get_field_config(SERVICE_MANAGER.FDSNSTATION)['field_groups']['network'][
-                'fields']:
-                if dest_field.get('skip'):
-                    continue
-
-                if dest_field.get('one_to_many'):
-                    continue
-
-                source = dest_field['source'].replace('§', '>').split('>')
-                assert source[0] == 'FDSNStationXML'
-                source = source[1:]
-                assert source[0] == 'Network'
-                source = source[1:]
-                source_obj = network
-
-                if selected_fields:
-                    selected = dest_field['source'] in selected_fields
-                else:
-                    selected = settings.value('/plugins/qquake/output_field_{}'.format('_'.join(source)), True, bool)
-                if not selected:
-                    continue
-
-                for s in source:
-                    assert hasattr(source_obj, s)
-                    source_obj = getattr(source_obj, s)
-                    if source_obj is None:
-                        break
-
-                network_feature[dest_field[field_config_key]] = source_obj
+            network_attributes = list(general_attributes)
+            network_plan.apply_to_attributes(network_attributes, network)
 
             for o in network.stations:
-                f = QgsFeature(network_feature)
-                for dest_field in SERVICE_MANAGER.get_field_config(SERVICE_MANAGER.FDSNSTATION)['field_groups']['station'][
-                    'fields']:
-                    if dest_field.get('skip'):
-                        continue
-
-                    if dest_field.get('one_to_many'):
-                        continue
-
-                    source = dest_field['source'].replace('§', '>').split('>')
-                    assert source[0] == 'FDSNStationXML'
-                    source = source[1:]
-                    assert source[0] == 'Network'
-                    source = source[1:]
-                    source_obj = self
-
-                    if source[0] == 'Station':
-                        source_obj = o
-                        source = source[1:]
-
-                    if selected_fields:
-                        selected = dest_field['source'] in selected_fields
-                    else:
-                        selected = settings.value('/plugins/qquake/output_field_{}'.format('_'.join(source)), True, bool)
-                    if not selected:
-                        continue
-
-                    for s in source:
-                        assert hasattr(source_obj, s)
-                        source_obj = getattr(source_obj, s)
-                        if source_obj is None:
-                            break
-
-                    f[dest_field[field_config_key]] = source_obj
-
-                geom = QgsPoint(x=o.Longitude, y=o.Latitude,
-                                z=o.Elevation)
-                f.setGeometry(QgsGeometry(geom))
-
-                features.append(f)
+                attributes = list(network_attributes)
+                station_plan.apply_to_attributes(attributes, o)
+                station_attributes.append(attributes)
+                points.append((o.Longitude, o.Latitude, o.Elevation))
+
+        geometries = [QgsGeometry(QgsPoint(x=x, y=y, z=z)) for x, y, z in points]
+
+        for attributes, geometry in zip(station_attributes, geometries):
+            f = QgsFeature(fields)
+            f.setAttributes(attributes)
+            f.setGeometry(geometry)
+            features.append(f)
 
         return features
@@ -25,6 +25,8 @@ class Identifier(QuakeMlElement):
     identifer type is documented as an attribute.
     """
 
+    __slots__ = ('Value', 'Type')
+
     def __init__(self,
                  value,
                  _type
@@ -28,6 +28,8 @@ class Network(BaseNodeType):
     Description element. The Network can contain 0 or more Stations.
     """
 
+    __slots__ = ('stations', 'Operator', 'TotalNumberStations', 'SelectedNumberStations')
+
     def __init__(self,
                  stations,
                  operator,
@@ -58,10 +60,11 @@ class Network(BaseNodeType):
         """
         Constructs a Network from a DOM element
         """
-        station_nodes = element.elementsByTagName('Station')
         stations = []
-        for e in range(station_nodes.length()):
-            stations.append(Station.from_element(station_nodes.at(e).toElement()))
+        station_element = element.firstChildElement('Station')
+        while not station_element.isNull():
+            stations.append(Station.from_element(station_element))
+            station_element = station_element.nextSiblingElement('Station')
 
         from .element_parser import FDSNStationElementParser  # pylint: disable=import-outside-toplevel
         parser = FDSNStationElementParser(element)
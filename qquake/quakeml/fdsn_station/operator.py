@@ -23,6 +23,8 @@ class Operator(QuakeMlElement):
     Operator
     """
 
+    __slots__ = ('Agency', 'Contact', 'Website')
+
     def __init__(self, Agency, Contact, Website):
         self.Agency = Agency
         self.Contact = Contact
@@ -13,14 +13,22 @@ __copyright__ = 'Istituto Nazionale di Geofisica e Vulcanologia (INGV)'
 # This will get replaced with a git SHA1 when you do a git archive
 __revision__ = '$Format:%H$'
 
+from typing import List, Optional
+
 from qgis.PyQt.QtCore import (
     QByteArray
 )
-from qgis.PyQt.QtXml import QDomDocument
+from qgis.PyQt.QtXml import QDomElement
 
-from qquake.services import SERVICE_MANAGER
+from ..field_config import FDSNSTATION
 from .fdsn import Fdsn
-from ..fields import get_service_fields
+from .network import Network
+from ..fields import (
+    OutputOptions,
+    get_service_fields
+)
+from ..exceptions import InvalidXmlException
+from ..stream_reader import QuakeMlStreamReader
 
 
 class FDSNStationXMLParser:
@@ -28,21 +36,41 @@ class FDSNStationXMLParser:
     FDSNStationXML parser
     """
 
+    # elements which are skipped while parsing. Channels (and their responses) make up most of channel
+    # and response level documents, but are not used by any output fields
+    SKIPPED_ELEMENTS = {'Channel'}
+
     @staticmethod
     def parse(content: QByteArray) -> Fdsn:
         """
-        Parses content
+        Parses content.
+
+        Content is parsed in a single streaming pass, with networks parsed as soon as they have been read
+        and then discarded, so that the whole document is never held in memory.
         """
-        doc = QDomDocument()
-        doc.setContent(content)
+        root_elements: List[QDomElement] = []
+        networks: List[Network] = []
+
+        def element_read(name: str, element: QDomElement):
+            if name == 'Network':
+                networks.append(Network.from_element(element))
+                element.parentNode().removeChild(element)
+            else:
+                root_elements.append(element)
+
+        reader = QuakeMlStreamReader({'FDSNStationXML', 'Network'}, element_read,
+                                     skip_elements=FDSNStationXMLParser.SKIPPED_ELEMENTS)
+        reader.add_data(content)
+        if not reader.finish():
+            raise InvalidXmlException('Invalid StationXML reply, {}'.format(reader.error_string()))
 
-        return Fdsn.from_element(doc.documentElement())
+        return Fdsn.from_element(root_elements[0] if root_elements else QDomElement(), networks)
 
     @staticmethod
-    def remap_attribute_name(attribute: str) -> str:
+    def remap_attribute_name(attribute: str, output_options: Optional[OutputOptions] = None) -> str:
         """
         Returns a remapped attribute name (i.e. accounting for user-defined output attribute names)
         """
         if not attribute:
             return attribute
-        return get_service_fields(SERVICE_MANAGER.FDSNSTATION, [attribute]).at(0).name()
+        return get_service_fields(FDSNSTATION, [attribute], output_options).at(0).name()
@@ -24,6 +24,8 @@ class Person(QuakeMlElement):
     to multiple agencies and have multiple email addresses and phone numbers.
     """
 
+    __slots__ = ('Name', 'Agency', 'Email', 'Phone')
+
     def __init__(self,
                  name,
                  agency,
@@ -23,6 +23,8 @@ class PhoneNumber(QuakeMlElement):
     PhoneNumber
     """
 
+    __slots__ = ('CountryCode', 'AreaCode', 'PhoneNumber', 'description')
+
     def __init__(self,
                  country_code,
                  area_code,
@@ -23,6 +23,8 @@ class Site(QuakeMlElement):
     Site
     """
 
+    __slots__ = ('Name', 'Description', 'Town', 'County', 'Region', 'Country')
+
     def __init__(self, Name, Description, Town, County, Region, Country):
         self.Name = Name
         self.Description = Description
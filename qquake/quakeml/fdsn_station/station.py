@@ -16,14 +16,14 @@ __revision__ = '$Format:%H$'
 from typing import Optional, List
 
 from qgis.PyQt.QtXml import QDomElement
-from qgis.core import (
-    QgsField,
-    QgsFields,
-    QgsSettings,
-)
+from qgis.core import QgsFields
 
-from qquake.services import SERVICE_MANAGER
+from ..field_config import FDSNSTATION
 from .base_node import BaseNodeType
+from ..fields import (
+    OutputOptions,
+    get_service_fields
+)
 
 
 class Station(BaseNodeType):
@@ -32,6 +32,12 @@ class Station(BaseNodeType):
     station's creation and termination dates as the epoch start and end dates.
     """
 
+    __slots__ = (
+        'Latitude', 'Longitude', 'Elevation', 'Site', 'WaterLevel', 'Vault', 'Geology', 'CreationDate',
+        'TerminationDate', 'TotalNumberChannels', 'SelectedNumberChannels', 'Equipment', 'Operator',
+        'ExternalReference'
+    )
+
     def __init__(self,  # pylint: disable=too-many-locals
                  start_date,
                  end_date,
@@ -76,37 +82,12 @@ class Station(BaseNodeType):
         self.ExternalReference = external_reference
 
     @staticmethod
-    def to_fields(selected_fields: Optional[List[str]]) -> QgsFields:
+    def to_fields(selected_fields: Optional[List[str]] = None,
+                  output_options: Optional[OutputOptions] = None) -> QgsFields:
         """
         Returns station fields
         """
-        from ..fields import FIELD_TYPE_MAP  # pylint: disable=import-outside-toplevel
-
-        fields = QgsFields()
-        settings = QgsSettings()
-
-        short_field_names = settings.value('/plugins/qquake/output_short_field_names', False, bool)
-        field_config_key = 'field_short' if short_field_names else 'field_long'
-
-        for group in ['general', 'network', 'station']:
-            for f in SERVICE_MANAGER.get_field_config(SERVICE_MANAGER.FDSNSTATION)['field_groups'][group]['fields']:
-                if f.get('skip'):
-                    continue
-
-                if f.get('one_to_many'):
-                    continue
-
-                path = f['source']
-                if selected_fields:
-                    selected = path in selected_fields
-                else:
-                    path = path[len('FDSNStationXML>'):].replace('§', '>').replace('>', '_')
-                    selected = settings.value('/plugins/qquake/output_field_{}'.format(path), True, bool)
-                if not selected:
-                    continue
-
-                fields.append(QgsField(f[field_config_key], FIELD_TYPE_MAP[f['type']]))
-        return fields
+        return get_service_fields(FDSNSTATION, selected_fields, output_options)
 
     @staticmethod
     def from_element(element: QDomElement) -> 'Station':
@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+"""
+Field configuration
+"""
+
+# .. note:: This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+
+__author__ = 'Original authors: Mario Locati, Roberto Vallone, Matteo Ghetta, Nyall Dawson'
+__date__ = '29/01/2020'
+__copyright__ = 'Istituto Nazionale di Geofisica e Vulcanologia (INGV)'
+# This will get replaced with a git SHA1 when you do a git archive
+__revision__ = '$Format:%H$'
+
+import json
+import os
+
+# service types, matching the ServiceManager service types. These are defined here (rather than
+# using the service manager) so that the parsers can be imported by worker processes, which
+# have no QgsApplication and no service manager.
+FDSNEVENT = 'fdsnevent'
+FDSNSTATION = 'fdsnstation'
+MACROSEISMIC = 'macroseismic'
+
+
+def load_field_config(filename: str) -> dict:
+    """
+    Loads a configuration JSON file and returns as a dict
+    """
+    path = os.path.join(
+        os.path.dirname(__file__),
+        '../config', filename)
+
+    with open(path, 'r', encoding='utf8') as f:
+        return json.load(f)
+
+
+FIELD_CONFIG = {
+    FDSNEVENT: load_field_config('config_fields_fdsnevent.json'),
+    MACROSEISMIC: load_field_config('config_fields_macroseismic.json'),
+    FDSNSTATION: load_field_config('config_fields_station.json')
+}
+
+
+def get_field_config(service_type: str) -> dict:
+    """
+    Returns the field configuration dictionary for a specific service type
+    """
+    return FIELD_CONFIG[service_type]
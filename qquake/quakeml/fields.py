@@ -16,7 +16,7 @@ __revision__ = '$Format:%H$'
 
 import json
 import os
-from typing import Optional, List
+from typing import Optional, List, Dict, Tuple, Callable, FrozenSet, NamedTuple, Union
 
 from qgis.PyQt.QtCore import (
     QVariant
@@ -24,10 +24,17 @@ from qgis.PyQt.QtCore import (
 from qgis.core import (
     QgsField,
     QgsFields,
-    QgsSettings
+    QgsFeature,
+    QgsSettings,
+    NULL
 )
 
-from qquake.services import SERVICE_MANAGER
+from .field_config import (
+    FDSNEVENT,
+    FDSNSTATION,
+    MACROSEISMIC,
+    get_field_config
+)
 
 CONFIG_FIELDS_PATH = os.path.join(
     os.path.dirname(__file__),
@@ -50,155 +57,347 @@ FIELD_TYPE_MAP = {
 }
 
 
-def get_service_fields(service_type: str,  # pylint: disable=too-many-branches,too-many-statements
-                       selected_fields: Optional[List[str]]) -> QgsFields:
+def default_field_setting_key(source: str) -> str:
     """
-    Gets the field configuration for a service
+    Returns the settings key which controls whether a field is included in the output by default
     """
-    fields = QgsFields()
-    settings = QgsSettings()
-    short_field_names = settings.value('/plugins/qquake/output_short_field_names', False, bool)
-    field_config_key = 'field_short' if short_field_names else 'field_long'
+    if source.startswith('macroseismicParameters>'):
+        path = source[len('macroseismicParameters>'):]
+    elif source.startswith('FDSNStationXML>'):
+        path = source[len('FDSNStationXML>'):]
+    else:
+        path = source[len('eventParameters>event>'):]
 
-    include_quake_details_in_mdp = settings.value('/plugins/qquake/include_quake_details_in_mdp', True, bool)
+    return '/plugins/qquake/output_field_{}'.format(path.replace('§', '>').replace('>', '_'))
 
-    field_config = SERVICE_MANAGER.get_field_config(service_type)
-    for f in field_config['field_groups'].get('basic_event_info', {}).get('fields', []):
-        if f.get('skip'):
-            continue
 
-        if f.get('one_to_many'):
-            continue
+class OutputOptions(NamedTuple):
+    """
+    An immutable snapshot of the output table settings.
 
-        path = f['source']
-        if service_type == SERVICE_MANAGER.MACROSEISMIC and not include_quake_details_in_mdp and '>event' in path and path != 'eventParameters>event§publicID':
-            continue
+    Options are captured once when a fetch is created, so that building fields and features
+    does not need to read settings and results stay consistent if settings are changed mid-fetch.
+    """
 
+    short_field_names: bool = False
+    include_quake_details_in_mdp: bool = True
+    preferred_origins_only: bool = True
+    preferred_magnitudes_only: bool = True
+    preferred_mdp_only: bool = True
+    # settings keys of fields which are excluded from the default field selection
+    deselected_fields: FrozenSet[str] = frozenset()
+
+    @staticmethod
+    def from_settings() -> 'OutputOptions':
+        """
+        Captures the current output settings
+        """
+        settings = QgsSettings()
+
+        keys = set()
+        for service_type in (FDSNEVENT, MACROSEISMIC, FDSNSTATION):
+            for group in get_field_config(service_type)['field_groups'].values():
+                keys.update(default_field_setting_key(f['source']) for f in group['fields'] if f.get('source'))
+
+        return OutputOptions(
+            short_field_names=settings.value('/plugins/qquake/output_short_field_names', False, bool),
+            include_quake_details_in_mdp=settings.value('/plugins/qquake/include_quake_details_in_mdp', True, bool),
+            preferred_origins_only=settings.value('/plugins/qquake/output_preferred_origins', True, bool),
+            preferred_magnitudes_only=settings.value('/plugins/qquake/output_preferred_magnitude', True, bool),
+            preferred_mdp_only=settings.value('/plugins/qquake/output_preferred_mdp', True, bool),
+            deselected_fields=frozenset(key for key in keys if not settings.value(key, True, bool))
+        )
+
+    def field_config_key(self) -> str:
+        """
+        Returns the field configuration key for output field names
+        """
+        return 'field_short' if self.short_field_names else 'field_long'
+
+    def is_field_selected(self, source: str, selected_fields: Optional[List[str]]) -> bool:
+        """
+        Returns True if the field with the specified source should be included in the output.
+
+        If no explicit list of selected fields is specified then the default field selection is used.
+        """
         if selected_fields:
-            # use specified fields
-            selected = path in selected_fields
-        else:
-            # use default settings
-            path = path[len('eventParameters>event>'):].replace('§', '>').replace('>', '_')
-            selected = settings.value('/plugins/qquake/output_field_{}'.format(path), True, bool)
-
-        if not selected:
-            continue
+            return source in selected_fields
 
-        fields.append(QgsField(f[field_config_key], FIELD_TYPE_MAP[f['type']]))
+        return default_field_setting_key(source) not in self.deselected_fields
 
-    for f in field_config['field_groups'].get('origin', {}).get('fields', []):
-        if f.get('skip'):
-            continue
 
-        if f.get('one_to_many'):
-            continue
+DATETIME_COMPONENTS = {
+    'year': lambda value: value.date().year(),
+    'month': lambda value: value.date().month(),
+    'day': lambda value: value.date().day(),
+    'hour': lambda value: value.time().hour(),
+    'minute': lambda value: value.time().minute(),
+    'second': lambda value: value.time().second(),
+}
 
-        path = f['source']
-        if service_type == SERVICE_MANAGER.MACROSEISMIC and not include_quake_details_in_mdp:
-            continue
 
-        if selected_fields:
-            selected = path in selected_fields
-        else:
-            path = path[len('eventParameters>event>'):].replace('§', '>').replace('>', '_')
-            selected = settings.value('/plugins/qquake/output_field_{}'.format(path), True, bool)
-        if not selected:
-            continue
+def extract_value(source_obj, accessors: Tuple[str, ...]):
+    """
+    Extracts a value from an element by following a chain of attribute names
+    """
+    for accessor in accessors:
+        if source_obj is None:
+            return NULL
 
-        fields.append(QgsField(f[field_config_key], FIELD_TYPE_MAP[f['type']]))
+        source_obj = getattr(source_obj, accessor)
+        if isinstance(source_obj, list):
+            # hack to handle 1:many joins for now -- discard all but first
+            source_obj = source_obj[0] if source_obj else None
 
-    for f in field_config['field_groups'].get('magnitude', {}).get('fields', []):
-        if f.get('skip'):
-            continue
+    return NULL if source_obj is None else source_obj
 
-        if f.get('one_to_many'):
-            continue
 
-        if service_type == SERVICE_MANAGER.MACROSEISMIC and not include_quake_details_in_mdp:
-            continue
+class ExtractionPlan:
+    """
+    A compiled plan for extracting feature attributes from an element.
 
-        path = f['source']
-        if selected_fields:
-            selected = path in selected_fields
-        else:
-            path = path[len('eventParameters>event>'):].replace('§', '>').replace('>', '_')
-            selected = settings.value('/plugins/qquake/output_field_{}'.format(path), True, bool)
-        if not selected:
-            continue
+    Plans resolve the field configuration against the output fields once, so that building each
+    feature only needs to follow the precomputed accessor chains.
+    """
+
+    def __init__(self,
+                 extractions: List[Tuple[int, Tuple[str, ...], Optional[Callable]]],
+                 associated_components: Optional[List[Tuple[int, List[Tuple[str, int]]]]] = None,
+                 flag_index: int = -1):
+        """
+        :param extractions: list of target field index, accessor chain and optional value converter
+        :param associated_components: list of composite datetime field index and the component
+         (field index) pairs which are populated from it
+        :param flag_index: index of the preferred element flag field, or -1 if not present
+        """
+        self.extractions = extractions
+        self.associated_components = associated_components or []
+        self.flag_index = flag_index
+
+    def apply(self, feature: QgsFeature, source_obj):
+        """
+        Sets the attributes of a feature using values extracted from an element
+        """
+        self._apply(feature, source_obj)
+
+    def apply_to_attributes(self, attributes: list, source_obj):
+        """
+        Sets values extracted from an element in a list of feature attributes.
+
+        This avoids setting feature attributes one at a time, e.g. when a list of attributes
+        is used as a prototype for many features.
+        """
+        self._apply(attributes, source_obj)
+
+    def _apply(self, attributes: Union[QgsFeature, list], source_obj):
+        """
+        Sets values extracted from an element, by field index
+        """
+        for field_index, accessors, converter in self.extractions:
+            value = extract_value(source_obj, accessors)
+            if converter is not None and value != NULL:
+                value = converter(value)
+            attributes[field_index] = value
+
+        for composite_index, components in self.associated_components:
+            composite_value = attributes[composite_index]
+            if not composite_value or not composite_value.isValid():
+                continue
+
+            # populate linked component fields, if empty
+            for component, field_index in components:
+                current_value = attributes[field_index]
+                if current_value and current_value != NULL:
+                    continue
+
+                attributes[field_index] = DATETIME_COMPONENTS[component](composite_value)
+
+    def set_flag(self, feature: QgsFeature, value: bool):
+        """
+        Sets the preferred element flag field for a feature, if present
+        """
+        if self.flag_index >= 0:
+            feature[self.flag_index] = value or NULL
+
+    def child_elements(self) -> FrozenSet[str]:
+        """
+        Returns the names of the child elements read by the plan
+        """
+        return frozenset('class' if accessors[0] == '_class' else accessors[0]
+                         for _, accessors, _ in self.extractions if accessors)
+
+
+def compile_extraction_plan(service_type: str,  # pylint: disable=too-many-locals
+                            group: str,
+                            root: str,
+                            fields: QgsFields,
+                            converters: Optional[Dict[str, Callable]] = None,
+                            flag: Optional[str] = None,
+                            output_options: Optional[OutputOptions] = None) -> ExtractionPlan:
+    """
+    Compiles an extraction plan for a field group.
 
-        fields.append(QgsField(f[field_config_key], FIELD_TYPE_MAP[f['type']]))
+    Only configured fields which are present in the output fields are included in the plan.
 
-    for f in field_config['field_groups'].get('macro_basic_event_info', {}).get('fields', []):
-        if f.get('skip'):
-            continue
+    :param service_type: service type for the field configuration
+    :param group: field group name
+    :param root: source path of the element which the plan is applied to, e.g. "eventParameters>event>origin"
+    :param fields: output fields
+    :param converters: optional value converters, by source path
+    :param flag: optional source of a preferred element flag field, e.g. "!IsPrefOrigin"
+    :param output_options: output options, or None to use the current settings
+    """
+    if output_options is None:
+        output_options = OutputOptions.from_settings()
+
+    field_config_key = output_options.field_config_key()
+    field_groups = get_field_config(service_type)['field_groups']
+    group_fields = [f for f in field_groups.get(group, {}).get('fields', []) if
+                    not f.get('skip') and not f.get('one_to_many')]
 
-        if f.get('one_to_many'):
+    root_path = root.split('>')
+    converters = converters or {}
+
+    extractions = []
+    for dest_field in group_fields:
+        if dest_field['source'].startswith('!'):
             continue
 
-        path = f['source']
-        if selected_fields:
-            selected = path in selected_fields
-        else:
-            path = path[len('macroseismicParameters>'):].replace('§', '>').replace('>', '_')
-            selected = settings.value('/plugins/qquake/output_field_{}'.format(path), True, bool)
-        if not selected:
+        field_index = fields.lookupField(dest_field[field_config_key])
+        if field_index < 0:
+            # not selected for output
             continue
 
-        fields.append(QgsField(f[field_config_key], FIELD_TYPE_MAP[f['type']]))
+        source = dest_field['source'].replace('§', '>').split('>')
+        assert source[:len(root_path)] == root_path
+        # "class" is a reserved keyword, so these attributes are stored as "_class"
+        accessors = tuple('_class' if s == 'class' else s for s in source[len(root_path):])
+        extractions.append((field_index, accessors, converters.get(dest_field['source'])))
 
-    for f in field_config['field_groups'].get('mdpSet', {}).get('fields', []):
-        if f.get('skip'):
+    associated_components = []
+    for dest_field in group_fields:
+        components = dest_field.get('associated_components')
+        if not components:
             continue
 
-        if f.get('one_to_many'):
+        composite_index = fields.lookupField(dest_field[field_config_key])
+        if composite_index < 0:
             continue
 
-        path = f['source']
-        if selected_fields:
-            selected = path in selected_fields
-        else:
-            path = path[len('macroseismicParameters>'):].replace('§', '>').replace('>', '_')
-            selected = settings.value('/plugins/qquake/output_field_{}'.format(path), True, bool)
-        if not selected:
-            continue
+        targets = []
+        for component, source in components.items():
+            matching_field = [f for f in group_fields if f['source'] == source]
+            assert matching_field
 
-        fields.append(QgsField(f[field_config_key], FIELD_TYPE_MAP[f['type']]))
+            field_index = fields.lookupField(matching_field[0][field_config_key])
+            if field_index >= 0:
+                targets.append((component, field_index))
 
-    for f in field_config['field_groups'].get('mdp', {}).get('fields', []):
-        if f.get('skip'):
-            continue
+        if targets:
+            associated_components.append((composite_index, targets))
 
-        if f.get('one_to_many'):
-            continue
+    flag_index = -1
+    if flag:
+        flag_field = [f for f in field_groups['basic_event_info']['fields'] if f['source'] == flag]
+        if flag_field:
+            flag_index = fields.lookupField(flag_field[0][field_config_key])
 
-        path = f['source']
-        if selected_fields:
-            selected = path in selected_fields
-        else:
-            path = path[len('macroseismicParameters>'):].replace('§', '>').replace('>', '_')
-            selected = settings.value('/plugins/qquake/output_field_{}'.format(path), True, bool)
-        if not selected:
-            continue
+    return ExtractionPlan(extractions, associated_components, flag_index)
 
-        fields.append(QgsField(f[field_config_key], FIELD_TYPE_MAP[f['type']]))
 
-    for f in field_config['field_groups'].get('place', {}).get('fields', []):
-        if f.get('skip'):
-            continue
+# child elements which are always parsed when projecting event elements to the output fields, as they are
+# required for feature geometries, joins between elements and time based filtering
+REQUIRED_CHILD_ELEMENTS: Dict[str, FrozenSet[str]] = {
+    'event': frozenset(('type', 'preferredOriginID', 'preferredMagnitudeID')),
+    'origin': frozenset(('time', 'compositeTime', 'latitude', 'longitude', 'depth')),
+    'magnitude': frozenset(('mag', 'type', 'originID')),
+}
 
-        if f.get('one_to_many'):
-            continue
 
-        path = f['source']
-        if selected_fields:
-            selected = path in selected_fields
-        else:
-            path = path[len('macroseismicParameters>'):].replace('§', '>').replace('>', '_')
-            selected = settings.value('/plugins/qquake/output_field_{}'.format(path), True, bool)
-        if not selected:
-            continue
+def element_projection(plans: List[Dict[str, ExtractionPlan]]) -> Dict[str, FrozenSet[str]]:
+    """
+    Returns the names of the child elements which must be parsed for event, origin and magnitude elements
+    in order to apply a set of extraction plans
+    """
+    projection = {}
+    for element, required in REQUIRED_CHILD_ELEMENTS.items():
+        children = set(required)
+        for element_plans in plans:
+            if element in element_plans:
+                children.update(element_plans[element].child_elements())
+        projection[element] = frozenset(children)
+
+    return projection
+
+
+# cached field definitions, by service type and output options
+_SERVICE_FIELDS_CACHE: Dict[tuple, QgsFields] = {}
+
+
+def clear_service_fields_cache():
+    """
+    Clears all cached field definitions, e.g. after the output options have been changed
+    """
+    _SERVICE_FIELDS_CACHE.clear()
+
+
+def get_service_fields(service_type: str,
+                       selected_fields: Optional[List[str]],
+                       output_options: Optional[OutputOptions] = None) -> QgsFields:
+    """
+    Gets the field configuration for a service
+
+    Field definitions are cached, so the returned fields are shared and must not be modified.
+    """
+    if output_options is None:
+        output_options = OutputOptions.from_settings()
 
-        fields.append(QgsField(f[field_config_key], FIELD_TYPE_MAP[f['type']]))
+    key = (service_type,
+           tuple(selected_fields) if selected_fields else None,
+           output_options.short_field_names,
+           output_options.include_quake_details_in_mdp,
+           # the default field selection is only used when no fields are explicitly selected
+           None if selected_fields else output_options.deselected_fields)
+
+    fields = _SERVICE_FIELDS_CACHE.get(key)
+    if fields is None:
+        fields = _create_service_fields(service_type, selected_fields, output_options)
+        _SERVICE_FIELDS_CACHE[key] = fields
+
+    return fields
+
+
+def _create_service_fields(service_type: str,
+                           selected_fields: Optional[List[str]],
+                           output_options: OutputOptions) -> QgsFields:
+    """
+    Creates the field configuration for a service
+    """
+    fields = QgsFields()
+    field_config_key = output_options.field_config_key()
+    exclude_quake_details = service_type == MACROSEISMIC and \
+        not output_options.include_quake_details_in_mdp
+
+    field_config = get_field_config(service_type)
+    for group in ('basic_event_info', 'origin', 'magnitude', 'macro_basic_event_info', 'mdpSet', 'mdp', 'place',
+                  'general', 'network', 'station'):
+        for f in field_config['field_groups'].get(group, {}).get('fields', []):
+            if f.get('skip'):
+                continue
+
+            if f.get('one_to_many'):
+                continue
+
+            path = f['source']
+            if exclude_quake_details:
+                if group in ('origin', 'magnitude'):
+                    continue
+                if group == 'basic_event_info' and '>event' in path and path != 'eventParameters>event§publicID':
+                    continue
+
+            if not output_options.is_field_selected(path, selected_fields):
+                continue
+
+            fields.append(QgsField(f[field_config_key], FIELD_TYPE_MAP[f['type']]))
 
     return fields
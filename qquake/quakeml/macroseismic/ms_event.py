@@ -23,6 +23,11 @@ class MsEvent(QuakeMlElement):
     MacroseismicEvent
     """
 
+    __slots__ = (
+        'publicID', 'mdpSetReference', 'eventReference', 'preferredMDPSetID', 'preferredMacroseismicOriginID',
+        'creationInfo'
+    )
+
     def __init__(self,
                  publicID,
                  mdpSetReference,
@@ -23,6 +23,8 @@ class MsIntensity(QuakeMlElement):
     MsIntensity
     """
 
+    __slots__ = ('macroseismicScale', 'expectedIntensity', 'maximalCredibleIntensity', 'minimalCredibleIntensity')
+
     def __init__(self,
                  macroseismicScale,
                  expectedIntensity,
@@ -23,6 +23,8 @@ class MsItensityValueType(QuakeMlElement):
     MsItensityValueType
     """
 
+    __slots__ = ('_class', 'numeric', 'text')
+
     def __init__(self,
                  _class,
                  numeric,
@@ -26,6 +26,12 @@ class MsMdp(QuakeMlElement):
     MsMdp
     """
 
+    __slots__ = (
+        'publicID', 'reportReference', 'eventReference', 'placeReference', 'intensity', 'comment', 'reportCount',
+        'reportedTime', 'methodID', 'quality', 'evaluationMode', 'evaluationStatus', 'literatureSource',
+        'creationInfo', 'relatedMDP'
+    )
+
     def __init__(self,  # pylint: disable=too-many-locals
                  publicID,
                  reportReference,
@@ -67,16 +73,15 @@ class MsMdp(QuakeMlElement):
         parser = MacroseismicElementParser(element)
 
         comments = []
-        comment_node = element.firstChildElement('ms:comment')
-        while not comment_node.isNull():
-            comments.append(Comment.from_element(comment_node))
-            comment_node = comment_node.nextSiblingElement('ms:comment')
-
         related = []
-        related_node = element.firstChildElement('ms:relatedMDP')
-        while not related_node.isNull():
-            related.append(related_node.text())
-            related_node = related_node.nextSiblingElement('ms:relatedMDP')
+        child = element.firstChildElement()
+        while not child.isNull():
+            tag = child.tagName()
+            if tag == 'ms:comment':
+                comments.append(Comment.from_element(child))
+            elif tag == 'ms:relatedMDP':
+                related.append(child.text())
+            child = child.nextSiblingElement()
 
         return MsMdp(publicID=parser.string('publicID', is_attribute=True, optional=False),
                      reportReference=parser.resource_reference('ms:reportReference'),
@@ -26,6 +26,11 @@ class MsMdpSet(QuakeMlElement):
     MsMdpSet
     """
 
+    __slots__ = (
+        'publicID', 'relatedMDPSet', 'comment', 'mdpCount', 'maximumIntensity', 'methodID', 'literatureSource',
+        'creationInfo', 'mdpReferences'
+    )
+
     def __init__(self,
                  publicID,
                  relatedMDPSet,
@@ -55,16 +60,15 @@ class MsMdpSet(QuakeMlElement):
         parser = MacroseismicElementParser(element)
 
         comments = []
-        comment_node = element.firstChildElement('ms:comment')
-        while not comment_node.isNull():
-            comments.append(Comment.from_element(comment_node))
-            comment_node = comment_node.nextSiblingElement('ms:comment')
-
         mdpReferences = []
-        reference_node = element.firstChildElement('ms:mdpReference')
-        while not reference_node.isNull():
-            mdpReferences.append(reference_node.text())
-            reference_node = reference_node.nextSiblingElement('ms:mdpReference')
+        child = element.firstChildElement()
+        while not child.isNull():
+            tag = child.tagName()
+            if tag == 'ms:comment':
+                comments.append(Comment.from_element(child))
+            elif tag == 'ms:mdpReference':
+                mdpReferences.append(child.text())
+            child = child.nextSiblingElement()
 
         return MsMdpSet(publicID=parser.string('publicID', is_attribute=True, optional=False),
                         relatedMDPSet=parser.resource_reference('ms:relatedMDPSet'),
@@ -26,6 +26,8 @@ class MsParameters(QuakeMlElement):
     MacroseismicParameters
     """
 
+    __slots__ = ('publicID', 'macroseismicEvent')
+
     def __init__(self,
                  publicID,
                  macroseismicEvent: List):
@@ -26,6 +26,12 @@ class MsPlace(QuakeMlElement):
     MsPlace
     """
 
+    __slots__ = (
+        'publicID', 'name', 'preferredName', 'referenceLatitude', 'referenceLongitude', 'horizontalUncertainty',
+        'geometry', 'externalGazetteer', 'type', 'zipCode', 'altitude', 'isoCountryCode', 'literatureSource',
+        'siteMorphology', 'creationInfo', 'epoch'
+    )
+
     def __init__(self,  # pylint: disable=too-many-locals
                  publicID,
                  name: List,
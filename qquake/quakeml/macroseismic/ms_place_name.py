@@ -23,6 +23,8 @@ class MsPlaceName(QuakeMlElement):
     MsPlaceName
     """
 
+    __slots__ = ('name', 'type', 'alternateType', 'language', 'epoch')
+
     def __init__(self,
                  name,
                  ms_type,
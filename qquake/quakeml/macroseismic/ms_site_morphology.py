@@ -24,6 +24,14 @@ class MsSiteMorphology(QuakeMlElement):
     MsSiteMorphology
     """
 
+    __slots__ = (
+        'basinFlagLiteratureSource', 'bedrockDepth', 'bedrockDepthLiteratureSource', 'geologicalSurfaceAge',
+        'geologicalUnit', 'groundwaterDepth', 'groundwaterDepthLiteratureSource', 'morphology', 'creationInfo',
+        'morphologyLiteratureSource', 'referenceBorehole', 'sedimentaryBasinName', 'siteClassDescription',
+        'siteClassEC8', 'siteClassEC8LiteratureSource', 'siteClassSIA261', 'siteClassSIA261Source',
+        'SurfaceLayerGranularity'
+    )
+
     def __init__(self,  # pylint: disable=too-many-locals
                  basinFlagLiteratureSource,
                  bedrockDepth,
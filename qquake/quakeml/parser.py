@@ -14,27 +14,31 @@ __copyright__ = 'Istituto Nazionale di Geofisica e Vulcanologia (INGV)'
 # This will get replaced with a git SHA1 when you do a git archive
 __revision__ = '$Format:%H$'
 
-from typing import Optional, Dict, List
+import re
+from typing import Optional, Dict, FrozenSet, List
 
 from qgis.PyQt.QtCore import (
-    QByteArray
+    QByteArray,
+    QDateTime
 )
-from qgis.PyQt.QtXml import QDomDocument
+from qgis.PyQt.QtXml import QDomElement
 from qgis.core import (
-    NULL,
     QgsUnitTypes,
     QgsFields,
     QgsFeature,
-    QgsSettings,
     QgsPoint,
     QgsGeometry
 )
 
-from qquake.services import SERVICE_MANAGER
+from .field_config import MACROSEISMIC
 from .fields import (
-    CONFIG_FIELDS,
+    ExtractionPlan,
+    OutputOptions,
+    compile_extraction_plan,
+    element_projection,
     get_service_fields
 )
+from .exceptions import InvalidXmlException
 from .fdsn_event import (
     Event
 )
@@ -44,6 +48,7 @@ from .macroseismic import (
     MsMdp,
     MsMdpSet
 )
+from .stream_reader import QuakeMlStreamReader
 
 
 class QuakeMlParser:
@@ -51,9 +56,23 @@ class QuakeMlParser:
     QuakeML parser
     """
 
+    EVENT_START_REGEX = re.compile(rb'<(?:\w+:)?event[\s>]')
+
+    # elements which are extracted from replies
+    STREAM_ELEMENTS = {'event', 'ms:place', 'ms:mdp', 'ms:macroseismicEvent', 'ms:mdpSet'}
+
     def __init__(self,
                  convert_negative_depths=False,
-                 depth_unit=QgsUnitTypes.DistanceMeters):
+                 depth_unit=QgsUnitTypes.DistanceMeters,
+                 output_options: Optional[OutputOptions] = None,
+                 preferred_origins_only: bool = False,
+                 preferred_magnitudes_only: bool = False,
+                 output_fields: Optional[List[str]] = None):
+        """
+        :param preferred_origins_only: if True, non-preferred origins will not be parsed
+        :param preferred_magnitudes_only: if True, non-preferred magnitudes will not be parsed
+        :param output_fields: if set, only the parts of events required for these output fields will be parsed
+        """
         self.events = []
         self.origins = {}
         self.magnitudes = {}
@@ -61,8 +80,22 @@ class QuakeMlParser:
         self.macro_events = {}
         self.mdps = {}
         self.mdpsets = {}
+        # indexes used to join mdps to their related elements
+        self.events_by_id: Dict[str, Event] = {}
+        self.macro_events_by_event: Dict[str, MsEvent] = {}
+        self.mdpsets_by_mdp: Dict[str, MsMdpSet] = {}
         self.convert_negative_depths = convert_negative_depths
         self.depth_unit = depth_unit
+        self.output_options = output_options if output_options is not None else OutputOptions.from_settings()
+        self.preferred_origins_only = preferred_origins_only
+        self.preferred_magnitudes_only = preferred_magnitudes_only
+        self.projection: Optional[Dict[str, FrozenSet[str]]] = None
+        if output_fields is not None:
+            self.projection = element_projection([
+                Event.compile_extraction_plans(self.to_event_fields(output_fields), convert_negative_depths,
+                                               depth_unit, self.output_options),
+                self.compile_mdp_extraction_plans(self.create_mdp_fields(output_fields))
+            ])
 
     def to_dict(self) -> Dict[str, object]:
         """
@@ -78,9 +111,9 @@ class QuakeMlParser:
             'mdpsets': {k: v.to_dict() for k, v in self.mdpsets.items()},
         }
 
-    def parse_initial(self, content: QByteArray):
+    def clear(self):
         """
-        Parses the initial first reply
+        Clears all results
         """
         self.events = []
         self.origins = {}
@@ -89,8 +122,24 @@ class QuakeMlParser:
         self.macro_places = {}
         self.mdps = {}
         self.mdpsets = {}
+        self.events_by_id = {}
+        self.macro_events_by_event = {}
+        self.mdpsets_by_mdp = {}
+
+    def parse_initial(self, content: QByteArray):
+        """
+        Parses the initial first reply
+        """
+        self.clear()
         self.add_events(content)
 
+    @staticmethod
+    def count_events(content: QByteArray) -> int:
+        """
+        Returns the number of events contained in a reply, without fully parsing it
+        """
+        return len(QuakeMlParser.EVENT_START_REGEX.findall(content.data()))
+
     def remap_attribute_name(self, service_type: str, attribute: str) -> str:
         """
         Returns a remapped attribute name (i.e. accounting for user-defined output attribute names)
@@ -98,76 +147,156 @@ class QuakeMlParser:
         if not attribute:
             return attribute
 
-        return get_service_fields(service_type, [attribute]).at(0).name()
+        return get_service_fields(service_type, [attribute], self.output_options).at(0).name()
+
+    def begin_stream(self) -> QuakeMlStreamReader:
+        """
+        Starts adding events from a reply incrementally.
+
+        Returns a stream reader which should be fed with the reply content as it is received.
+        """
+        return QuakeMlStreamReader(QuakeMlParser.STREAM_ELEMENTS, self._add_element)
 
-    def add_events(self, content: QByteArray):  # pylint:disable=too-many-locals
+    def add_events(self, content: QByteArray):
         """
         Adds events from a reply
         """
-        doc = QDomDocument()
-        doc.setContent(content)
-        event_elements = doc.elementsByTagName('event')
-
-        for e in range(event_elements.length()):
-            event_element = event_elements.at(e).toElement()
-            event = Event.from_element(event_element)
-            self.events.append(event)
-            for _, o in event.origins.items():
-                if o not in self.origins:
-                    self.origins[o.publicID] = o
-            for _, m in event.magnitudes.items():
-                if m not in self.magnitudes:
-                    self.magnitudes[m.publicID] = m
-
-        # macro places first
-        macro_places = doc.elementsByTagName('ms:place')
-        for e in range(macro_places.length()):
-            macro_place = macro_places.at(e).toElement()
-            place = MsPlace.from_element(macro_place)
-            self.macro_places[place.publicID] = place
+        reader = self.begin_stream()
+        reader.add_data(content)
+        if not reader.finish():
+            raise InvalidXmlException('Invalid QuakeML reply, {}'.format(reader.error_string()))
 
-        macro_mdp = doc.elementsByTagName('ms:mdp')
-        for e in range(macro_mdp.length()):
-            mdp_element = macro_mdp.at(e).toElement()
-            mdp = MsMdp.from_element(mdp_element)
+    def _add_element(self, name: str, element: QDomElement):
+        """
+        Adds a single element read from a reply
+        """
+        if name == 'event':
+            self._add_event(Event.from_element(element,
+                                               preferred_origins_only=self.preferred_origins_only,
+                                               preferred_magnitudes_only=self.preferred_magnitudes_only,
+                                               projection=self.projection))
+        elif name == 'ms:place':
+            place = MsPlace.from_element(element)
+            self.macro_places[place.publicID] = place
+        elif name == 'ms:mdp':
+            mdp = MsMdp.from_element(element)
             self.mdps[mdp.publicID] = mdp
+        elif name == 'ms:macroseismicEvent':
+            self._add_macro_event(MsEvent.from_element(element))
+        elif name == 'ms:mdpSet':
+            self._add_mdp_set(MsMdpSet.from_element(element))
+
+    def _add_event(self, event: Event):
+        """
+        Adds a parsed event
+        """
+        self.events.append(event)
+        self.events_by_id.setdefault(event.publicID, event)
+        self._add_origins_and_magnitudes(event)
+
+    def _add_macro_event(self, macro_event: MsEvent):
+        """
+        Adds a parsed macroseismic event
+        """
+        self.macro_events[macro_event.publicID] = macro_event
+        self.macro_events_by_event.setdefault(macro_event.eventReference, macro_event)
 
-        macro_events = doc.elementsByTagName('ms:macroseismicEvent')
-        for e in range(macro_events.length()):
-            macro_event_element = macro_events.at(e).toElement()
-            macro_event = MsEvent.from_element(macro_event_element)
-            self.macro_events[macro_event.publicID] = macro_event
+    def _add_mdp_set(self, mdpset: MsMdpSet):
+        """
+        Adds a parsed mdp set
+        """
+        self.mdpsets[mdpset.publicID] = mdpset
+        for mdp_reference in mdpset.mdpReferences:
+            self.mdpsets_by_mdp.setdefault(mdp_reference, mdpset)
+
+    def merge(self, other: 'QuakeMlParser', unique_events: bool = False):
+        """
+        Adds all results from another parser, e.g. one which was used to parse a reply in a background task
 
-        mdpset_elements = doc.elementsByTagName('ms:mdpSet')
-        for e in range(mdpset_elements.length()):
-            mdpset_element = mdpset_elements.at(e).toElement()
-            mdpset = MsMdpSet.from_element(mdpset_element)
-            self.mdpsets[mdpset.publicID] = mdpset
+        :param unique_events: if True, events which are already present in the results will be skipped
+         (e.g. events at the shared boundary of split date ranges)
+        """
+        for event in other.events:
+            if unique_events and event.publicID in self.events_by_id:
+                continue
+            self._add_event(event)
+        self.macro_places.update(other.macro_places)
+        self.mdps.update(other.mdps)
+        for macro_event in other.macro_events.values():
+            self._add_macro_event(macro_event)
+        for mdpset in other.mdpsets.values():
+            self._add_mdp_set(mdpset)
+
+    def _add_origins_and_magnitudes(self, event: Event):
+        """
+        Adds the origins and magnitudes from an event
+        """
+        for _, o in event.origins.items():
+            if o not in self.origins:
+                self.origins[o.publicID] = o
+        for _, m in event.magnitudes.items():
+            if m not in self.magnitudes:
+                self.magnitudes[m.publicID] = m
 
     def mdp_set_for_mdp(self, mdp: MsMdp) -> MsMdpSet:
         """
         Returns the MDP set associated with an mdp
         """
-        return [v for k, v in self.mdpsets.items() if mdp.publicID in v.mdpReferences][0]
+        return self.mdpsets_by_mdp[mdp.publicID]
 
     def parse_missing_origin(self, content: QByteArray):
         """
         Parses for missing origins from a reply
         """
-        doc = QDomDocument()
-        doc.setContent(content)
+        reader = QuakeMlStreamReader({'event'}, lambda _, element: self._add_origins_and_magnitudes(
+            Event.from_element(element)))
+        reader.add_data(content)
+        if not reader.finish():
+            raise InvalidXmlException('Invalid QuakeML reply, {}'.format(reader.error_string()))
 
-        event_elements = doc.elementsByTagName('event')
+    def event_time(self, event: Event) -> Optional[QDateTime]:
+        """
+        Returns the time of an event's preferred origin, if available
+        """
+        origin = self.origins.get(event.preferredOriginID)
+        if origin is None or not origin.time or not origin.time.is_valid():
+            return None
+
+        return origin.time.value
+
+    def earliest_event_time(self) -> Optional[QDateTime]:
+        """
+        Returns the time of the earliest event in the results
+        """
+        times = [t for t in (self.event_time(e) for e in self.events) if t is not None]
+        return min(times) if times else None
+
+    def remove_events_until(self, time: QDateTime):
+        """
+        Removes all events which occurred at or before the specified time, together with the
+        origins and magnitudes which are no longer referenced by the remaining events.
+
+        Macroseismic results are left untouched, as resumed queries only apply to FDSN event services.
+        """
+        def keep_event(event: Event) -> bool:
+            event_time = self.event_time(event)
+            return event_time is None or event_time > time
 
-        for e in range(event_elements.length()):
-            event_element = event_elements.at(e).toElement()
-            event = Event.from_element(event_element)
-            for _, o in event.origins.items():
-                if o not in self.origins:
-                    self.origins[o.publicID] = o
-            for _, m in event.magnitudes.items():
-                if m not in self.magnitudes:
-                    self.magnitudes[m.publicID] = m
+        self.events = [e for e in self.events if keep_event(e)]
+
+        self.events_by_id = {}
+        origin_ids = set()
+        magnitude_ids = set()
+        for e in self.events:
+            self.events_by_id.setdefault(e.publicID, e)
+            origin_ids.add(e.preferredOriginID)
+            origin_ids.update(e.origins.keys())
+            magnitude_ids.add(e.preferredMagnitudeID)
+            magnitude_ids.update(e.magnitudes.keys())
+
+        self.magnitudes = {k: m for k, m in self.magnitudes.items() if k in magnitude_ids}
+        origin_ids.update(m.originID for m in self.magnitudes.values())
+        self.origins = {k: o for k, o in self.origins.items() if k in origin_ids}
 
     def scan_for_missing_origins(self) -> List[str]:
         """
@@ -184,57 +313,79 @@ class QuakeMlParser:
 
         return list(missing_origins)
 
-    @staticmethod
-    def to_event_fields(selected_fields: Optional[List[str]]) -> QgsFields:
+    def to_event_fields(self, selected_fields: Optional[List[str]]) -> QgsFields:
         """
         Returns the field definition for events
         """
-        return Event.to_fields(selected_fields)
+        return Event.to_fields(selected_fields, self.output_options)
 
     def create_event_features(self, output_fields: List[str], preferred_origin_only: bool,
                               preferred_magnitudes_only: bool) -> QgsFeature:
         """
         Yields event features
         """
+        fields = self.to_event_fields(output_fields)
+        plans = Event.compile_extraction_plans(fields, self.convert_negative_depths, self.depth_unit,
+                                               self.output_options)
         for e in self.events:
-            for f in e.to_features(output_fields, preferred_origin_only, preferred_magnitudes_only,
+            for f in e.to_features(fields, plans, preferred_origin_only, preferred_magnitudes_only,
                                    all_origins=self.origins,
                                    convert_negative_depths=self.convert_negative_depths,
                                    depth_unit=self.depth_unit):
                 yield f
 
-    @staticmethod
-    def create_mdp_fields(selected_fields: Optional[List[str]]) -> QgsFields:
+    def create_mdp_fields(self, selected_fields: Optional[List[str]]) -> QgsFields:
         """
         Creates the MDP field definitions
         """
-        return get_service_fields(SERVICE_MANAGER.MACROSEISMIC, selected_fields)
+        return get_service_fields(MACROSEISMIC, selected_fields, self.output_options)
 
-    def create_mdp_features(self,  # pylint: disable=too-many-locals,too-many-branches,too-many-statements
+    def compile_mdp_extraction_plans(self, fields: QgsFields) -> Dict[str, ExtractionPlan]:
+        """
+        Compiles the plans for extracting MDP attributes to the specified fields
+        """
+        service_type = MACROSEISMIC
+        options = self.output_options
+        include_quake_details_in_mdp = options.include_quake_details_in_mdp
+        return {
+            'event': compile_extraction_plan(service_type, 'basic_event_info', 'eventParameters>event', fields,
+                                             flag='!IsPrefMdpset', output_options=options),
+            'origin': compile_extraction_plan(service_type, 'origin', 'eventParameters>event>origin', fields,
+                                              flag='!IsPrefOrigin' if include_quake_details_in_mdp else None,
+                                              output_options=options),
+            'magnitude': compile_extraction_plan(service_type, 'magnitude', 'eventParameters>event>magnitude',
+                                                 fields,
+                                                 flag='!IsPrefMag' if include_quake_details_in_mdp else None,
+                                                 output_options=options),
+            'mdp': compile_extraction_plan(service_type, 'mdp', 'macroseismicParameters>mdp', fields,
+                                           output_options=options),
+            'place': compile_extraction_plan(service_type, 'place', 'macroseismicParameters>place', fields,
+                                             output_options=options),
+            'macro_event': compile_extraction_plan(service_type, 'macro_basic_event_info',
+                                                   'macroseismicParameters>macroseismicEvent', fields,
+                                                   output_options=options),
+            'mdp_set': compile_extraction_plan(service_type, 'mdpSet', 'macroseismicParameters>mdpSet', fields,
+                                               output_options=options),
+        }
+
+    def create_mdp_features(self,  # pylint: disable=too-many-locals
                             selected_fields: Optional[List[str]],
                             preferred_mdp_set_only: bool) -> QgsFeature:
         """
         Yields MDP features
         """
-        settings = QgsSettings()
-
-        short_field_names = settings.value('/plugins/qquake/output_short_field_names', False, bool)
-        field_config_key = 'field_short' if short_field_names else 'field_long'
-        field_config = SERVICE_MANAGER.get_field_config(SERVICE_MANAGER.MACROSEISMIC)
-
-        include_quake_details_in_mdp = settings.value('/plugins/qquake/include_quake_details_in_mdp', True, bool)
+        include_quake_details_in_mdp = self.output_options.include_quake_details_in_mdp
 
         fields = self.create_mdp_fields(selected_fields)
+        plans = self.compile_mdp_extraction_plans(fields)
         for _, m in self.mdps.items():
             if m.placeReference in self.macro_places:
                 place = self.macro_places[m.placeReference]
             else:
                 place = None
 
-            event_reference = m.eventReference
             # try to get macroseismicEvent
-            macro_events = [m for m in self.macro_events.values() if m.eventReference == event_reference]
-            macro_event = macro_events[0] if macro_events else None
+            macro_event = self.macro_events_by_event.get(m.eventReference)
 
             mdpset = self.mdp_set_for_mdp(m)
 
@@ -247,291 +398,25 @@ class QuakeMlParser:
                 # not in the preferred mdp set, so skip
                 continue
 
-            f = QgsFeature(fields)
-
-            if selected_fields:
-                output_is_preferred_mdpset = '!IsPrefMdpset' in selected_fields
-            else:
-                output_is_preferred_mdpset = settings.value('/plugins/qquake/output_field_!IsPrefMdpset', False,
-                                                            bool)
-            if output_is_preferred_mdpset:
-                dest_field = [f for f in field_config['field_groups']['basic_event_info']['fields'] if
-                              f['source'] == '!IsPrefMdpset'][0]
-                f[dest_field[field_config_key]] = is_preferred_mdp_set or NULL
-
-            for dest_field in field_config['field_groups']['basic_event_info']['fields']:
-                if dest_field.get('skip'):
-                    continue
-
-                if dest_field.get('one_to_many'):
-                    continue
-
-                if not include_quake_details_in_mdp and '>event>' in dest_field['source'] and dest_field[
-                    'source'] != 'eventParameters>event§publicID':
-                    continue
+            event = self.events_by_id.get(m.eventReference)
 
-                if dest_field['source'].startswith('!'):
-                    continue
-
-                source = dest_field['source'].replace('§', '>').split('>')
-
-                assert source[0] == 'eventParameters'
-                source = source[1:]
-                assert source[0] == 'event'
-                source = source[1:]
-
-                if selected_fields:
-                    selected = dest_field['source'] in selected_fields
-                else:
-                    selected = settings.value('/plugins/qquake/output_field_{}'.format('_'.join(source)), True, bool)
-
-                if not selected:
-                    continue
-
-                source_obj = [e for e in self.events if e.publicID == m.eventReference][0]
-                for s in source:
-                    if source_obj is None:
-                        source_obj = NULL
-                        break
-                    assert hasattr(source_obj, s)
-                    source_obj = getattr(source_obj, s)
+            f = QgsFeature(fields)
 
-                f[dest_field[field_config_key]] = source_obj
+            plans['event'].set_flag(f, is_preferred_mdp_set)
+            plans['event'].apply(f, event)
 
             if include_quake_details_in_mdp:
+                plans['origin'].set_flag(f, True)
+                plans['origin'].apply(f, self.origins.get(event.preferredOriginID) if event else None)
 
-                if selected_fields:
-                    output_is_preferred_origin = '!IsPrefOrigin' in selected_fields
-                else:
-                    output_is_preferred_origin = settings.value('/plugins/qquake/output_field_!IsPrefOrigin', False,
-                                                                bool)
-                if output_is_preferred_origin:
-                    dest_field = [f for f in field_config['field_groups']['basic_event_info']['fields'] if
-                                  f['source'] == '!IsPrefOrigin'][0]
-                    f[dest_field[field_config_key]] = True
-
-                for dest_field in field_config['field_groups']['origin']['fields']:
-                    if dest_field.get('skip'):
-                        continue
-
-                    if dest_field.get('one_to_many'):
-                        continue
-
-                    source = dest_field['source'].replace('§', '>').split('>')
-                    assert source[0] == 'eventParameters'
-                    source = source[1:]
-                    assert source[0] == 'event'
-                    source = source[1:]
-                    assert source[0] == 'origin'
-                    source = source[1:]
-
-                    if selected_fields:
-                        selected = dest_field['source'] in selected_fields
-                    else:
-                        selected = settings.value('/plugins/qquake/output_field_{}'.format('_'.join(source)), True,
-                                                  bool)
-
-                    if not selected:
-                        continue
-
-                    event = [e for e in self.events if e.publicID == m.eventReference][0]
-                    origin = self.origins[event.preferredOriginID]
-
-                    source_obj = origin
-
-                    for s in source:
-                        if source_obj is None:
-                            source_obj = NULL
-                            break
-                        assert hasattr(source_obj, s)
-                        source_obj = getattr(source_obj, s)
-
-                    f[dest_field[field_config_key]] = source_obj
-
-            if include_quake_details_in_mdp:
+                plans['magnitude'].set_flag(f, True)
+                plans['magnitude'].apply(f, self.magnitudes.get(event.preferredMagnitudeID) if event else None)
 
-                if selected_fields:
-                    output_is_preferred_mag = '!IsPrefMag' in selected_fields
-                else:
-                    output_is_preferred_mag = settings.value('/plugins/qquake/output_field_!IsPrefMag', False, bool)
-                if output_is_preferred_mag:
-                    dest_field = [f for f in CONFIG_FIELDS['field_groups']['basic_event_info']['fields'] if
-                                  f['source'] == '!IsPrefMag'][0]
-                    f[dest_field[field_config_key]] = True
-
-                for dest_field in field_config['field_groups']['magnitude']['fields']:
-                    if dest_field.get('skip'):
-                        continue
-
-                    if dest_field.get('one_to_many'):
-                        continue
-
-                    source = dest_field['source'].replace('§', '>').split('>')
-                    assert source[0] == 'eventParameters'
-                    source = source[1:]
-                    assert source[0] == 'event'
-                    source = source[1:]
-                    assert source[0] == 'magnitude'
-                    source = source[1:]
-
-                    if selected_fields:
-                        selected = dest_field['source'] in selected_fields
-                    else:
-                        selected = settings.value('/plugins/qquake/output_field_{}'.format('_'.join(source)), True,
-                                                  bool)
-
-                    if not selected:
-                        continue
-
-                    event = [e for e in self.events if e.publicID == m.eventReference][0]
-                    
-                    source_obj = self.magnitudes.get(event.preferredMagnitudeID)
-                    for s in source:
-                        if source_obj is None:
-                            source_obj = NULL
-                            break
-                        assert hasattr(source_obj, s)
-                        source_obj = getattr(source_obj, s)
-
-
-                    f[dest_field[field_config_key]] = source_obj
-
-            for dest_field in field_config['field_groups'].get('mdp', {}).get('fields', []):
-                if dest_field.get('skip'):
-                    continue
-
-                if dest_field.get('one_to_many'):
-                    continue
-
-                source = dest_field['source'].replace('§', '>').split('>')
-                assert source[0] == 'macroseismicParameters'
-                source = source[1:]
-                assert source[0] == 'mdp'
-                source = source[1:]
-
-                if selected_fields:
-                    selected = dest_field['source'] in selected_fields
-                else:
-                    selected = settings.value('/plugins/qquake/output_field_{}'.format('_'.join(source)), True, bool)
-
-                if not selected:
-                    continue
-
-                source_obj = m
-                for s in source:
-                    if source_obj is None:
-                        source_obj = NULL
-                        break
-
-                    if s == 'class':
-                        # reserved keyword, can't use!
-                        s = '_class'
-
-                    assert hasattr(source_obj, s)
-                    source_obj = getattr(source_obj, s)
-
-                f[dest_field[field_config_key]] = source_obj
-
-            for dest_field in field_config['field_groups'].get('place', {}).get('fields', []):
-                if dest_field.get('skip'):
-                    continue
-
-                if dest_field.get('one_to_many'):
-                    continue
-
-                source = dest_field['source'].replace('§', '>').split('>')
-                assert source[0] == 'macroseismicParameters'
-                source = source[1:]
-                assert source[0] == 'place'
-                source = source[1:]
-
-                if selected_fields:
-                    selected = dest_field['source'] in selected_fields
-                else:
-                    selected = settings.value('/plugins/qquake/output_field_{}'.format('_'.join(source)), True, bool)
-
-                if not selected:
-                    continue
-
-                source_obj = place
-                for s in source:
-                    if source_obj is None:
-                        source_obj = NULL
-                        break
-                    assert hasattr(source_obj, s)
-                    source_obj = getattr(source_obj, s)
-
-                f[dest_field[field_config_key]] = source_obj
-
-            for dest_field in field_config['field_groups'].get('macro_basic_event_info', {}).get('fields', []):
-                if dest_field.get('skip'):
-                    continue
-
-                if dest_field.get('one_to_many'):
-                    continue
-
-                source = dest_field['source'].replace('§', '>').split('>')
-                assert source[0] == 'macroseismicParameters'
-                source = source[1:]
-                assert source[0] == 'macroseismicEvent'
-                source = source[1:]
-
-                if selected_fields:
-                    selected = dest_field['source'] in selected_fields
-                else:
-                    selected = settings.value('/plugins/qquake/output_field_{}'.format('_'.join(source)), True, bool)
-
-                if not selected:
-                    continue
-
-                source_obj = macro_event
-                if source_obj is None:
-                    continue
-
-                for s in source:
-                    if source_obj is None:
-                        source_obj = NULL
-                        break
-                    assert hasattr(source_obj, s)
-                    source_obj = getattr(source_obj, s)
-
-                f[dest_field[field_config_key]] = source_obj
-
-            for dest_field in field_config['field_groups'].get('mdpSet', {}).get('fields', []):
-                if dest_field.get('skip'):
-                    continue
-
-                if dest_field.get('one_to_many'):
-                    continue
-
-                source = dest_field['source'].replace('§', '>').split('>')
-                assert source[0] == 'macroseismicParameters'
-                source = source[1:]
-                assert source[0] == 'mdpSet'
-                source = source[1:]
-
-                if selected_fields:
-                    selected = dest_field['source'] in selected_fields
-                else:
-                    selected = settings.value('/plugins/qquake/output_field_{}'.format('_'.join(source)), True, bool)
-
-                if not selected:
-                    continue
-
-                source_obj = mdpset
-                for s in source:
-                    if source_obj is None:
-                        source_obj = NULL
-                        break
-
-                    if s == 'class':
-                        # reserved keyword, can't use!
-                        s = '_class'
-
-                    assert hasattr(source_obj, s)
-                    source_obj = getattr(source_obj, s)
-
-                f[dest_field[field_config_key]] = source_obj
+            plans['mdp'].apply(f, m)
+            plans['place'].apply(f, place)
+            if macro_event is not None:
+                plans['macro_event'].apply(f, macro_event)
+            plans['mdp_set'].apply(f, mdpset)
 
             if place and place.referenceLongitude and place.referenceLatitude:
                 geom = QgsPoint(x=place.referenceLongitude.value, y=place.referenceLatitude.value)
@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+"""
+Streaming QuakeML reader
+"""
+
+# .. note:: This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+
+__author__ = 'Original authors: Mario Locati, Roberto Vallone, Matteo Ghetta, Nyall Dawson'
+__date__ = '29/01/2020'
+__copyright__ = 'Istituto Nazionale di Geofisica e Vulcanologia (INGV)'
+# This will get replaced with a git SHA1 when you do a git archive
+__revision__ = '$Format:%H$'
+
+from typing import Callable, Dict, List, Optional, Set
+
+from qgis.PyQt.QtCore import (
+    QByteArray,
+    QXmlStreamReader
+)
+from qgis.PyQt.QtXml import (
+    QDomDocument,
+    QDomElement
+)
+
+
+class QuakeMlStreamReader:
+    """
+    A single pass, streaming reader for XML content.
+
+    Only the subtrees of the requested target elements are materialized (as small, standalone
+    DOM elements), so memory use is bounded by the size of the largest target element rather
+    than the size of the whole document. Content can be added incrementally, e.g. as it is
+    received from a network reply.
+    """
+
+    def __init__(self,
+                 target_elements: Set[str],
+                 callback: Callable[[str, QDomElement], None],
+                 skip_elements: Optional[Set[str]] = None):
+        """
+        :param target_elements: qualified names of elements to extract
+        :param callback: called with the element name and DOM element whenever a target
+         element has been completely read
+        :param skip_elements: optional qualified names of elements whose subtrees should be
+         omitted from extracted target elements
+        """
+        self.target_elements = target_elements
+        self.callback = callback
+        self.skip_elements = skip_elements or set()
+
+        self._reader = QXmlStreamReader()
+        self._reader.setNamespaceProcessing(False)
+        # empty replies (e.g. "204 No Content") are valid, and contain no elements
+        self._has_content = False
+
+        # namespace declarations from the (non materialized) ancestors of the current element
+        self._namespace_stack: List[Dict[str, str]] = []
+
+        self._document: Optional[QDomDocument] = None
+        self._element_stack: List[QDomElement] = []
+        self._target_stack: List[bool] = []
+        # depth within the current skipped subtree
+        self._skip_depth = 0
+
+    def namespace_declarations(self) -> Dict[str, str]:
+        """
+        Returns the namespace declarations which apply to the current target element
+        """
+        res = {}
+        for declarations in self._namespace_stack:
+            res.update(declarations)
+        return res
+
+    def add_data(self, data: QByteArray):
+        """
+        Adds content to the reader, processing all complete elements
+        """
+        if not self._has_content and data.data().strip():
+            self._has_content = True
+        self._reader.addData(data)
+        self._read()
+
+    def finish(self) -> bool:
+        """
+        Processes any remaining content, returning False if the content was not valid XML
+        (including content which ended before the document was complete)
+        """
+        self._read()
+        return not self._has_content or not self._reader.hasError()
+
+    def error_string(self) -> str:
+        """
+        Returns a description of the error encountered while reading the content, if any
+        """
+        return 'line {}, column {}: {}'.format(self._reader.lineNumber(), self._reader.columnNumber(),
+                                              self._reader.errorString())
+
+    def _read(self):  # pylint: disable=too-many-branches
+        """
+        Processes all available tokens
+        """
+        reader = self._reader
+        while not reader.atEnd():
+            token = reader.readNext()
+
+            if self._skip_depth:
+                if token == QXmlStreamReader.StartElement:
+                    self._skip_depth += 1
+                elif token == QXmlStreamReader.EndElement:
+                    self._skip_depth -= 1
+                continue
+
+            if token == QXmlStreamReader.StartElement:
+                name = reader.qualifiedName()
+                if self._element_stack and name in self.skip_elements:
+                    self._skip_depth = 1
+                    continue
+
+                is_target = name in self.target_elements
+
+                if not self._element_stack and not is_target:
+                    declarations = {}
+                    for attribute in reader.attributes():
+                        if attribute.qualifiedName().startswith('xmlns'):
+                            declarations[attribute.qualifiedName()] = attribute.value()
+                    self._namespace_stack.append(declarations)
+                    continue
+
+                if not self._element_stack:
+                    self._document = QDomDocument()
+                    parent = self._document
+                else:
+                    parent = self._element_stack[-1]
+
+                element = self._document.createElement(name)
+                for attribute in reader.attributes():
+                    element.setAttribute(attribute.qualifiedName(), attribute.value())
+                parent.appendChild(element)
+
+                self._element_stack.append(element)
+                self._target_stack.append(is_target)
+
+            elif token == QXmlStreamReader.EndElement:
+                if not self._element_stack:
+                    if self._namespace_stack:
+                        self._namespace_stack.pop()
+                    continue
+
+                element = self._element_stack.pop()
+                if self._target_stack.pop():
+                    self.callback(element.tagName(), element)
+
+                if not self._element_stack:
+                    self._document = None
+
+            elif token == QXmlStreamReader.Characters:
+                if self._element_stack and not reader.isWhitespace():
+                    self._element_stack[-1].appendChild(self._document.createTextNode(reader.text()))
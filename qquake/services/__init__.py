@@ -3,4 +3,5 @@ Services module
 """
 
 from .service_manager import SERVICE_MANAGER, ServiceManager
+from .response_cache import RESPONSE_CACHE, ResponseCache
 from .wadl import WadlServiceParser
@@ -0,0 +1,218 @@
+# -*- coding: utf-8 -*-
+"""
+Persistent cache for service responses
+"""
+
+# .. note:: This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+
+__author__ = 'Original authors: Mario Locati, Roberto Vallone, Matteo Ghetta, Nyall Dawson'
+__date__ = '29/01/2020'
+__copyright__ = 'Istituto Nazionale di Geofisica e Vulcanologia (INGV)'
+# This will get replaced with a git SHA1 when you do a git archive
+__revision__ = '$Format:%H$'
+
+import hashlib
+import json
+import time
+from pathlib import Path
+from typing import Optional, Tuple
+
+from qgis.PyQt.QtCore import QByteArray
+from qgis.PyQt.QtNetwork import QNetworkRequest
+from qgis.core import QgsSettings
+
+from .service_manager import ServiceManager
+
+
+class ResponseCache:
+    """
+    A size bounded, least recently used disk cache for service responses, keyed by request URL
+    """
+
+    DEFAULT_MAX_SIZE_MB = 256
+    DEFAULT_TTL = 24 * 60 * 60
+
+    def __init__(self, path: Optional[Path] = None):
+        self._path = path
+
+    def cache_path(self) -> Path:
+        """
+        Returns the path to the cache folder
+        """
+        path = self._path if self._path is not None else ServiceManager.user_service_path() / 'cache'
+        if not path.exists():
+            path.mkdir(parents=True)
+        return path
+
+    @staticmethod
+    def is_enabled() -> bool:
+        """
+        Returns True if response caching is enabled
+        """
+        return QgsSettings().value('/plugins/qquake/cache_enabled', True, bool)
+
+    @staticmethod
+    def max_size() -> int:
+        """
+        Returns the maximum size of the cache, in bytes
+        """
+        return QgsSettings().value('/plugins/qquake/cache_max_size_mb', ResponseCache.DEFAULT_MAX_SIZE_MB,
+                                   int) * 1024 * 1024
+
+    @staticmethod
+    def ttl_for_service(service_config: dict) -> int:
+        """
+        Returns the time, in seconds, for which cached responses from a service are used without
+        revalidation.
+
+        This only applies to queries for time windows which end in the past.
+        """
+        return int(service_config.get('settings', {}).get('querycachettl', ResponseCache.DEFAULT_TTL))
+
+    @staticmethod
+    def is_cacheable(url: str) -> bool:
+        """
+        Returns True if responses for the specified URL can be cached
+        """
+        return url.startswith('http://') or url.startswith('https://')
+
+    def _entry_paths(self, url: str) -> Tuple[Path, Path]:
+        """
+        Returns the content and metadata paths for a cached URL
+        """
+        key = hashlib.sha1(url.encode('utf8')).hexdigest()
+        path = self.cache_path()
+        return path / (key + '.body'), path / (key + '.json')
+
+    def entry(self, url: str) -> Optional[dict]:
+        """
+        Returns the metadata for a cached URL, or None if the URL is not cached
+        """
+        content_path, metadata_path = self._entry_paths(url)
+        if not content_path.exists() or not metadata_path.exists():
+            return None
+
+        with open(metadata_path, 'rt', encoding='utf8') as f:
+            try:
+                metadata = json.load(f)
+            except json.JSONDecodeError:
+                return None
+
+        if metadata.get('url') != url:
+            return None
+
+        return metadata
+
+    def _read_content(self, url: str) -> Optional[QByteArray]:
+        """
+        Reads the cached content for a URL, marking the entry as recently used
+        """
+        content_path, _ = self._entry_paths(url)
+        try:
+            with open(content_path, 'rb') as f:
+                content = f.read()
+        except FileNotFoundError:
+            return None
+
+        content_path.touch()
+        return QByteArray(content)
+
+    def fresh_content(self, url: str, ttl: int) -> Optional[QByteArray]:
+        """
+        Returns the cached content for a URL if it was fetched within the specified ttl (in seconds),
+        or None if the content must be requested from the service
+        """
+        if ttl <= 0:
+            return None
+
+        metadata = self.entry(url)
+        if not metadata or time.time() - metadata['fetched'] > ttl:
+            return None
+
+        return self._read_content(url)
+
+    def add_validators(self, request: QNetworkRequest, url: str):
+        """
+        Adds conditional headers to a request, so that stale cached content can be revalidated
+        """
+        metadata = self.entry(url)
+        if not metadata:
+            return
+
+        if metadata.get('etag'):
+            request.setRawHeader(b'If-None-Match', metadata['etag'].encode())
+        if metadata.get('last_modified'):
+            request.setRawHeader(b'If-Modified-Since', metadata['last_modified'].encode())
+
+    def revalidated(self, url: str) -> Optional[QByteArray]:
+        """
+        Marks the cached content for a URL as fresh (i.e. after a "304 Not Modified" reply)
+        and returns it
+        """
+        metadata = self.entry(url)
+        if not metadata:
+            return None
+
+        metadata['fetched'] = time.time()
+        self._write_metadata(url, metadata)
+        return self._read_content(url)
+
+    def store(self, url: str, content: QByteArray, etag: Optional[str] = None, last_modified: Optional[str] = None):
+        """
+        Stores the content for a URL in the cache
+        """
+        content_path, _ = self._entry_paths(url)
+        with open(content_path, 'wb') as f:
+            f.write(content.data())
+
+        self._write_metadata(url, {
+            'url': url,
+            'fetched': time.time(),
+            'etag': etag,
+            'last_modified': last_modified
+        })
+
+        self.evict(self.max_size())
+
+    def _write_metadata(self, url: str, metadata: dict):
+        """
+        Writes the metadata for a cached URL
+        """
+        _, metadata_path = self._entry_paths(url)
+        with open(metadata_path, 'wt', encoding='utf8') as f:
+            f.write(json.dumps(metadata))
+
+    def evict(self, max_size: int):
+        """
+        Removes the least recently used entries until the cache is no larger than max_size bytes
+        """
+        entries = []
+        for content_path in self.cache_path().glob('*.body'):
+            stat = content_path.stat()
+            entries.append((stat.st_mtime, stat.st_size, content_path))
+
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, content_path in sorted(entries):
+            if total_size <= max_size:
+                break
+
+            content_path.unlink()
+            metadata_path = content_path.with_suffix('.json')
+            if metadata_path.exists():
+                metadata_path.unlink()
+            total_size -= size
+
+    def clear(self):
+        """
+        Removes all cached content
+        """
+        for path in self.cache_path().glob('*.body'):
+            path.unlink()
+        for path in self.cache_path().glob('*.json'):
+            path.unlink()
+
+
+RESPONSE_CACHE = ResponseCache()
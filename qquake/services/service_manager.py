@@ -28,6 +28,8 @@ from qgis.core import (
     Qgis
 )
 
+from qquake.quakeml.field_config import FIELD_CONFIG
+
 _CONFIG_SERVICES_STYLES_PATH = os.path.join(
     os.path.dirname(__file__),
     '../config',
@@ -68,17 +70,6 @@ _CONFIG_SERVICES_OGC_WMTS_PATH = os.path.join(
     '../config',
     'config_services_ogc_wmts.json')
 
-def load_field_config(filename: str) -> dict:
-    """
-    Loads a configuration JSON file and returns as a dict
-    """
-    path = os.path.join(
-        os.path.dirname(__file__),
-        '../config', filename)
-
-    with open(path, 'r', encoding='utf8') as f:
-        return json.load(f)
-
 
 class ServiceManager(QObject):  # pylint:disable=too-many-public-methods
     """
@@ -95,11 +86,7 @@ class ServiceManager(QObject):  # pylint:disable=too-many-public-methods
 
     _SERVICE_TYPES = [FDSNEVENT, FDSNSTATION, MACROSEISMIC, WMS, WMTS, WFS, WCS]
 
-    _CONFIG_FIELDS = {
-        FDSNEVENT: load_field_config('config_fields_fdsnevent.json'),
-        MACROSEISMIC: load_field_config('config_fields_macroseismic.json'),
-        FDSNSTATION: load_field_config('config_fields_station.json')
-    }
+    _CONFIG_FIELDS = FIELD_CONFIG
 
     PRESET_STYLES = {}
 
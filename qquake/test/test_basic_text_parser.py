@@ -0,0 +1,131 @@
+# coding=utf-8
+"""Basic text parser test
+
+.. note:: This program is free software; you can redistribute it and/or modify
+     it under the terms of the GNU General Public License as published by
+     the Free Software Foundation; either version 2 of the License, or
+     (at your option) any later version.
+
+"""
+import os
+import unittest
+
+from qgis.PyQt.QtCore import (
+    QByteArray,
+    QDateTime
+)
+from qgis.core import (
+    NULL,
+    QgsUnitTypes
+)
+
+from qquake.basic_text import (
+    BasicTextParser,
+    BasicStationParser
+)
+
+
+class TestBasicTextParser(unittest.TestCase):
+    """
+    Test basic text parsing
+    """
+
+    @staticmethod
+    def read_data(file: str) -> QByteArray:
+        """
+        Reads a test data file
+        """
+        path = os.path.join(os.path.dirname(
+            __file__), 'data', file)
+        with open(path, 'rb') as f:
+            return QByteArray(f.read())
+
+    def test_events(self):
+        """
+        Test parsing events
+        """
+        parser = BasicTextParser(convert_negative_depths=True, depth_unit=QgsUnitTypes.DistanceMeters)
+        parser.parse(self.read_data('basic_events.txt'))
+        self.assertEqual(len(parser.events), 3)
+        self.assertEqual(parser.all_event_ids(), ['26359881', '26359291', '26358661'])
+        self.assertEqual(parser.earliest_event_time(), QDateTime.fromString('2021-03-31T17:21:09.030', 'yyyy-MM-ddThh:mm:ss.zzz'))
+
+        features = list(parser.create_event_features(None, None, None))
+        self.assertEqual(len(features), 3)
+        self.assertEqual(features[0].attributes()[:5],
+                         ['26359881', QDateTime.fromString('2021-04-01T14:33:39.301', 'yyyy-MM-ddThh:mm:ss.zzz'),
+                          36.7682, 7.1477, -19700.0])
+        self.assertEqual(features[0]['MagType'], 'Mw')
+        self.assertEqual(features[0]['Magnitude'], 5.1)
+        # missing value markers are removed from strings
+        self.assertEqual(features[0]['MagAuthor'], '')
+        self.assertEqual(features[0].geometry().asWkt(), 'PointZ (7.1477 36.7682 -19700.0)')
+
+        # missing numeric values
+        self.assertEqual(features[2]['Latitude'], NULL)
+        self.assertEqual(features[2]['DepthMeters'], NULL)
+        self.assertEqual(features[2]['Magnitude'], NULL)
+        self.assertEqual(features[2]['EventType'], '')
+        self.assertFalse(features[2].hasGeometry())
+
+        parser = BasicTextParser(depth_unit=QgsUnitTypes.DistanceKilometers)
+        parser.parse(self.read_data('basic_events.txt'))
+        features = list(parser.create_event_features(None, None, None))
+        self.assertEqual(features[1]['DepthKm'], 8.2)
+        self.assertEqual(features[1].geometry().asWkt(), 'PointZ (10.3497 43.9497 8.2)')
+
+        parser.remove_events_until(QDateTime.fromString('2021-03-31T23:09:04.410', 'yyyy-MM-ddThh:mm:ss.zzz'))
+        self.assertEqual(parser.all_event_ids(), ['26359881'])
+
+    def test_merge(self):
+        """
+        Test merging events
+        """
+        parser = BasicTextParser()
+        parser.parse(self.read_data('basic_events.txt'))
+
+        other = BasicTextParser()
+        other.parse(self.read_data('basic_events.txt'))
+        parser.merge(other, unique_events=True)
+        self.assertEqual(parser.all_event_ids(), ['26359881', '26359291', '26358661'])
+
+        parser.merge(other)
+        self.assertEqual(len(parser.events), 6)
+
+    def test_mdp(self):
+        """
+        Test parsing MDPs
+        """
+        parser = BasicTextParser()
+        parser.add_mdp(self.read_data('basic_mdp.txt'))
+        self.assertEqual(len(parser.mdp), 2)
+
+        features = list(parser.create_mdp_features(None, None))
+        self.assertEqual(len(features), 2)
+        self.assertEqual(features[0]['MDPcount'], 2)
+        self.assertEqual(features[0]['PlaceName'], 'Norcia')
+        self.assertEqual(features[0].geometry().asWkt(), 'Point (13.093 42.792)')
+        self.assertEqual(features[1]['ReferenceLatitude'], NULL)
+        self.assertEqual(features[1]['ReportCount'], '')
+        self.assertFalse(features[1].hasGeometry())
+
+    def test_stations(self):
+        """
+        Test parsing stations
+        """
+        parser = BasicStationParser()
+        parser.parse(self.read_data('basic_stations.txt'))
+        self.assertEqual(len(parser.stations), 2)
+
+        features = list(parser.create_station_features())
+        self.assertEqual(len(features), 2)
+        self.assertEqual(features[0].attributes()[:6], ['IV', 'ACER', 40.7867, 15.9427, 690.0, 'ACERENZA'])
+        self.assertFalse(features[0]['EndTime'].isValid())
+        self.assertEqual(features[1]['EndTime'], QDateTime.fromString('2019-01-01T00:00:00', 'yyyy-MM-ddThh:mm:ss'))
+        self.assertEqual(features[1].geometry().asWkt(), 'Point (13.9919 37.6335)')
+
+
+if __name__ == "__main__":
+    suite = unittest.makeSuite(TestBasicTextParser)
+    runner = unittest.TextTestRunner(verbosity=2)
+    runner.run(suite)
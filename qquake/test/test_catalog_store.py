@@ -0,0 +1,284 @@
+# coding=utf-8
+"""Local catalog store test
+
+.. note:: This program is free software; you can redistribute it and/or modify
+     it under the terms of the GNU General Public License as published by
+     the Free Software Foundation; either version 2 of the License, or
+     (at your option) any later version.
+
+"""
+import os
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+from qgis.PyQt.QtCore import QByteArray
+
+from qquake.catalog_store import (
+    CatalogStore,
+    CatalogFootprint,
+    angular_distance
+)
+from qquake.quakeml import QuakeMlParser
+from qquake.basic_text import (
+    BasicTextParser,
+    GeoJsonParser
+)
+
+TEXT_CONTENT = b"""#EventID|Time|Latitude|Longitude|Depth/km|Author|Catalog|Contributor|ContributorID|MagType|Magnitude|MagAuthor|EventLocationName|EventType
+1|2021-01-03T10:00:00.000|42.5|13.2|10.0|SURVEY-INGV||||ML|3.1|--|Central Italy|earthquake
+2|2021-01-02T10:00:00.000|38.1|15.6|5.0|SURVEY-INGV||||ML|2.1|--|Sicily|earthquake
+3|2021-01-01T10:00:00.000|44.2|10.1|8.0|SURVEY-INGV||||ML|4.5|--|Northern Italy|quarry blast
+"""
+
+
+class TestCatalogStore(unittest.TestCase):
+    """
+    Test local catalog store
+    """
+
+    @staticmethod
+    def read_data(name: str) -> QByteArray:
+        """
+        Reads a test data file
+        """
+        path = os.path.join(os.path.dirname(
+            __file__), 'data', name)
+        with open(path, 'rb') as f:
+            return QByteArray(f.read())
+
+    @staticmethod
+    def parse_text(content: bytes) -> BasicTextParser:
+        """
+        Parses text format content
+        """
+        parser = BasicTextParser()
+        parser.parse(QByteArray(content))
+        return parser
+
+    def test_footprint_contains(self):
+        """
+        Test footprint containment
+        """
+        covered = CatalogFootprint('INGV', 'xml', start=1000, end=5000, min_magnitude=2,
+                                   rect=(30, 50, 0, 20))
+        self.assertTrue(covered.contains(CatalogFootprint('INGV', 'xml', start=2000, end=3000, min_magnitude=3,
+                                                          rect=(35, 45, 5, 15))))
+        self.assertTrue(covered.contains(CatalogFootprint('INGV', 'xml', start=2000, end=3000, min_magnitude=3,
+                                                          circle=(40, 10, None, 2))))
+        self.assertFalse(covered.contains(CatalogFootprint('EMSC', 'xml', start=2000, end=3000, min_magnitude=3,
+                                                           rect=(35, 45, 5, 15))))
+        self.assertFalse(covered.contains(CatalogFootprint('INGV', 'text', start=2000, end=3000, min_magnitude=3,
+                                                           rect=(35, 45, 5, 15))))
+        self.assertFalse(covered.contains(CatalogFootprint('INGV', 'xml', start=500, end=3000, min_magnitude=3,
+                                                           rect=(35, 45, 5, 15))))
+        self.assertFalse(covered.contains(CatalogFootprint('INGV', 'xml', start=2000, end=None, min_magnitude=3,
+                                                           rect=(35, 45, 5, 15))))
+        self.assertFalse(covered.contains(CatalogFootprint('INGV', 'xml', start=2000, end=3000, min_magnitude=1,
+                                                           rect=(35, 45, 5, 15))))
+        self.assertFalse(covered.contains(CatalogFootprint('INGV', 'xml', start=2000, end=3000, min_magnitude=3)))
+        self.assertFalse(covered.contains(CatalogFootprint('INGV', 'xml', start=2000, end=3000, min_magnitude=3,
+                                                           rect=(35, 55, 5, 15))))
+        self.assertFalse(covered.contains(CatalogFootprint('INGV', 'xml', include_all=True, start=2000, end=3000,
+                                                           min_magnitude=3, rect=(35, 45, 5, 15))))
+
+        unbounded = CatalogFootprint('INGV', 'xml')
+        self.assertTrue(unbounded.contains(CatalogFootprint('INGV', 'xml', event_type='earthquake')))
+        self.assertFalse(CatalogFootprint('INGV', 'xml', event_type='earthquake').contains(unbounded))
+
+        self.assertEqual(CatalogFootprint.from_dict(covered.to_dict()).key(), covered.key())
+
+    def test_angular_distance(self):
+        """
+        Test great circle distance calculation
+        """
+        self.assertAlmostEqual(angular_distance(0, 0, 0, 10), 10, 6)
+        self.assertAlmostEqual(angular_distance(10, 20, 10, 20), 0, 6)
+        self.assertAlmostEqual(angular_distance(-90, 0, 90, 0), 180, 6)
+
+    def test_text(self):
+        """
+        Test storing and querying text format results
+        """
+        with tempfile.TemporaryDirectory() as temp_dir:
+            store = CatalogStore(Path(temp_dir) / 'catalog.sqlite')
+            self.assertEqual(store.add_text('INGV', self.parse_text(TEXT_CONTENT)), 3)
+            # re-adding events must update the existing rows
+            self.assertEqual(store.add_text('INGV', self.parse_text(TEXT_CONTENT)), 3)
+            self.assertEqual(store.event_count(), 3)
+            self.assertEqual(store.event_count('EMSC'), 0)
+
+            def event_ids(footprint):
+                return [r[0] for r in store.matching_rows(footprint, 'e.event_id')]
+
+            self.assertEqual(event_ids(CatalogFootprint('INGV', 'text')), ['1', '2', '3'])
+            self.assertEqual(event_ids(CatalogFootprint('INGV', 'xml')), [])
+            self.assertEqual(event_ids(CatalogFootprint('INGV', 'text', min_magnitude=3)), ['1', '3'])
+            self.assertEqual(event_ids(CatalogFootprint('INGV', 'text', event_type='earthquake')), ['1', '2'])
+            self.assertEqual(event_ids(CatalogFootprint('INGV', 'text', start=1609581600000)), ['1', '2'])
+            self.assertEqual(event_ids(CatalogFootprint('INGV', 'text', rect=(40, 50, 10, 20))), ['1', '3'])
+            self.assertEqual(event_ids(CatalogFootprint('INGV', 'text', circle=(42, 13, None, 1))), ['1'])
+            self.assertEqual(event_ids(CatalogFootprint('INGV', 'text', circle=(42, 13, 1, None))), ['2', '3'])
+
+            parser = BasicTextParser()
+            parser.parse(store.query_content(CatalogFootprint('INGV', 'text', min_magnitude=3)))
+            self.assertEqual(len(parser.events), 2)
+            store.close()
+
+    def test_quakeml(self):
+        """
+        Test storing and querying QuakeML results
+        """
+        content = self.read_data('events.xml')
+        original = QuakeMlParser()
+        original.parse_initial(content)
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            store = CatalogStore(Path(temp_dir) / 'catalog.sqlite')
+            # only the specified events are stored, e.g. those added from a streamed reply
+            self.assertEqual(store.add_quakeml('INGV', content, original, original.events[:3]), 3)
+            self.assertEqual(store.event_count(), 3)
+
+            self.assertEqual(store.add_quakeml('INGV', content, original), 13)
+
+            parser = QuakeMlParser()
+            parser.parse_initial(store.query_content(CatalogFootprint('INGV', 'xml')))
+            self.assertEqual(len(parser.events), 13)
+            self.assertEqual(sorted(e.publicID for e in parser.events),
+                             sorted(e.publicID for e in original.events))
+
+            times = [r[0] for r in store.matching_rows(CatalogFootprint('INGV', 'xml'), 'e.time')]
+            self.assertEqual(times, sorted(times, reverse=True))
+            self.assertNotIn(None, times)
+            store.close()
+
+    def test_include_all(self):
+        """
+        Test that events with all origins and magnitudes are stored separately from preferred only events
+        """
+        content = self.read_data('events.xml')
+        include_all = QuakeMlParser()
+        include_all.parse_initial(content)
+        preferred_only = QuakeMlParser(preferred_origins_only=True, preferred_magnitudes_only=True)
+        preferred_only.parse_initial(content)
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            store = CatalogStore(Path(temp_dir) / 'catalog.sqlite')
+            self.assertEqual(store.add_quakeml('INGV', content, include_all), 13)
+            store.record_footprint(CatalogFootprint('INGV', 'xml', include_all=True))
+            self.assertEqual(store.add_quakeml('INGV', content, preferred_only), 13)
+            self.assertEqual(store.event_count(), 26)
+
+            # preferred only events do not replace events with all origins and magnitudes
+            self.assertTrue(store.covers(CatalogFootprint('INGV', 'xml', include_all=True), 60))
+            self.assertEqual(store.matching_rows(CatalogFootprint('INGV', 'xml', include_all=True), 'e.include_all'),
+                             [(1,)] * 13)
+
+            # other queries use a single version of each event
+            rows = store.matching_rows(CatalogFootprint('INGV', 'xml'), 'e.event_id, e.include_all')
+            self.assertEqual(sorted(event_id for event_id, _ in rows), sorted(e.publicID for e in include_all.events))
+            self.assertEqual({all_origins for _, all_origins in rows}, {0})
+            store.close()
+
+    def test_geojson(self):
+        """
+        Test storing GeoJSON results, which are stored in the text format
+        """
+        parser = GeoJsonParser()
+        parser.parse(self.read_data('geojson_events.json'))
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            store = CatalogStore(Path(temp_dir) / 'catalog.sqlite')
+            self.assertEqual(store.add_text('USGS', parser), 3)
+
+            text_parser = BasicTextParser()
+            text_parser.parse(store.query_content(CatalogFootprint('USGS', 'text')))
+            self.assertEqual(sorted(text_parser.all_event_ids()), sorted(parser.all_event_ids()))
+            self.assertEqual(sorted(f.attributes() for f in text_parser.create_event_features(None, None, None)),
+                             sorted(f.attributes() for f in parser.create_event_features(None, None, None)))
+            store.close()
+
+    def test_evict(self):
+        """
+        Test removing events and footprints which exceed the store's size or age limits
+        """
+        lines = TEXT_CONTENT.splitlines(keepends=True)
+        with tempfile.TemporaryDirectory() as temp_dir:
+            store = CatalogStore(Path(temp_dir) / 'catalog.sqlite')
+            # the oldest event (2021-01-01) is stored first, so that it is evicted first
+            store.add_text('INGV', self.parse_text(lines[0] + lines[3]))
+            time.sleep(0.01)
+            store.add_text('INGV', self.parse_text(b''.join(lines[:3])))
+            store.record_footprint(CatalogFootprint('INGV', 'text'))
+            # 2021-01-02 onwards
+            store.record_footprint(CatalogFootprint('INGV', 'text', start=1609545600000))
+            # 2020-12-31 to 2021-01-01T12:00
+            store.record_footprint(CatalogFootprint('INGV', 'text', start=1609372800000, end=1609502400000))
+            store.record_footprint(CatalogFootprint('EMSC', 'text'))
+
+            store.evict(10, 60)
+            self.assertEqual(store.event_count(), 3)
+            self.assertEqual(len(store.footprints('INGV')), 3)
+
+            # footprints covering removed events can no longer be answered locally
+            store.evict(2, 60)
+            self.assertEqual(store.event_count(), 2)
+            self.assertEqual([f.start for f, _ in store.footprints('INGV')], [1609545600000])
+            self.assertEqual(len(store.footprints('EMSC')), 1)
+
+            time.sleep(0.01)
+            store.evict(10, 0)
+            self.assertEqual(store.event_count(), 0)
+            self.assertEqual(store.footprints('INGV'), [])
+            self.assertEqual(store.footprints('EMSC'), [])
+            store.close()
+
+    def test_covers(self):
+        """
+        Test checking whether a query can be answered locally
+        """
+        with tempfile.TemporaryDirectory() as temp_dir:
+            store = CatalogStore(Path(temp_dir) / 'catalog.sqlite')
+            query = CatalogFootprint('INGV', 'text', start=1000, end=2000)
+            self.assertFalse(store.covers(query, 60))
+
+            store.record_footprint(CatalogFootprint('INGV', 'text', start=0, end=5000))
+            self.assertTrue(store.covers(query, 60))
+            self.assertFalse(store.covers(query, 0))
+            self.assertFalse(store.covers(CatalogFootprint('INGV', 'text', start=1000, end=6000), 60))
+
+            store.record_footprint(CatalogFootprint('INGV', 'text', start=0, end=5000), time.time() - 120)
+            self.assertFalse(store.covers(query, 60))
+            store.close()
+
+    def test_sync(self):
+        """
+        Test incremental sync bookkeeping and upserting updated events
+        """
+        with tempfile.TemporaryDirectory() as temp_dir:
+            store = CatalogStore(Path(temp_dir) / 'catalog.sqlite')
+            query = CatalogFootprint('INGV', 'text', start=1000, end=2000)
+            self.assertIsNone(store.last_sync(query))
+
+            store.record_footprint(CatalogFootprint('INGV', 'text', start=0, end=5000), 100)
+            store.record_footprint(CatalogFootprint('INGV', 'text', start=500, end=2500), 200)
+            store.record_footprint(CatalogFootprint('INGV', 'text', start=1500, end=2500), 300)
+            self.assertEqual(store.last_sync(query), 200)
+            self.assertIsNone(store.last_sync(CatalogFootprint('EMSC', 'text', start=1000, end=2000)))
+
+            store.add_text('INGV', self.parse_text(TEXT_CONTENT))
+            updated = b"""#EventID|Time|Latitude|Longitude|Depth/km|Author|Catalog|Contributor|ContributorID|MagType|Magnitude|MagAuthor|EventLocationName|EventType
+2|2021-01-02T10:00:00.000|38.1|15.6|5.0|SURVEY-INGV||||ML|3.5|--|Sicily|earthquake
+"""
+            self.assertEqual(store.add_text('INGV', self.parse_text(updated)), 1)
+            self.assertEqual(store.event_count(), 3)
+            self.assertEqual([r[0] for r in store.matching_rows(CatalogFootprint('INGV', 'text', min_magnitude=3),
+                                                                'e.event_id')], ['1', '2', '3'])
+            store.close()
+
+
+if __name__ == "__main__":
+    suite = unittest.makeSuite(TestCatalogStore)
+    runner = unittest.TextTestRunner(verbosity=2)
+    runner.run(suite)
@@ -0,0 +1,89 @@
+# coding=utf-8
+"""Datetime decoder test
+
+.. note:: This program is free software; you can redistribute it and/or modify
+     it under the terms of the GNU General Public License as published by
+     the Free Software Foundation; either version 2 of the License, or
+     (at your option) any later version.
+
+"""
+import unittest
+
+from qgis.PyQt.QtCore import (
+    QDate,
+    QDateTime,
+    QTime,
+    Qt
+)
+from qgis.PyQt.QtXml import QDomDocument
+
+from qquake.quakeml.datetime_decoder import decode_iso_datetime
+from qquake.quakeml.element_parser import ElementParser
+
+
+class TestDatetimeDecoder(unittest.TestCase):
+    """
+    Test datetime decoding
+    """
+
+    def test_decode(self):
+        """
+        Test decoding datetime strings
+        """
+        self.assertEqual(decode_iso_datetime('1970-01-01'), 0)
+        self.assertEqual(decode_iso_datetime('1970-01-01T00:00:00'), 0)
+        self.assertEqual(decode_iso_datetime('2021-04-01T14:33:39.301Z'),
+                         QDateTime(QDate(2021, 4, 1), QTime(14, 33, 39, 301), Qt.UTC).toMSecsSinceEpoch())
+        self.assertEqual(decode_iso_datetime('2021-04-01T14:33:39.3'),
+                         QDateTime(QDate(2021, 4, 1), QTime(14, 33, 39, 300), Qt.UTC).toMSecsSinceEpoch())
+        # fractions are truncated to milliseconds
+        self.assertEqual(decode_iso_datetime('2021-04-01T14:33:39.301999z'),
+                         QDateTime(QDate(2021, 4, 1), QTime(14, 33, 39, 301), Qt.UTC).toMSecsSinceEpoch())
+        self.assertEqual(decode_iso_datetime('2020-02-29'),
+                         QDateTime(QDate(2020, 2, 29), QTime(), Qt.UTC).toMSecsSinceEpoch())
+        self.assertEqual(decode_iso_datetime('1900-03-01T00:00:00'),
+                         QDateTime(QDate(1900, 3, 1), QTime(), Qt.UTC).toMSecsSinceEpoch())
+
+        # unsupported layouts and invalid values
+        self.assertIsNone(decode_iso_datetime('2021-04-01T14:33:39+01:00'))
+        self.assertIsNone(decode_iso_datetime('2021-04-01 14:33:39'))
+        self.assertIsNone(decode_iso_datetime('2021-04-01T14:33'))
+        self.assertIsNone(decode_iso_datetime('2021-02-29'))
+        self.assertIsNone(decode_iso_datetime('2021-13-01'))
+        self.assertIsNone(decode_iso_datetime('2021-04-01T24:00:00'))
+        self.assertIsNone(decode_iso_datetime('2021-04-01T14:33:39.'))
+        self.assertIsNone(decode_iso_datetime('x'))
+
+    def test_element_parser(self):
+        """
+        Test that element datetimes match the values parsed via QDateTime
+        """
+        values = ['2021-04-01T14:33:39.301Z', '2021-04-01T14:33:39Z', '2021-04-01T14:33:39', '2021-04-01T14:33:39.3',
+                  '2021-04-01T14:33:39.123456', '2021-04-01', '1999-12-31T23:59:59.999Z']
+        for value in values:
+            doc = QDomDocument()
+            doc.setContent('<element start="{}"><time>{}</time></element>'.format(value, value))
+            parser = ElementParser(doc.documentElement())
+
+            val = value[:-1] if value[-1] == 'Z' else value
+            if 'T' in val:
+                if '.' not in val:
+                    val += '.000'
+                expected = QDateTime.fromString((val + '000')[:23], 'yyyy-MM-ddThh:mm:ss.zzz')
+            else:
+                expected = QDateTime(QDate.fromString(val, 'yyyy-MM-dd'), QTime())
+            expected.setTimeSpec(Qt.UTC)
+
+            self.assertEqual(parser.datetime('time'), expected)
+            self.assertEqual(parser.datetime('start', is_attribute=True), expected)
+            self.assertEqual(parser.datetime('time').timeSpec(), Qt.UTC)
+
+        doc = QDomDocument()
+        doc.setContent('<element><time>2021-04-01T14:33:39+01:00</time></element>')
+        self.assertFalse(ElementParser(doc.documentElement()).datetime('time').isValid())
+
+
+if __name__ == "__main__":
+    suite = unittest.makeSuite(TestDatetimeDecoder)
+    runner = unittest.TextTestRunner(verbosity=2)
+    runner.run(suite)
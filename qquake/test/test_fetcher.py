@@ -9,9 +9,11 @@
 """
 import unittest
 
-from qgis.PyQt.QtCore import QDateTime, Qt
+from qgis.PyQt.QtCore import QByteArray, QDateTime, Qt
+from qgis.core import QgsSettings
 
-from qquake.fetcher import Fetcher
+from qquake.fetcher import Fetcher, ReplyStream
+from qquake.quakeml import QuakeMlParser, InvalidXmlException
 from qquake.services import ServiceManager, SERVICE_MANAGER
 
 
@@ -20,6 +22,66 @@ class TestFetcher(unittest.TestCase):
     Test fetcher
     """
 
+    EVENT_TEMPLATE = """<event publicID="smi:test/event?eventId={id}">
+<preferredOriginID>smi:test/origin?originId={id}</preferredOriginID>
+<preferredMagnitudeID>smi:test/magnitude?magnitudeId={id}</preferredMagnitudeID>
+<type>earthquake</type>
+<origin publicID="smi:test/origin?originId={id}"><time><value>{time}</value></time>
+<latitude><value>42.5</value></latitude><longitude><value>13.2</value></longitude></origin>
+<magnitude publicID="smi:test/magnitude?magnitudeId={id}"><mag><value>3.1</value></mag><type>ML</type>
+<originID>smi:test/origin?originId={id}</originID></magnitude>
+</event>"""
+
+    @staticmethod
+    def quakeml_reply(*events) -> QByteArray:
+        """
+        Returns a QuakeML reply containing events, given as (event id, ISO time) tuples
+        """
+        return QByteArray(('<q:quakeml xmlns="http://quakeml.org/xmlns/bed/1.2" '
+                           'xmlns:q="http://quakeml.org/xmlns/quakeml/1.2"><eventParameters publicID="smi:test">' +
+                           ''.join(TestFetcher.EVENT_TEMPLATE.format(id=event_id, time=time)
+                                   for event_id, time in events) +
+                           '</eventParameters></q:quakeml>').encode())
+
+    @staticmethod
+    def capture_requests(fetcher: Fetcher):
+        """
+        Replaces the fetcher's network requests and background tasks, so that canned replies can be
+        fed to the fetcher.
+
+        Returns lists of the requests made (as (url, split range) tuples), the queued background tasks
+        (which can be run via run_tasks) and the finished fetches.
+        """
+        requests = []
+        tasks = []
+        finished = []
+
+        class Task:  # pylint: disable=too-few-public-methods
+            """
+            Synchronous replacement for a background task
+            """
+
+            @staticmethod
+            def isCanceled():  # pylint: disable=invalid-name
+                """
+                Tasks are never canceled
+                """
+                return False
+
+        fetcher._fetch_url = lambda url, split_range=None: requests.append((url, split_range))
+        fetcher._run_task = lambda description, function, on_finished, report_progress=False: tasks.append(
+            lambda: on_finished(function(Task())))
+        fetcher._prepare_features = lambda: finished.append(True)
+        return requests, tasks, finished
+
+    @staticmethod
+    def run_tasks(tasks):
+        """
+        Runs all queued background tasks
+        """
+        while tasks:
+            tasks.pop(0)()
+
     def test_url(self):
         """
         Test generation of urls
@@ -228,6 +290,58 @@ class TestFetcher(unittest.TestCase):
                           (QDateTime(2020, 3, 1, 1, 1, 3),
                            QDateTime(2020, 4, 1, 1, 1, 3))])
 
+    def test_split_range_adaptive(self):
+        """
+        Test adaptive splitting of a date range
+        """
+        self.assertEqual(Fetcher.split_range_by_strategy(Fetcher.SPLIT_STRATEGY_ADAPTIVE,
+                                                         QDateTime(2020, 1, 1, 1, 1, 1),
+                                                         QDateTime(2022, 1, 1, 1, 1, 1)),
+                         [(QDateTime(2020, 1, 1, 1, 1, 1),
+                           QDateTime(2022, 1, 1, 1, 1, 1))])
+
+        self.assertEqual(Fetcher.bisect_range(QDateTime(2020, 1, 1, 0, 0, 0),
+                                              QDateTime(2020, 1, 3, 0, 0, 0)),
+                         [(QDateTime(2020, 1, 1, 0, 0, 0),
+                           QDateTime(2020, 1, 2, 0, 0, 0)),
+                          (QDateTime(2020, 1, 2, 0, 0, 0),
+                           QDateTime(2020, 1, 3, 0, 0, 0))])
+        self.assertEqual(Fetcher.bisect_range(QDateTime(2020, 1, 1, 0, 0, 0),
+                                              QDateTime(2020, 1, 1, 0, 0, 2)),
+                         [(QDateTime(2020, 1, 1, 0, 0, 0),
+                           QDateTime(2020, 1, 1, 0, 0, 1)),
+                          (QDateTime(2020, 1, 1, 0, 0, 1),
+                           QDateTime(2020, 1, 1, 0, 0, 2))])
+        self.assertIsNone(Fetcher.bisect_range(QDateTime(2020, 1, 1, 0, 0, 0),
+                                               QDateTime(2020, 1, 1, 0, 0, 1)))
+
+    def test_can_resume_with_split_strategy(self):
+        """
+        Test whether oversized queries can be resumed with a split strategy
+        """
+        fetcher = Fetcher(ServiceManager.FDSNEVENT,
+                          "EMSC-CSEM")
+        self.assertTrue(fetcher.can_resume_with_split_strategy())
+
+        # no results to resume from
+        self.assertFalse(fetcher.resume_with_split_strategy(Fetcher.SPLIT_STRATEGY_YEAR))
+
+        fetcher = Fetcher(ServiceManager.FDSNEVENT,
+                          "EMSC-CSEM",
+                          event_start_date=QDateTime(2020, 1, 1, 1, 1, 1),
+                          event_end_date=QDateTime(2020, 1, 4, 1, 1, 1),
+                          split_strategy=Fetcher.SPLIT_STRATEGY_DAY)
+        self.assertFalse(fetcher.can_resume_with_split_strategy())
+
+        fetcher = Fetcher(ServiceManager.FDSNEVENT,
+                          "EMSC-CSEM",
+                          url='http://example.com/events.xml')
+        self.assertFalse(fetcher.can_resume_with_split_strategy())
+
+        fetcher = Fetcher(ServiceManager.MACROSEISMIC,
+                          "INGV ASMI-DBMI")
+        self.assertFalse(fetcher.can_resume_with_split_strategy())
+
     def test_fetch_with_split(self):
         """
         Test fetcher with split strategy
@@ -245,6 +359,262 @@ class TestFetcher(unittest.TestCase):
             (QDateTime(2020, 1, 3, 1, 1, 3),
              QDateTime(2020, 1, 4, 1, 1, 3))])
 
+    def test_is_past_time_window(self):
+        """
+        Test determining whether a query's time window ends in the past
+        """
+        fetcher = Fetcher(ServiceManager.FDSNEVENT,
+                          "EMSC-CSEM")
+        self.assertFalse(fetcher.is_past_time_window())
+
+        fetcher = Fetcher(ServiceManager.FDSNEVENT,
+                          "EMSC-CSEM",
+                          event_start_date=QDateTime(2020, 1, 1, 1, 1, 1),
+                          event_end_date=QDateTime(2020, 1, 2, 1, 1, 1))
+        self.assertTrue(fetcher.is_past_time_window())
+
+        fetcher = Fetcher(ServiceManager.FDSNEVENT,
+                          "EMSC-CSEM",
+                          event_start_date=QDateTime(2020, 1, 1, 1, 1, 1),
+                          event_end_date=QDateTime.currentDateTimeUtc().addDays(1))
+        self.assertFalse(fetcher.is_past_time_window())
+
+    def test_max_concurrent_requests(self):
+        """
+        Test the maximum number of concurrent split range requests
+        """
+        fetcher = Fetcher(ServiceManager.FDSNEVENT,
+                          "EMSC-CSEM")
+        self.assertEqual(fetcher.max_concurrent_requests, Fetcher.DEFAULT_MAX_CONCURRENT_REQUESTS)
+        self.assertIsNone(fetcher.split_ranges)
+
+        settings = SERVICE_MANAGER.services[ServiceManager.FDSNEVENT]['EMSC-CSEM']['settings']
+        self.addCleanup(settings.pop, 'querymaxconcurrentrequests', None)
+
+        settings['querymaxconcurrentrequests'] = 8
+        fetcher = Fetcher(ServiceManager.FDSNEVENT,
+                          "EMSC-CSEM")
+        self.assertEqual(fetcher.max_concurrent_requests, 8)
+
+        settings['querymaxconcurrentrequests'] = 0
+        fetcher = Fetcher(ServiceManager.FDSNEVENT,
+                          "EMSC-CSEM")
+        self.assertEqual(fetcher.max_concurrent_requests, 1)
+    def test_split_range_dispatch(self):
+        """
+        Test concurrent split range requests, which are merged in chronological order
+        """
+        fetcher = Fetcher(ServiceManager.FDSNEVENT,
+                          "EMSC-CSEM",
+                          event_start_date=QDateTime(2020, 1, 1, 1, 1, 1),
+                          event_end_date=QDateTime(2020, 1, 6, 1, 1, 1),
+                          split_strategy=Fetcher.SPLIT_STRATEGY_DAY)
+        fetcher.max_concurrent_requests = 2
+        requests, tasks, finished = self.capture_requests(fetcher)
+
+        fetcher.fetch_data()
+        self.assertEqual(len(fetcher.split_ranges), 5)
+        self.assertEqual(len(requests), 2)
+        self.assertIn('starttime=2020-01-01T01:01:01&endtime=2020-01-02T01:01:01', requests[0][0])
+        self.assertIn('starttime=2020-01-02T01:01:02&endtime=2020-01-03T01:01:02', requests[1][0])
+
+        # later ranges finishing first are held until the earlier ranges are merged
+        fetcher._content_received(self.quakeml_reply(('2', '2020-01-02T05:00:00')), requests[1][1])
+        self.run_tasks(tasks)
+        self.assertEqual(len(requests), 3)
+        self.assertFalse(fetcher.result.events)
+
+        fetcher._content_received(self.quakeml_reply(('3', '2020-01-03T05:00:00')), requests[2][1])
+        self.run_tasks(tasks)
+        self.assertEqual(len(requests), 4)
+        self.assertIn('starttime=2020-01-04T01:01:04', requests[3][0])
+        fetcher._content_received(self.quakeml_reply(), requests[3][1])
+        self.run_tasks(tasks)
+        # the look ahead window is full, so no further ranges are requested until the first range is merged
+        self.assertEqual(len(requests), 4)
+        self.assertFalse(fetcher.result.events)
+
+        fetcher._content_received(self.quakeml_reply(('1', '2020-01-01T05:00:00')), requests[0][1])
+        self.run_tasks(tasks)
+        self.assertEqual([e.publicID for e in fetcher.result.events],
+                         ['smi:test/event?eventId=1', 'smi:test/event?eventId=2', 'smi:test/event?eventId=3'])
+        self.assertEqual(len(fetcher.split_ranges), 1)
+        self.assertEqual(len(requests), 5)
+        self.assertIn('starttime=2020-01-05T01:01:05', requests[4][0])
+        self.assertFalse(finished)
+
+        fetcher._content_received(self.quakeml_reply(('5', '2020-01-05T05:00:00')), requests[4][1])
+        self.run_tasks(tasks)
+        self.assertEqual([e.publicID for e in fetcher.result.events][-1], 'smi:test/event?eventId=5')
+        self.assertEqual(len(fetcher.result.events), 4)
+        self.assertEqual(len(requests), 5)
+        self.assertEqual(finished, [True])
+
+    def test_split_range_event_requests(self):
+        """
+        Test that per event requests are only made once all split ranges have been merged
+        """
+        fetcher = Fetcher(ServiceManager.FDSNEVENT,
+                          'INGV ISIDe',
+                          event_start_date=QDateTime(2020, 1, 1, 1, 1, 1),
+                          event_end_date=QDateTime(2020, 1, 4, 1, 1, 1),
+                          split_strategy=Fetcher.SPLIT_STRATEGY_DAY)
+        fetcher.preferred_origins_only = False
+        fetcher.max_concurrent_requests = 1
+        requests, tasks, finished = self.capture_requests(fetcher)
+
+        fetcher.fetch_data()
+        self.assertEqual(len(requests), 1)
+
+        fetcher._content_received(self.quakeml_reply(('1', '2020-01-01T05:00:00')), requests[0][1])
+        self.run_tasks(tasks)
+        self.assertEqual(len(requests), 2)
+        # the next range must be requested in full, not as a request for a single event
+        self.assertEqual(requests[1][0], 'http://webservices.ingv.it/fdsnws/event/1/query?'
+                                         'starttime=2020-01-02T01:01:02&endtime=2020-01-03T01:01:02&'
+                                         'limit=15000&format=xml')
+
+        fetcher._content_received(self.quakeml_reply(('2', '2020-01-02T05:00:00')), requests[1][1])
+        self.run_tasks(tasks)
+        self.assertNotIn('eventid', requests[2][0])
+        fetcher._content_received(self.quakeml_reply(('3', '2020-01-03T05:00:00')), requests[2][1])
+        self.run_tasks(tasks)
+
+        # all origins are then requested for the events from every range
+        self.assertEqual(fetcher.pending_event_ids, ['1', '2', '3'])
+        self.assertEqual(len(requests), 4)
+        self.assertIsNone(requests[3][1])
+        self.assertIn('eventid=1&includeallorigins=true', requests[3][0])
+        self.assertFalse(finished)
+
+    def test_split_range_bisect(self):
+        """
+        Test that saturated split ranges are bisected, and events on the shared boundary are de-duplicated
+        """
+        settings = SERVICE_MANAGER.services[ServiceManager.FDSNEVENT]['EMSC-CSEM']['settings']
+        self.addCleanup(settings.__setitem__, 'querylimitmaxentries', settings['querylimitmaxentries'])
+        settings['querylimitmaxentries'] = 3
+
+        fetcher = Fetcher(ServiceManager.FDSNEVENT,
+                          "EMSC-CSEM",
+                          event_start_date=QDateTime(2020, 1, 1, 0, 0, 0),
+                          event_end_date=QDateTime(2020, 1, 3, 0, 0, 0),
+                          split_strategy=Fetcher.SPLIT_STRATEGY_ADAPTIVE)
+        requests, tasks, finished = self.capture_requests(fetcher)
+
+        fetcher.fetch_data()
+        self.assertEqual(len(requests), 1)
+        self.assertIn('starttime=2020-01-01T00:00:00&endtime=2020-01-03T00:00:00&limit=3', requests[0][0])
+
+        # a reply which reached the limit is discarded, and the range is requested again in two halves
+        fetcher._content_received(self.quakeml_reply(('3', '2020-01-02T10:00:00'),
+                                                     ('2', '2020-01-02T00:00:00'),
+                                                     ('1', '2020-01-01T10:00:00')), requests[0][1])
+        self.run_tasks(tasks)
+        self.assertFalse(fetcher.result.events)
+        self.assertEqual(fetcher.split_range_count, 2)
+        self.assertEqual(len(requests), 3)
+        self.assertIn('starttime=2020-01-01T00:00:00&endtime=2020-01-02T00:00:00', requests[1][0])
+        self.assertIn('starttime=2020-01-02T00:00:00&endtime=2020-01-03T00:00:00', requests[2][0])
+
+        # the event on the boundary is returned for both halves
+        fetcher._content_received(self.quakeml_reply(('3', '2020-01-02T10:00:00'),
+                                                     ('2', '2020-01-02T00:00:00')), requests[2][1])
+        fetcher._content_received(self.quakeml_reply(('2', '2020-01-02T00:00:00'),
+                                                     ('1', '2020-01-01T10:00:00')), requests[1][1])
+        self.run_tasks(tasks)
+        self.assertEqual([e.publicID for e in fetcher.result.events],
+                         ['smi:test/event?eventId=2', 'smi:test/event?eventId=1', 'smi:test/event?eventId=3'])
+        self.assertEqual(sorted(fetcher.result.origins), ['smi:test/origin?originId=1', 'smi:test/origin?originId=2',
+                                                          'smi:test/origin?originId=3'])
+        self.assertFalse(fetcher.exceeded_limit)
+        self.assertEqual(len(requests), 3)
+        self.assertEqual(finished, [True])
+
+    def test_resume_with_split_strategy(self):
+        """
+        Test resuming an oversized query with a split strategy, keeping the complete part of the results
+        """
+        settings = SERVICE_MANAGER.services[ServiceManager.FDSNEVENT]['EMSC-CSEM']['settings']
+        self.addCleanup(settings.__setitem__, 'querylimitmaxentries', settings['querylimitmaxentries'])
+        settings['querylimitmaxentries'] = 3
+
+        fetcher = Fetcher(ServiceManager.FDSNEVENT,
+                          "EMSC-CSEM",
+                          event_start_date=QDateTime(2020, 1, 1, 0, 0, 0),
+                          event_end_date=QDateTime(2020, 1, 4, 0, 0, 0))
+        requests, tasks, finished = self.capture_requests(fetcher)
+
+        fetcher.fetch_data()
+        self.assertEqual(len(requests), 1)
+        fetcher._content_received(self.quakeml_reply(('5', '2020-01-03T12:00:00'),
+                                                     ('4', '2020-01-03T00:00:00.500'),
+                                                     ('3', '2020-01-02T20:00:00.250')), requests[0][1])
+        self.run_tasks(tasks)
+        self.assertTrue(fetcher.exceeded_limit)
+        self.assertEqual(finished, [True])
+
+        self.assertTrue(fetcher.resume_with_split_strategy(Fetcher.SPLIT_STRATEGY_DAY))
+        # the earliest returned second may have been truncated, so its events are removed and fetched again
+        self.assertEqual([e.publicID for e in fetcher.result.events],
+                         ['smi:test/event?eventId=5', 'smi:test/event?eventId=4'])
+        self.assertEqual(sorted(fetcher.result.origins), ['smi:test/origin?originId=4', 'smi:test/origin?originId=5'])
+        self.assertFalse(fetcher.exceeded_limit)
+
+        # only the time span which was not covered is requested
+        self.assertEqual(len(requests), 3)
+        self.assertIn('starttime=2020-01-01T00:00:00&endtime=2020-01-02T00:00:00', requests[1][0])
+        self.assertIn('starttime=2020-01-02T00:00:01&endtime=2020-01-03T00:00:01', requests[2][0])
+
+        fetcher._content_received(self.quakeml_reply(('3', '2020-01-02T20:00:00.250'),
+                                                     ('2', '2020-01-02T05:00:00')), requests[2][1])
+        fetcher._content_received(self.quakeml_reply(('1', '2020-01-01T10:00:00')), requests[1][1])
+        self.run_tasks(tasks)
+        self.assertEqual([e.publicID for e in fetcher.result.events],
+                         ['smi:test/event?eventId=5', 'smi:test/event?eventId=4', 'smi:test/event?eventId=1',
+                          'smi:test/event?eventId=3', 'smi:test/event?eventId=2'])
+        self.assertEqual(len(fetcher.result.origins), 5)
+        self.assertEqual(fetcher.event_start_date, QDateTime(2020, 1, 1, 0, 0, 0))
+        self.assertEqual(fetcher.event_end_date, QDateTime(2020, 1, 4, 0, 0, 0))
+        self.assertEqual(len(requests), 3)
+        self.assertEqual(finished, [True, True])
+
+    def test_streamed_reply(self):
+        """
+        Test parsing replies in a background task as they are received
+        """
+        fetcher = Fetcher(ServiceManager.FDSNEVENT,
+                          "EMSC-CSEM")
+        self.assertTrue(fetcher._can_stream_reply())
+        requests, tasks, finished = self.capture_requests(fetcher)
+
+        content = self.quakeml_reply(('2', '2020-01-02T05:00:00'), ('1', '2020-01-01T05:00:00')).data()
+        stream = fetcher._begin_stream()
+        for i in range(0, len(content), 100):
+            stream.add_data(content[i:i + 100])
+        self.assertEqual(stream.complete().data(), content)
+        self.assertFalse(fetcher.result.events)
+
+        self.run_tasks(tasks)
+        self.assertEqual([e.publicID for e in fetcher.result.events],
+                         ['smi:test/event?eventId=2', 'smi:test/event?eventId=1'])
+        self.assertFalse(requests)
+        self.assertEqual(finished, [True])
+
+        # truncated replies are reported
+        stream = ReplyStream()
+        stream.add_data(content[:len(content) // 2])
+        stream.complete()
+        with self.assertRaises(InvalidXmlException):
+            stream.parse(None, QuakeMlParser())
+
+        # replies are parsed once complete when the parse cache is used
+        QgsSettings().setValue('/plugins/qquake/parse_cache_enabled', True)
+        try:
+            self.assertFalse(fetcher._can_stream_reply())
+        finally:
+            QgsSettings().remove('/plugins/qquake/parse_cache_enabled')
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,117 @@
+# coding=utf-8
+"""GeoJSON parser test
+
+.. note:: This program is free software; you can redistribute it and/or modify
+     it under the terms of the GNU General Public License as published by
+     the Free Software Foundation; either version 2 of the License, or
+     (at your option) any later version.
+
+"""
+import os
+import unittest
+
+from qgis.PyQt.QtCore import (
+    QByteArray,
+    QDateTime,
+    Qt
+)
+from qgis.core import (
+    QgsSettings,
+    QgsUnitTypes
+)
+
+from qquake.basic_text import (
+    BasicTextParser,
+    GeoJsonParser
+)
+from qquake.fetcher import Fetcher
+from qquake.services import ServiceManager
+
+
+class TestGeoJsonParser(unittest.TestCase):
+    """
+    Test GeoJSON parsing
+    """
+
+    @staticmethod
+    def read_data(file: str) -> QByteArray:
+        """
+        Reads a test data file
+        """
+        path = os.path.join(os.path.dirname(
+            __file__), 'data', file)
+        with open(path, 'rb') as f:
+            return QByteArray(f.read())
+
+    def test_events(self):
+        """
+        Test parsing events
+        """
+        content = self.read_data('geojson_events.json')
+        self.assertEqual(GeoJsonParser.count_events(content), 3)
+
+        parser = GeoJsonParser(depth_unit=QgsUnitTypes.DistanceKilometers)
+        parser.parse(content)
+        self.assertEqual(len(parser.events), 3)
+        self.assertEqual(parser.all_event_ids(), ['26359881', '26359291', 'us7000dflf'])
+        self.assertEqual(parser.event_time(parser.events[2]),
+                         QDateTime.fromMSecsSinceEpoch(1617211269030, Qt.UTC))
+
+        features = list(parser.create_event_features(None, None, None))
+        self.assertEqual(len(features), 3)
+        self.assertEqual(features[0].attributes()[:5],
+                         ['26359881', QDateTime.fromString('2021-04-01T14:33:39.301', 'yyyy-MM-ddThh:mm:ss.zzz'),
+                          36.7682, 7.1477, 19.7])
+        self.assertEqual(features[0]['MagType'], 'Mw')
+        self.assertEqual(features[0]['Magnitude'], 5.1)
+        self.assertEqual(features[0]['Catalog'], '')
+        self.assertEqual(features[0].geometry().asWkt(), 'PointZ (7.1477 36.7682 19.7)')
+        self.assertEqual(features[2]['Contributor'], 'us')
+        self.assertEqual(features[2]['ContributorID'], '7000dflf')
+        self.assertEqual(features[2]['EventLocationName'], 'Pahala, Hawaii')
+
+    def test_invalid(self):
+        """
+        Test parsing invalid content
+        """
+        parser = GeoJsonParser()
+        with self.assertRaises(ValueError):
+            parser.parse(QByteArray(b'not json'))
+        with self.assertRaises(ValueError):
+            parser.parse(QByteArray(b'{"error": "service unavailable"}'))
+        self.assertFalse(parser.events)
+        parser.parse(QByteArray())
+        self.assertFalse(parser.events)
+        parser.parse(QByteArray(b'{"type": "FeatureCollection", "features": []}'))
+        self.assertFalse(parser.events)
+
+        self.assertEqual(GeoJsonParser.count_events(QByteArray(b'not json')), 0)
+        # plain arrays of events are counted by parsing them
+        self.assertEqual(GeoJsonParser.count_events(QByteArray(b'[{"id": "1"}, {"id": "2"}]')), 2)
+
+    def test_url(self):
+        """
+        Test that JSON output is requested only when preferred
+        """
+        fetcher = Fetcher(ServiceManager.FDSNEVENT, 'EMSC-CSEM', output_type=Fetcher.BASIC)
+        self.assertIsInstance(fetcher.result, BasicTextParser)
+        self.assertNotIsInstance(fetcher.result, GeoJsonParser)
+        self.assertTrue(fetcher.generate_url().endswith('format=text'))
+
+        QgsSettings().setValue('/plugins/qquake/prefer_json_output', True)
+        try:
+            fetcher = Fetcher(ServiceManager.FDSNEVENT, 'EMSC-CSEM', output_type=Fetcher.BASIC)
+            self.assertIsInstance(fetcher.result, GeoJsonParser)
+            self.assertTrue(fetcher.generate_url().endswith('format=geojson'))
+
+            # extended results are always requested as QuakeML
+            fetcher = Fetcher(ServiceManager.FDSNEVENT, 'EMSC-CSEM', output_type=Fetcher.EXTENDED)
+            self.assertTrue(fetcher.generate_url().endswith('format=xml'))
+        finally:
+            QgsSettings().remove('/plugins/qquake/prefer_json_output')
+
+
+if __name__ == "__main__":
+    suite = unittest.makeSuite(TestGeoJsonParser)
+    runner = unittest.TextTestRunner(verbosity=2)
+    runner.run(suite)
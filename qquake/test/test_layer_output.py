@@ -0,0 +1,128 @@
+# coding=utf-8
+"""Layer output test
+
+.. note:: This program is free software; you can redistribute it and/or modify
+     it under the terms of the GNU General Public License as published by
+     the Free Software Foundation; either version 2 of the License, or
+     (at your option) any later version.
+
+"""
+import os
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+from qgis.PyQt.QtCore import QVariant
+from qgis.core import (
+    QgsFeature,
+    QgsField,
+    QgsFields,
+    QgsGeometry,
+    QgsPoint,
+    QgsSettings,
+    QgsVectorLayer,
+    QgsWkbTypes
+)
+
+from qquake.layer_output import LayerOutput
+
+
+class TestLayerOutput(unittest.TestCase):
+    """
+    Test writing features to file backed layers
+    """
+
+    def test_settings(self):
+        """
+        Test output settings
+        """
+        self.assertIsNone(LayerOutput.output_format())
+        with tempfile.TemporaryDirectory() as temp_dir:
+            QgsSettings().setValue('/plugins/qquake/layer_output_format', LayerOutput.FORMAT_GEOPACKAGE)
+            QgsSettings().setValue('/plugins/qquake/layer_output_folder', temp_dir)
+            try:
+                self.assertEqual(LayerOutput.output_format(), LayerOutput.FORMAT_GEOPACKAGE)
+                path = LayerOutput.file_path('INGV ISIDe (Magnitude ≤ 5.0)', LayerOutput.FORMAT_GEOPACKAGE)
+                self.assertEqual(path.parent, Path(temp_dir))
+                self.assertTrue(path.name.startswith('INGV_ISIDe_Magnitude_5_0_'))
+                self.assertEqual(path.suffix, '.gpkg')
+
+                # paths are unique
+                path.touch()
+                self.assertNotEqual(LayerOutput.file_path('INGV ISIDe (Magnitude ≤ 5.0)',
+                                                          LayerOutput.FORMAT_GEOPACKAGE), path)
+            finally:
+                QgsSettings().remove('/plugins/qquake/layer_output_format')
+                QgsSettings().remove('/plugins/qquake/layer_output_folder')
+
+    def test_write_features(self):
+        """
+        Test writing features in chunks
+        """
+        fields = QgsFields()
+        fields.append(QgsField('EventID', QVariant.String))
+        fields.append(QgsField('Magnitude', QVariant.Double))
+
+        def features():
+            for i in range(25):
+                f = QgsFeature(fields)
+                f.setAttributes([str(i), i / 10])
+                f.setGeometry(QgsGeometry(QgsPoint(i, i / 2, -i)))
+                yield f
+
+        prev_chunk_size = LayerOutput.CHUNK_SIZE
+        LayerOutput.CHUNK_SIZE = 10
+        try:
+            with tempfile.TemporaryDirectory() as temp_dir:
+                for output_format in (LayerOutput.FORMAT_GEOPACKAGE, LayerOutput.FORMAT_FLATGEOBUF):
+                    # the output folder is created when the first layer is written to it
+                    path = Path(temp_dir) / 'layers' / 'events.{}'.format(output_format)
+                    progress = []
+                    self.assertIsNone(LayerOutput.write_features(path, fields, QgsWkbTypes.PointZ, features(),
+                                                                 output_format, progress=progress.append))
+                    self.assertEqual(progress, [10, 20])
+
+                    vl = QgsVectorLayer(str(path), 'events', 'ogr')
+                    self.assertTrue(vl.isValid())
+                    self.assertEqual(vl.featureCount(), 25)
+                    # attributes are not shifted by the GeoPackage fid field
+                    self.assertEqual(sorted((f['EventID'], f['Magnitude']) for f in vl.getFeatures()),
+                                     sorted((str(i), i / 10) for i in range(25)))
+                    del vl
+
+                    # canceled writes are removed
+                    path = Path(temp_dir) / 'canceled.{}'.format(output_format)
+                    self.assertIsNotNone(LayerOutput.write_features(path, fields, QgsWkbTypes.PointZ, features(),
+                                                                    output_format, is_canceled=lambda: True))
+                    self.assertFalse(path.exists())
+        finally:
+            LayerOutput.CHUNK_SIZE = prev_chunk_size
+
+    def test_remove_expired_files(self):
+        """
+        Test removing old layer files which are not in use
+        """
+        self.assertEqual(LayerOutput.max_age(), 0)
+        with tempfile.TemporaryDirectory() as temp_dir:
+            folder = Path(temp_dir)
+            self.assertEqual(LayerOutput.remove_expired_files(60, [], folder / 'missing'), 0)
+
+            old_time = time.time() - 120
+            paths = {}
+            for name in ('old.gpkg', 'old.gpkg-wal', 'old.fgb', 'used.gpkg', 'new.gpkg', 'other.txt'):
+                paths[name] = folder / name
+                paths[name].touch()
+                if name != 'new.gpkg':
+                    os.utime(paths[name], (old_time, old_time))
+
+            # a max age of 0 keeps all files
+            self.assertEqual(LayerOutput.remove_expired_files(0, [], folder), 0)
+            self.assertEqual(LayerOutput.remove_expired_files(60, [paths['used.gpkg']], folder), 2)
+            self.assertEqual(sorted(p.name for p in folder.iterdir()), ['new.gpkg', 'other.txt', 'used.gpkg'])
+
+
+if __name__ == "__main__":
+    suite = unittest.makeSuite(TestLayerOutput)
+    runner = unittest.TextTestRunner(verbosity=2)
+    runner.run(suite)
@@ -0,0 +1,140 @@
+# coding=utf-8
+"""Parse cache test
+
+.. note:: This program is free software; you can redistribute it and/or modify
+     it under the terms of the GNU General Public License as published by
+     the Free Software Foundation; either version 2 of the License, or
+     (at your option) any later version.
+
+"""
+import os
+import tempfile
+import unittest
+from pathlib import Path
+
+from qgis.PyQt.QtCore import QByteArray
+from qgis.core import QgsUnitTypes
+
+from qquake.basic_text import BasicTextParser
+from qquake.parse_cache import (
+    ParseCache,
+    canonical_repr
+)
+from qquake.parse_pool import ParsePool
+from qquake.quakeml import QuakeMlParser
+from qquake.quakeml.element import QuakeMlElement
+
+
+class TestParseCache(unittest.TestCase):
+    """
+    Test parse cache
+    """
+
+    @staticmethod
+    def read_data(file: str) -> QByteArray:
+        """
+        Reads a test data file
+        """
+        path = os.path.join(os.path.dirname(
+            __file__), 'data', file)
+        with open(path, 'rb') as f:
+            return QByteArray(f.read())
+
+    def test_key(self):
+        """
+        Test cache keys
+        """
+        content = self.read_data('basic_events.txt')
+        key = ParseCache.key(BasicTextParser(), content, ParsePool.MODE_PARSE)
+        self.assertEqual(ParseCache.key(BasicTextParser(), content, ParsePool.MODE_PARSE), key)
+        # parser settings and modes are part of the key
+        self.assertNotEqual(ParseCache.key(BasicTextParser(depth_unit=QgsUnitTypes.DistanceKilometers), content,
+                                           ParsePool.MODE_PARSE), key)
+        self.assertNotEqual(ParseCache.key(BasicTextParser(), content, ParsePool.MODE_MDP), key)
+        self.assertNotEqual(ParseCache.key(BasicTextParser(), QByteArray(content.data() + b'\n'),
+                                           ParsePool.MODE_PARSE), key)
+
+        self.assertEqual(canonical_repr({'b': frozenset(['y', 'x']), 'a': [1, 2]}), "{'a':[1,2],'b':{'x','y'}}")
+
+    def test_format_version(self):
+        """
+        Test that the format version changes with the parsed element classes
+        """
+        self.addCleanup(setattr, ParseCache, '_format_version', None)
+        version = ParseCache.format_version()
+        self.assertIs(ParseCache.format_version(), version)
+
+        class NewElement(QuakeMlElement):  # pylint: disable=unused-variable
+            """
+            Element class added by a newer parser version
+            """
+            __slots__ = ('value',)
+
+        ParseCache._format_version = None  # pylint: disable=protected-access
+        self.assertNotEqual(ParseCache.format_version(), version)
+
+    def test_store_and_retrieve(self):
+        """
+        Test storing and retrieving parsed results
+        """
+        with tempfile.TemporaryDirectory() as temp_dir:
+            cache = ParseCache(Path(temp_dir))
+
+            content = self.read_data('events.xml')
+            parser = QuakeMlParser()
+            key = ParseCache.key(parser, content, ParsePool.MODE_INITIAL)
+            self.assertIsNone(cache.retrieve(key))
+
+            parser.parse_initial(content)
+            cache.store(key, parser)
+            restored = cache.retrieve(key)
+            self.assertEqual(restored.to_dict(), parser.to_dict())
+
+            text_parser = BasicTextParser()
+            text_key = ParseCache.key(text_parser, self.read_data('basic_events.txt'), ParsePool.MODE_PARSE)
+            text_parser.parse(self.read_data('basic_events.txt'))
+            cache.store(text_key, text_parser)
+            self.assertEqual(cache.retrieve(text_key).events, text_parser.events)
+
+            # entries from other versions are discarded
+            entry_path = Path(temp_dir) / (key + '.parsed')
+            with open(entry_path, 'rb') as f:
+                data = f.read()
+            with open(entry_path, 'wb') as f:
+                f.write(ParseCache.MAGIC + bytes(len(ParseCache.format_version())))
+                f.write(data[len(ParseCache.MAGIC) + len(ParseCache.format_version()):])
+            self.assertIsNone(cache.retrieve(key))
+            self.assertFalse(entry_path.exists())
+
+            # corrupt entries are discarded
+            with open(entry_path, 'wb') as f:
+                f.write(data[:20])
+            self.assertIsNone(cache.retrieve(key))
+            self.assertFalse(entry_path.exists())
+
+            cache.clear()
+            self.assertIsNone(cache.retrieve(text_key))
+
+    def test_evict(self):
+        """
+        Test evicting least recently used entries
+        """
+        with tempfile.TemporaryDirectory() as temp_dir:
+            cache = ParseCache(Path(temp_dir))
+            parser = BasicTextParser()
+            parser.parse(self.read_data('basic_events.txt'))
+
+            cache.store('a', parser)
+            cache.store('b', parser)
+            os.utime(Path(temp_dir) / 'a.parsed', (0, 0))
+            size = (Path(temp_dir) / 'b.parsed').stat().st_size
+
+            cache.evict(size)
+            self.assertIsNone(cache.retrieve('a'))
+            self.assertIsNotNone(cache.retrieve('b'))
+
+
+if __name__ == "__main__":
+    suite = unittest.makeSuite(TestParseCache)
+    runner = unittest.TextTestRunner(verbosity=2)
+    runner.run(suite)
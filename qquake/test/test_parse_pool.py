@@ -0,0 +1,102 @@
+# coding=utf-8
+"""Parse pool test
+
+.. note:: This program is free software; you can redistribute it and/or modify
+     it under the terms of the GNU General Public License as published by
+     the Free Software Foundation; either version 2 of the License, or
+     (at your option) any later version.
+
+"""
+import os
+import pickle
+import subprocess
+import sys
+import unittest
+
+from qgis.PyQt.QtCore import QByteArray
+from qgis.core import QgsSettings
+
+from qquake.basic_text import BasicTextParser
+from qquake.parse_pool import ParsePool
+from qquake.quakeml import QuakeMlParser, InvalidXmlException
+
+
+class TestParsePool(unittest.TestCase):
+    """
+    Test parsing in worker processes
+    """
+
+    @staticmethod
+    def read_data(file: str) -> QByteArray:
+        """
+        Reads a test data file
+        """
+        path = os.path.join(os.path.dirname(
+            __file__), 'data', file)
+        with open(path, 'rb') as f:
+            return QByteArray(f.read())
+
+    def test_pickle_elements(self):
+        """
+        Test that parsed elements survive a pickle round trip
+        """
+        parser = QuakeMlParser()
+        parser.parse_initial(self.read_data('events.xml'))
+        parser.add_events(self.read_data('macro.xml'))
+
+        restored = pickle.loads(pickle.dumps(parser))
+        self.assertEqual(restored.to_dict(), parser.to_dict())
+        # shared elements remain shared
+        event = restored.events[0]
+        self.assertIs(restored.events_by_id[event.publicID], event)
+
+    def test_parse(self):
+        """
+        Test parsing in worker processes
+        """
+        QgsSettings().setValue('/plugins/qquake/parse_pool_enabled', True)
+        QgsSettings().setValue('/plugins/qquake/parse_pool_workers', 2)
+        pool = ParsePool()
+        try:
+            self.assertTrue(pool.is_available())
+
+            expected = QuakeMlParser()
+            expected.parse_initial(self.read_data('events.xml'))
+            parsed = pool.parse(QuakeMlParser(), self.read_data('events.xml'), ParsePool.MODE_INITIAL)
+            self.assertEqual(parsed.to_dict(), expected.to_dict())
+
+            expected = BasicTextParser()
+            expected.parse(self.read_data('basic_events.txt'))
+            parsed = pool.parse(BasicTextParser(), self.read_data('basic_events.txt'))
+            self.assertEqual(len(parsed.events), 3)
+            self.assertEqual(parsed.events, expected.events)
+
+            # invalid content is reported, without breaking the pool
+            with self.assertRaises(InvalidXmlException):
+                pool.parse(QuakeMlParser(), QByteArray(b'<q:quakeml><eventParameters>'), ParsePool.MODE_INITIAL)
+            self.assertTrue(pool.is_available())
+        finally:
+            pool.shutdown()
+            QgsSettings().remove('/plugins/qquake/parse_pool_enabled')
+            QgsSettings().remove('/plugins/qquake/parse_pool_workers')
+
+        self.assertFalse(pool.is_available())
+
+    def test_worker_imports(self):
+        """
+        Test that worker processes only import the parser modules
+        """
+        modules = subprocess.run([sys.executable, '-c',
+                                  'import sys, qquake.parse_worker; print(" ".join(sorted(sys.modules)))'],
+                                 env=dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path)),
+                                 capture_output=True, check=True, text=True).stdout.split()
+        self.assertIn('qquake.quakeml.parser', modules)
+        self.assertNotIn('qquake.services', modules)
+        self.assertNotIn('qquake.gui', modules)
+        self.assertNotIn('qquake.fetcher', modules)
+
+
+if __name__ == "__main__":
+    suite = unittest.makeSuite(TestParsePool)
+    runner = unittest.TextTestRunner(verbosity=2)
+    runner.run(suite)
@@ -10,6 +10,7 @@
 import ast
 import os
 import pprint
+import time
 import unittest
 
 from qgis.PyQt.QtCore import (
@@ -17,9 +18,23 @@ from qgis.PyQt.QtCore import (
     QDateTime,
     Qt
 )
-from qgis.core import NULL
+from qgis.core import (
+    NULL,
+    QgsSettings,
+    QgsUnitTypes
+)
 
-from qquake.quakeml import QuakeMlParser, FDSNStationXMLParser
+from qquake.quakeml import QuakeMlParser, FDSNStationXMLParser, InvalidXmlException
+from qquake.quakeml.fdsn_event import Event
+from qquake.quakeml.fields import (
+    OutputOptions,
+    clear_service_fields_cache,
+    compile_extraction_plan,
+    default_field_setting_key,
+    get_service_fields
+)
+from qquake.quakeml.stream_reader import QuakeMlStreamReader
+from qquake.services import SERVICE_MANAGER
 
 
 class TestQuakeMlParser(unittest.TestCase):
@@ -101,6 +116,367 @@ class TestQuakeMlParser(unittest.TestCase):
             __file__), 'data', 'macro.xml')
         self.run_check(path)
 
+    def test_count_events(self):
+        """
+        Test counting events without parsing
+        """
+        path = os.path.join(os.path.dirname(
+            __file__), 'data', 'events.xml')
+        with open(path, 'rb') as f:
+            content = QByteArray(f.read())
+
+        parser = QuakeMlParser()
+        parser.parse_initial(content)
+        self.assertEqual(QuakeMlParser.count_events(content), 13)
+        self.assertEqual(QuakeMlParser.count_events(content), len(parser.events))
+
+        self.assertEqual(QuakeMlParser.count_events(QByteArray(b'<q:quakeml><eventParameters><q:event publicID="a">'
+                                                               b'<ms:eventReference>b</ms:eventReference></q:event>'
+                                                               b'<event>c</event></eventParameters>')), 2)
+
+    def test_multi_origin_event(self):
+        """
+        Test parsing a large event with many origins and magnitudes, each with their own comments
+        """
+        origin_count = 2000
+        parts = [b'<q:quakeml><eventParameters><event publicID="smi:local/event/1">'
+                 b'<preferredOriginID>smi:local/origin/0</preferredOriginID>'
+                 b'<preferredMagnitudeID>smi:local/magnitude/0</preferredMagnitudeID>'
+                 b'<type>earthquake</type><comment><text>event comment</text></comment>'
+                 b'<description><text>Central Italy</text><type>region name</type></description>']
+        for i in range(origin_count):
+            parts.append('<origin publicID="smi:local/origin/{0}"><time><value>2021-01-01T00:00:00.000Z</value>'
+                         '</time><latitude><value>42.0</value></latitude><longitude><value>13.0</value>'
+                         '</longitude><comment><text>origin comment {0}</text></comment>'
+                         '<originUncertainty><horizontalUncertainty>{0}</horizontalUncertainty>'
+                         '</originUncertainty></origin>'.format(i).encode())
+            parts.append('<magnitude publicID="smi:local/magnitude/{0}"><mag><value>3.{0}</value></mag>'
+                         '<originID>smi:local/origin/{0}</originID><comment><text>magnitude comment {0}</text>'
+                         '</comment></magnitude>'.format(i).encode())
+        parts.append(b'</event></eventParameters></q:quakeml>')
+
+        parser = QuakeMlParser()
+        start = time.time()
+        parser.parse_initial(QByteArray(b''.join(parts)))
+        self.assertLess(time.time() - start, 20)
+
+        self.assertEqual(len(parser.events), 1)
+        event = parser.events[0]
+        self.assertEqual(len(event.origins), origin_count)
+        self.assertEqual(len(event.magnitudes), origin_count)
+        self.assertEqual(len(parser.origins), origin_count)
+        # nested origin and magnitude comments must not be attached to the event
+        self.assertEqual([c.text for c in event.comments], ['event comment'])
+        self.assertEqual(len(event.description), 1)
+
+        origin = event.origins['smi:local/origin/1234']
+        self.assertEqual([c.text for c in origin.comments], ['origin comment 1234'])
+        self.assertEqual(origin.originUncertainty.horizontalUncertainty, 1234)
+        magnitude = event.magnitudes['smi:local/magnitude/1234']
+        self.assertEqual([c.text for c in magnitude.comments], ['magnitude comment 1234'])
+        self.assertEqual(magnitude.originID, 'smi:local/origin/1234')
+
+    def test_preferred_only_parsing(self):
+        """
+        Test skipping non-preferred origins and magnitudes while parsing
+        """
+        content = QByteArray(b'<q:quakeml><eventParameters><event publicID="smi:local/event/1">'
+                             b'<origin publicID="smi:local/origin/0"><latitude><value>40</value></latitude></origin>'
+                             b'<origin publicID="smi:local/origin/1"><latitude><value>41</value></latitude></origin>'
+                             b'<origin publicID="smi:local/origin/2"><latitude><value>42</value></latitude></origin>'
+                             b'<magnitude publicID="smi:local/magnitude/0"><mag><value>3.0</value></mag>'
+                             b'<originID>smi:local/origin/0</originID></magnitude>'
+                             b'<magnitude publicID="smi:local/magnitude/1"><mag><value>3.1</value></mag>'
+                             b'<originID>smi:local/origin/2</originID></magnitude>'
+                             b'<preferredOriginID>smi:local/origin/1</preferredOriginID>'
+                             b'<preferredMagnitudeID>smi:local/magnitude/1</preferredMagnitudeID>'
+                             b'</event></eventParameters></q:quakeml>')
+
+        parser = QuakeMlParser(preferred_origins_only=True, preferred_magnitudes_only=True)
+        parser.parse_initial(content)
+        event = parser.events[0]
+        # origin 2 is retained, as it is referenced by the preferred magnitude
+        self.assertEqual(list(event.origins.keys()), ['smi:local/origin/1', 'smi:local/origin/2'])
+        self.assertEqual(list(event.magnitudes.keys()), ['smi:local/magnitude/1'])
+        self.assertEqual(list(parser.origins.keys()), ['smi:local/origin/1', 'smi:local/origin/2'])
+        self.assertFalse(parser.scan_for_missing_origins())
+
+        parser = QuakeMlParser(preferred_origins_only=True)
+        parser.parse_initial(content)
+        event = parser.events[0]
+        self.assertEqual(list(event.origins.keys()), ['smi:local/origin/0', 'smi:local/origin/1',
+                                                      'smi:local/origin/2'])
+        self.assertEqual(list(event.magnitudes.keys()), ['smi:local/magnitude/0', 'smi:local/magnitude/1'])
+
+        parser = QuakeMlParser(preferred_magnitudes_only=True)
+        parser.parse_initial(content)
+        event = parser.events[0]
+        self.assertEqual(len(event.origins), 3)
+        self.assertEqual(list(event.magnitudes.keys()), ['smi:local/magnitude/1'])
+
+        # results are identical to filtering fully parsed events
+        fields = ['eventParameters>event§publicID', 'eventParameters>event>origin§publicID',
+                  'eventParameters>event>magnitude§publicID']
+        for preferred_origins_only in (False, True):
+            for preferred_magnitudes_only in (False, True):
+                full_parser = QuakeMlParser()
+                full_parser.parse_initial(content)
+                pruned_parser = QuakeMlParser(preferred_origins_only=preferred_origins_only,
+                                              preferred_magnitudes_only=preferred_magnitudes_only)
+                pruned_parser.parse_initial(content)
+                self.assertEqual(
+                    [f.attributes() for f in pruned_parser.create_event_features(fields, preferred_origins_only,
+                                                                                 preferred_magnitudes_only)],
+                    [f.attributes() for f in full_parser.create_event_features(fields, preferred_origins_only,
+                                                                               preferred_magnitudes_only)])
+
+    def test_projected_parsing(self):
+        """
+        Test parsing only the parts of events required for the output fields
+        """
+        output_fields = ['eventParameters>event§publicID',
+                         'eventParameters>event>origin>time>value',
+                         'eventParameters>event>origin>quality>usedPhaseCount',
+                         'eventParameters>event>magnitude>mag>value']
+
+        parser = QuakeMlParser(output_fields=output_fields)
+        self.assertIn('quality', parser.projection['origin'])
+        self.assertNotIn('originUncertainty', parser.projection['origin'])
+        self.assertNotIn('creationInfo', parser.projection['origin'])
+        self.assertIn('originID', parser.projection['magnitude'])
+        self.assertNotIn('description', parser.projection['event'])
+
+        for file in ('events.xml', 'macro.xml'):
+            path = os.path.join(os.path.dirname(
+                __file__), 'data', file)
+            with open(path, 'rb') as f:
+                content = QByteArray(f.read())
+
+            full_parser = QuakeMlParser()
+            full_parser.parse_initial(content)
+            parser = QuakeMlParser(output_fields=output_fields)
+            parser.parse_initial(content)
+
+            event = parser.events[0]
+            origin = event.origins[event.preferredOriginID]
+            self.assertIsNotNone(origin.time)
+            self.assertIsNotNone(origin.latitude)
+            self.assertIsNone(origin.creationInfo)
+            self.assertIsNone(origin.originUncertainty)
+            self.assertFalse(event.description)
+
+            self.assertEqual(parser.earliest_event_time(), full_parser.earliest_event_time())
+
+        # features are identical to those created from fully parsed events
+        self.assertEqual(
+            [(f.attributes(), f.geometry().asWkt()) for f in parser.create_event_features(output_fields, True, True)],
+            [(f.attributes(), f.geometry().asWkt()) for f in full_parser.create_event_features(output_fields, True,
+                                                                                                True)])
+        self.assertEqual([f.attributes() for f in parser.create_mdp_features(output_fields, True)],
+                         [f.attributes() for f in full_parser.create_mdp_features(output_fields, True)])
+
+    def test_merge(self):
+        """
+        Test merging results parsed by separate parsers
+        """
+        contents = []
+        for file in ('events.xml', 'macro.xml'):
+            path = os.path.join(os.path.dirname(
+                __file__), 'data', file)
+            with open(path, 'rb') as f:
+                contents.append(QByteArray(f.read()))
+
+        parser = QuakeMlParser()
+        parser.parse_initial(contents[0])
+        parser.add_events(contents[1])
+
+        merged = QuakeMlParser()
+        for content in contents:
+            reply_parser = QuakeMlParser()
+            reply_parser.parse_initial(content)
+            merged.merge(reply_parser)
+
+        self.assertEqual(pprint.pformat(merged.to_dict()), pprint.pformat(parser.to_dict()))
+        self.assertEqual(merged.events_by_id.keys(), parser.events_by_id.keys())
+        self.assertEqual(merged.macro_events_by_event.keys(), parser.macro_events_by_event.keys())
+        self.assertEqual(merged.mdpsets_by_mdp.keys(), parser.mdpsets_by_mdp.keys())
+        self.assertEqual(merged.earliest_event_time(), parser.earliest_event_time())
+
+        # events already present are skipped when merging unique events
+        event_count = len(merged.events)
+        reply_parser = QuakeMlParser()
+        reply_parser.parse_initial(contents[0])
+        merged.merge(reply_parser, unique_events=True)
+        self.assertEqual(len(merged.events), event_count)
+
+    def test_streamed_parsing(self):
+        """
+        Test that content added incrementally is parsed identically to complete content
+        """
+        for file in ('events.xml', 'macro.xml'):
+            path = os.path.join(os.path.dirname(
+                __file__), 'data', file)
+            with open(path, 'rb') as f:
+                content = f.read()
+
+            parser = QuakeMlParser()
+            parser.parse_initial(QByteArray(content))
+
+            streamed_parser = QuakeMlParser()
+            reader = streamed_parser.begin_stream()
+            for i in range(0, len(content), 1000):
+                reader.add_data(QByteArray(content[i:i + 1000]))
+            self.assertTrue(reader.finish())
+
+            self.assertEqual(pprint.pformat(streamed_parser.to_dict()), pprint.pformat(parser.to_dict()))
+
+    def test_invalid_content(self):
+        """
+        Test that truncated or invalid replies raise, while empty replies are valid
+        """
+        path = os.path.join(os.path.dirname(
+            __file__), 'data', 'events.xml')
+        with open(path, 'rb') as f:
+            content = f.read()
+
+        parser = QuakeMlParser()
+        with self.assertRaises(InvalidXmlException):
+            parser.parse_initial(QByteArray(content[:len(content) // 2]))
+
+        parser = QuakeMlParser()
+        with self.assertRaises(InvalidXmlException):
+            parser.parse_initial(QByteArray(b'<html><body>Service unavailable</body>'))
+
+        reader = QuakeMlParser().begin_stream()
+        reader.add_data(QByteArray(content[:len(content) // 2]))
+        self.assertFalse(reader.finish())
+
+        parser = QuakeMlParser()
+        parser.parse_initial(QByteArray(b''))
+        self.assertEqual(parser.events, [])
+
+        path = os.path.join(os.path.dirname(
+            __file__), 'data', 'stations.xml')
+        with open(path, 'rb') as f:
+            content = f.read()
+        with self.assertRaises(InvalidXmlException):
+            FDSNStationXMLParser.parse(QByteArray(content[:len(content) // 2]))
+
+    def test_stream_reader_namespaces(self):
+        """
+        Test that the stream reader tracks namespace declarations for target elements
+        """
+        elements = []
+        reader = QuakeMlStreamReader({'event'}, lambda name, element: elements.append(
+            (name, element.attribute('publicID'), element.firstChildElement('type').text(),
+             reader.namespace_declarations())))
+        reader.add_data(QByteArray(b'<q:quakeml xmlns="http://quakeml.org/xmlns/bed/1.2" '
+                                   b'xmlns:q="http://quakeml.org/xmlns/quakeml/1.2"><eventParameters '
+                                   b'xmlns:ingv="http://webservices.ingv.it/fdsnws/event/1"><event publicID="a">'
+                                   b'<type>earthquake</type></event><ev'))
+        self.assertEqual(len(elements), 1)
+        reader.add_data(QByteArray(b'ent publicID="b"><type>quarry blast</type></event></eventParameters>'
+                                   b'</q:quakeml>'))
+        self.assertTrue(reader.finish())
+
+        namespaces = {'xmlns': 'http://quakeml.org/xmlns/bed/1.2',
+                      'xmlns:q': 'http://quakeml.org/xmlns/quakeml/1.2',
+                      'xmlns:ingv': 'http://webservices.ingv.it/fdsnws/event/1'}
+        self.assertEqual(elements, [('event', 'a', 'earthquake', namespaces),
+                                    ('event', 'b', 'quarry blast', namespaces)])
+
+    def test_mdp_joins(self):
+        """
+        Test joining mdps to their events, macroseismic events and mdp sets
+        """
+        path = os.path.join(os.path.dirname(
+            __file__), 'data', 'macro.xml')
+        with open(path, 'rb') as f:
+            content = f.read()
+
+        parser = QuakeMlParser()
+        parser.parse_initial(QByteArray(content))
+
+        self.assertEqual(list(parser.events_by_id.keys()), ['quakeml:it.ingv.asmi/event/20161030_0640_000'])
+        self.assertEqual(list(parser.macro_events_by_event.keys()), ['quakeml:it.ingv.asmi/event/20161030_0640_000'])
+        self.assertEqual(len(parser.mdpsets_by_mdp), 379)
+
+        mdp = parser.mdps['quakeml:it.ingv.asmi/mdp/ROSAL019/569715']
+        self.assertEqual(parser.mdp_set_for_mdp(mdp).publicID, 'quakeml:it.ingv.asmi/mdpset/ROSAL019/19992')
+
+        features = list(parser.create_mdp_features(['eventParameters>event§publicID',
+                                                    'macroseismicParameters>mdpSet§publicID',
+                                                    'macroseismicParameters>mdp§publicID'], True))
+        self.assertEqual(len(features), 379)
+        self.assertEqual(features[0].attributes(), ['quakeml:it.ingv.asmi/event/20161030_0640_000',
+                                                    'quakeml:it.ingv.asmi/mdpset/ROSAL019/19992',
+                                                    'quakeml:it.ingv.asmi/mdp/ROSAL019/569715'])
+
+        parser.clear()
+        self.assertFalse(parser.events_by_id)
+        self.assertFalse(parser.macro_events_by_event)
+        self.assertFalse(parser.mdpsets_by_mdp)
+
+    def test_compact_elements(self):
+        """
+        Test that parsed elements do not carry a per-instance dictionary
+        """
+        path = os.path.join(os.path.dirname(
+            __file__), 'data', 'events.xml')
+        with open(path, 'rb') as f:
+            content = QByteArray(f.read())
+
+        parser = QuakeMlParser()
+        parser.parse_initial(content)
+        event = parser.events[0]
+        origin = event.origins[event.preferredOriginID]
+        for element in (event, origin, origin.time, origin.latitude, origin.creationInfo, origin.quality,
+                        event.magnitudes[event.preferredMagnitudeID]):
+            self.assertFalse(hasattr(element, '__dict__'))
+
+        self.assertEqual(origin.latitude.dict_attributes(),
+                         ('confidenceLevel', 'lowerUncertainty', 'uncertainty', 'upperUncertainty', 'value'))
+        self.assertEqual(origin.latitude.to_dict(), {'type': 'RealQuantity',
+                                                     'confidenceLevel': None,
+                                                     'lowerUncertainty': None,
+                                                     'uncertainty': None,
+                                                     'upperUncertainty': None,
+                                                     'value': 36.7682})
+
+        path = os.path.join(os.path.dirname(
+            __file__), 'data', 'stations.xml')
+        with open(path, 'rb') as f:
+            content = QByteArray(f.read())
+
+        fdsn = FDSNStationXMLParser().parse(content)
+        network = fdsn.networks[0]
+        for element in (fdsn, network, network.stations[0], network.stations[0].Site):
+            self.assertFalse(hasattr(element, '__dict__'))
+
+        self.assertIn('Code', network.stations[0].dict_attributes())
+        self.assertIn('Latitude', network.stations[0].dict_attributes())
+
+    def test_earliest_event_time(self):
+        """
+        Test retrieving the earliest event time and removing events before a time
+        """
+        path = os.path.join(os.path.dirname(
+            __file__), 'data', 'events.xml')
+        with open(path, 'rb') as f:
+            content = QByteArray(f.read())
+
+        parser = QuakeMlParser()
+        parser.parse_initial(content)
+        self.assertEqual(parser.earliest_event_time(), QDateTime(2020, 1, 24, 7, 24, 19, 850, Qt.UTC))
+
+        parser.remove_events_until(QDateTime(2020, 12, 29, 11, 19, 55, 0, Qt.UTC))
+        self.assertEqual(len(parser.events), 6)
+        self.assertEqual(parser.earliest_event_time(), QDateTime(2020, 12, 30, 5, 15, 4, 290, Qt.UTC))
+        self.assertEqual(sorted(parser.events_by_id), sorted(e.publicID for e in parser.events))
+        # origins and magnitudes of the removed events are removed too
+        self.assertEqual(sorted(parser.origins), sorted({e.preferredOriginID for e in parser.events}))
+        self.assertEqual(sorted(parser.magnitudes), sorted({e.preferredMagnitudeID for e in parser.events}))
+
     def test_stations(self):
         """
         Test station XML parsing
@@ -109,6 +485,136 @@ class TestQuakeMlParser(unittest.TestCase):
             __file__), 'data', 'stations.xml')
         self.run_check_stations(path)
 
+    def test_stream_reader_skip_elements(self):
+        """
+        Test that the stream reader omits skipped subtrees
+        """
+        elements = []
+        reader = QuakeMlStreamReader({'Station'}, lambda name, element: elements.append(element),
+                                     skip_elements={'Channel'})
+        reader.add_data(QByteArray(b'<Network><Station code="a"><Latitude>1</Latitude><Channel code="b">'
+                                   b'<Latitude>2</Latitude><Channel><Response/></Chan'))
+        reader.add_data(QByteArray(b'nel></Channel><Elevation>3</Elevation></Station></Network>'))
+        self.assertTrue(reader.finish())
+
+        self.assertEqual(len(elements), 1)
+        self.assertEqual(elements[0].attribute('code'), 'a')
+        self.assertEqual(elements[0].firstChildElement('Latitude').text(), '1')
+        self.assertEqual(elements[0].firstChildElement('Elevation').text(), '3')
+        self.assertTrue(elements[0].firstChildElement('Channel').isNull())
+
+    def test_stations_with_channels(self):
+        """
+        Test that channel and response level station XML is parsed identically to station level XML
+        """
+        path = os.path.join(os.path.dirname(
+            __file__), 'data', 'stations.xml')
+        with open(path, 'rb') as f:
+            content = f.read()
+
+        channel = b'<Channel code="HHZ" locationCode="" startDate="2000-01-01T00:00:00"><Latitude>9</Latitude>' \
+                  b'<Longitude>9</Longitude><Elevation>9</Elevation><Depth>0</Depth><Response>' \
+                  b'<InstrumentSensitivity><Value>1</Value></InstrumentSensitivity></Response></Channel>'
+        channel_content = content.replace(b'</Station>', channel + b'</Station>')
+        self.assertNotEqual(channel_content, content)
+
+        fdsn = FDSNStationXMLParser.parse(QByteArray(content))
+        channel_fdsn = FDSNStationXMLParser.parse(QByteArray(channel_content))
+        self.assertEqual(len(channel_fdsn.networks), len(fdsn.networks))
+        self.assertEqual(channel_fdsn.to_dict(), fdsn.to_dict())
+
+    def test_extraction_plan(self):
+        """
+        Test compiled field extraction plans
+        """
+        fields = Event.to_fields(['eventParameters>event§publicID',
+                                  '!IsPrefOrigin',
+                                  'eventParameters>event>origin>depth>value',
+                                  'eventParameters>event>magnitude>mag>value'])
+        self.assertEqual(len(fields), 4)
+
+        plan = compile_extraction_plan(SERVICE_MANAGER.FDSNEVENT, 'origin', 'eventParameters>event>origin',
+                                       fields, flag='!IsPrefOrigin')
+        self.assertEqual(plan.extractions, [(2, ('depth', 'value'), None)])
+        self.assertEqual(plan.flag_index, 1)
+
+        path = os.path.join(os.path.dirname(
+            __file__), 'data', 'events.xml')
+        with open(path, 'rb') as f:
+            content = f.read()
+
+        parser = QuakeMlParser()
+        parser.parse_initial(QByteArray(content))
+
+        plans = Event.compile_extraction_plans(fields, convert_negative_depths=True,
+                                               depth_unit=QgsUnitTypes.DistanceKilometers)
+        features = list(parser.events[0].to_features(fields, plans, True, True, parser.origins,
+                                                     convert_negative_depths=True,
+                                                     depth_unit=QgsUnitTypes.DistanceKilometers))
+        self.assertEqual(len(features), 1)
+        self.assertEqual(features[0].attributes(),
+                         ['smi:webservices.ingv.it/fdsnws/event/1/query?eventId=26359881', True, -19.727, 5.1])
+
+        attributes = [NULL] * len(fields)
+        plans['event'].apply_to_attributes(attributes, parser.events[0])
+        self.assertEqual(attributes, ['smi:webservices.ingv.it/fdsnws/event/1/query?eventId=26359881', NULL, NULL,
+                                      NULL])
+
+    def test_output_options(self):
+        """
+        Test that fields are built from an output options snapshot
+        """
+        options = OutputOptions(short_field_names=True,
+                                deselected_fields=frozenset(
+                                    [default_field_setting_key('eventParameters>event>origin>depth>value')]))
+        self.assertTrue(options.is_field_selected('eventParameters>event§publicID', None))
+        self.assertFalse(options.is_field_selected('eventParameters>event>origin>depth>value', None))
+        self.assertTrue(options.is_field_selected('eventParameters>event>origin>depth>value',
+                                                  ['eventParameters>event>origin>depth>value']))
+
+        fields = Event.to_fields(None, options)
+        self.assertEqual(fields.lookupField('depth'), -1)
+        self.assertEqual(fields.lookupField('Depth'), -1)
+        self.assertGreaterEqual(fields.lookupField('time'), 0)
+
+        fields = Event.to_fields(['eventParameters>event>origin>depth>value'], options)
+        self.assertEqual(fields.names(), ['depth'])
+
+        # the parser must keep using the options it was created with
+        settings = QgsSettings()
+        short_field_names = settings.value('/plugins/qquake/output_short_field_names', False, bool)
+        parser = QuakeMlParser(output_options=OutputOptions.from_settings())
+        settings.setValue('/plugins/qquake/output_short_field_names', not short_field_names)
+        try:
+            self.assertEqual(parser.output_options.short_field_names, short_field_names)
+            self.assertEqual(parser.to_event_fields(['eventParameters>event>origin>depth>value']).names(),
+                             ['depth' if short_field_names else 'Depth'])
+        finally:
+            settings.setValue('/plugins/qquake/output_short_field_names', short_field_names)
+
+    def test_service_fields_cache(self):
+        """
+        Test that field definitions are cached
+        """
+        options = OutputOptions()
+        fields = get_service_fields(SERVICE_MANAGER.FDSNEVENT, None, options)
+        self.assertIs(get_service_fields(SERVICE_MANAGER.FDSNEVENT, None, OutputOptions()), fields)
+        self.assertIs(get_service_fields(SERVICE_MANAGER.FDSNEVENT, [], options), fields)
+        self.assertIsNot(get_service_fields(SERVICE_MANAGER.FDSNEVENT, None, OutputOptions(short_field_names=True)),
+                         fields)
+        self.assertIsNot(get_service_fields(SERVICE_MANAGER.MACROSEISMIC, None, options), fields)
+
+        depth_fields = get_service_fields(SERVICE_MANAGER.FDSNEVENT, ['eventParameters>event>origin>depth>value'],
+                                          options)
+        self.assertEqual(depth_fields.names(), ['Depth'])
+        self.assertIs(Event.to_fields(['eventParameters>event>origin>depth>value'], options), depth_fields)
+
+        self.assertEqual(FDSNStationXMLParser.remap_attribute_name('FDSNStationXML>Network>Station§Code',
+                                                                   options), 'StationCode')
+
+        clear_service_fields_cache()
+        self.assertIsNot(get_service_fields(SERVICE_MANAGER.FDSNEVENT, None, options), fields)
+
     def test_origin_datetime_composite_handling(self):
         """
         Test that datetime values can be split to component fields
@@ -0,0 +1,95 @@
+# coding=utf-8
+"""Response cache test
+
+.. note:: This program is free software; you can redistribute it and/or modify
+     it under the terms of the GNU General Public License as published by
+     the Free Software Foundation; either version 2 of the License, or
+     (at your option) any later version.
+
+"""
+import os
+import tempfile
+import unittest
+from pathlib import Path
+
+from qgis.PyQt.QtCore import QByteArray
+from qgis.PyQt.QtNetwork import QNetworkRequest
+
+from qquake.services import ResponseCache
+
+
+class TestResponseCache(unittest.TestCase):
+    """
+    Test response cache
+    """
+
+    def test_cacheable(self):
+        """
+        Test which URLs can be cached
+        """
+        self.assertTrue(ResponseCache.is_cacheable('http://webservices.ingv.it/fdsnws/event/1/query?format=xml'))
+        self.assertTrue(ResponseCache.is_cacheable('https://www.seismicportal.eu/fdsnws/event/1/query?format=xml'))
+        self.assertFalse(ResponseCache.is_cacheable('file:///tmp/events.xml'))
+
+    def test_ttl(self):
+        """
+        Test per service ttl
+        """
+        self.assertEqual(ResponseCache.ttl_for_service({'settings': {}}), ResponseCache.DEFAULT_TTL)
+        self.assertEqual(ResponseCache.ttl_for_service({'settings': {'querycachettl': 60}}), 60)
+
+    def test_store_and_retrieve(self):
+        """
+        Test storing and retrieving content
+        """
+        with tempfile.TemporaryDirectory() as temp_dir:
+            cache = ResponseCache(Path(temp_dir))
+            url = 'http://example.com/query?format=xml'
+            self.assertIsNone(cache.entry(url))
+            self.assertIsNone(cache.fresh_content(url, 60))
+
+            cache.store(url, QByteArray(b'content'), etag='"abc"', last_modified='Wed, 21 Oct 2015 07:28:00 GMT')
+            self.assertEqual(cache.entry(url)['etag'], '"abc"')
+            self.assertEqual(cache.fresh_content(url, 60).data(), b'content')
+            # ttl of 0 always requires revalidation
+            self.assertIsNone(cache.fresh_content(url, 0))
+
+            request = QNetworkRequest()
+            cache.add_validators(request, url)
+            self.assertEqual(request.rawHeader(b'If-None-Match').data(), b'"abc"')
+            self.assertEqual(request.rawHeader(b'If-Modified-Since').data(), b'Wed, 21 Oct 2015 07:28:00 GMT')
+
+            self.assertEqual(cache.revalidated(url).data(), b'content')
+            self.assertIsNone(cache.revalidated('http://example.com/other'))
+
+            cache.clear()
+            self.assertIsNone(cache.entry(url))
+
+    def test_evict(self):
+        """
+        Test evicting least recently used entries
+        """
+        with tempfile.TemporaryDirectory() as temp_dir:
+            cache = ResponseCache(Path(temp_dir))
+            cache.store('http://example.com/1', QByteArray(b'a' * 10))
+            cache.store('http://example.com/2', QByteArray(b'b' * 10))
+            cache.store('http://example.com/3', QByteArray(b'c' * 10))
+
+            # make the first entry the oldest, and the second the most recently used
+            content_path, _ = cache._entry_paths('http://example.com/1')  # pylint: disable=protected-access
+            os.utime(content_path, (1, 1))
+            content_path, _ = cache._entry_paths('http://example.com/3')  # pylint: disable=protected-access
+            os.utime(content_path, (2, 2))
+
+            cache.evict(20)
+            self.assertIsNone(cache.entry('http://example.com/1'))
+            self.assertIsNotNone(cache.entry('http://example.com/2'))
+            self.assertIsNotNone(cache.entry('http://example.com/3'))
+
+            cache.evict(10)
+            self.assertIsNone(cache.entry('http://example.com/3'))
+            self.assertIsNotNone(cache.entry('http://example.com/2'))
+
+
+if __name__ == '__main__':
+    unittest.main()